@@ -0,0 +1,415 @@
+# bench.py
+# ------------------------------------------------------------
+# Benchmarks for the rank.py pipeline stages: page extraction, requisite
+# parsing, AST flattening and loading, edge extraction and the graph stages (levels,
+# SCCs, PageRank), on the checked-in corpus and on scaled synthetic graphs.
+#
+# Corpus:
+#   - prereq_structured.json        requisite/incompat text, units, summary
+#   - uq_fast/courses_raw.csv       extra rows (title, requisite text)
+#   Course pages for the extraction stage are rebuilt from these rows with
+#   the element ids parse_course_page looks for.
+#
+# Each stage reports the best of --repeat timed runs as throughput
+# (courses/s, edges/s) plus the peak traced allocation of one extra run.
+#
+# Examples:
+#   python bench.py
+#   python bench.py --stages parse,graph --sizes 10000,100000
+#   python bench.py --save                      (→ uq_fast/bench_baseline.json)
+#   python bench.py --compare --tolerance 0.15  (exit 1 on a regression)
+#
+# Baselines are machine-specific: save one before a change and compare
+# against it on the same machine.
+# ------------------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import csv
+import html
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable
+
+import networkx as nx
+import numpy as np
+import scipy
+
+from graph_engine import ArrayGraph, rank_graph
+from prereq_ast import Node, ast_hook, ast_json, intern_clear, with_args
+from prereq_grammar import flatten, parse_cache_clear, parse_incompat_text, parse_prereq_text
+from rank import build_graph, condensation_longest_levels, parse_course_page, rank_networkx, requisite_edges
+
+HERE = Path(__file__).resolve().parent
+STRUCT_JS = HERE / "prereq_structured.json"
+RAW_CSV = HERE / "uq_fast" / "courses_raw.csv"
+BASELINE_JS = HERE / "uq_fast" / "bench_baseline.json"
+BASELINE_VERSION = 1
+
+STAGE_GROUPS = ("page", "parse", "ast", "graph")
+DEFAULT_SIZES = "10000,100000"
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html><head><title>{code} - {title}</title></head>
+<body><div id="content">
+<h1 id="course-title">{title} ({code})</h1>
+<p id="course-units">{units}</p>
+<h2><a>Course requirements</a></h2>
+<p id="course-prerequisite">{prereq}</p>
+<p id="course-incompatible">{incompat}</p>
+<h2>Course description</h2>
+<p id="course-summary">{summary}</p>
+</div></body></html>
+"""
+
+
+# ============================== Corpus =============================
+
+class Corpus:
+    """Course rows from the checked-in outputs: code → (title, prereq, incompat, units, summary)."""
+
+    def __init__(self, struct_js: Path = STRUCT_JS, raw_csv: Path = RAW_CSV):
+        self.rows: dict[str, tuple[str, str, str, str, str]] = {}
+        if struct_js.exists():
+            for code, item in json.loads(struct_js.read_text(encoding="utf-8")).items():
+                inc = item.get("incompat") or {}
+                self.rows[code] = (
+                    code,
+                    item.get("raw") or "",
+                    inc.get("raw") or "",
+                    item.get("units") or "",
+                    item.get("summary") or "",
+                )
+        if raw_csv.exists():
+            with open(raw_csv, "r", encoding="utf-8", newline="") as f:
+                for r in csv.DictReader(f):
+                    _, _, _, units, summary = self.rows.get(r["course_code"], ("",) * 5)
+                    self.rows[r["course_code"]] = (
+                        r.get("title") or r["course_code"],
+                        r.get("prereq_raw") or "",
+                        r.get("incompat_raw") or "",
+                        units,
+                        summary,
+                    )
+        self.codes = sorted(self.rows)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def pages(self) -> list[str]:
+        out = []
+        for code in self.codes:
+            title, prereq, incompat, units, summary = (html.escape(x) for x in self.rows[code])
+            out.append(PAGE_TEMPLATE.format(
+                code=code, title=title, prereq=prereq, incompat=incompat, units=units, summary=summary,
+            ))
+        return out
+
+    def prereq_texts(self) -> list[str]:
+        return [self.rows[c][1] for c in self.codes]
+
+    def incompat_texts(self) -> list[str]:
+        return [self.rows[c][2] for c in self.codes]
+
+
+def synthetic_edges(n: int, seed: int = 0, avg_prereqs: float = 2.0, cycle_frac: float = 0.01) -> list[tuple[str, str]]:
+    """
+    (course, prereq) pairs for n synthetic courses shaped like the catalog:
+    prereqs mostly come from lower-numbered (earlier) courses, with a small
+    fraction of back edges so there are nontrivial SCCs to condense.
+    """
+    rng = random.Random(seed)
+    codes = [f"{chr(65 + i // 234000 % 26)}{chr(65 + i // 9000 % 26)}SY{1000 + i % 9000}" for i in range(n)]
+    edges: set[tuple[str, str]] = set()
+    for i in range(1, n):
+        for _ in range(min(i, int(rng.expovariate(1 / avg_prereqs)))):
+            j = rng.randrange(max(0, i - 2000), i)
+            edges.add((codes[i], codes[j]))
+    for _ in range(int(n * cycle_frac)):
+        i = rng.randrange(n - 1)
+        edges.add((codes[i], codes[rng.randrange(i + 1, min(n, i + 50))]))
+    return sorted(edges)
+
+
+def reflatten(node: Any) -> Any:
+    """Rebuild an AST bottom-up through flatten() (the AND/OR normalizer)."""
+    if not isinstance(node, Node) or "args" not in node:
+        return node
+    args = [reflatten(a) for a in node.args]
+    if node.op in ("AND", "OR"):
+        return flatten(node.op, args)
+    return with_args(node, args)
+
+
+# ============================ Measuring ============================
+
+class Stage:
+    """One benchmark: fn() does the work once; items/edges scale the rates."""
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[], Any],
+        items: int,
+        unit: str = "courses",
+        edges: int = 0,
+        setup: Callable[[], Any] | None = None,
+    ):
+        self.name = name
+        self.fn = fn
+        self.items = items
+        self.unit = unit
+        self.edges = edges
+        self.setup = setup
+
+    def measure(self, repeat: int) -> dict[str, Any]:
+        best = float("inf")
+        for _ in range(max(1, repeat)):
+            if self.setup:
+                self.setup()
+            t0 = time.perf_counter()
+            self.fn()
+            best = min(best, time.perf_counter() - t0)
+
+        # Separate traced run: tracemalloc slows allocation-heavy code down
+        if self.setup:
+            self.setup()
+        tracemalloc.start()
+        try:
+            self.fn()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        best = max(best, 1e-9)
+        res = {
+            "items": self.items,
+            "unit": self.unit,
+            "seconds": best,
+            "per_sec": self.items / best,
+            "peak_kib": peak / 1024,
+        }
+        if self.edges:
+            res["edges"] = self.edges
+            res["edges_per_sec"] = self.edges / best
+        return res
+
+
+def corpus_stages(corpus: Corpus, groups: set[str]) -> list[Stage]:
+    n = len(corpus)
+    stages: list[Stage] = []
+    prereqs = corpus.prereq_texts()
+    incompats = corpus.incompat_texts()
+
+    if "page" in groups:
+        pages = corpus.pages()
+        stages.append(Stage("page.parse_course_page", lambda: [parse_course_page(p) for p in pages], n))
+
+    if "parse" in groups:
+        stages.append(Stage(
+            "parse.prereq_cold",
+            lambda: [parse_prereq_text(t) for t in prereqs],
+            n,
+            setup=parse_cache_clear,
+        ))
+        stages.append(Stage("parse.prereq_warm", lambda: [parse_prereq_text(t) for t in prereqs], n))
+        stages.append(Stage(
+            "parse.incompat_cold",
+            lambda: [parse_incompat_text(t) for t in incompats],
+            n,
+            setup=parse_cache_clear,
+        ))
+
+    if "ast" in groups or "graph" in groups:
+        parse_cache_clear()
+        parsed = [(c, parse_prereq_text(t)) for c, t in zip(corpus.codes, prereqs)]
+        corpus_edges = sorted({e for c, p in parsed for e in requisite_edges(c, p)})
+
+    if "ast" in groups:
+        asts = [node for _, p in parsed for node in (p["prereq"], p["coreq"]) if node]
+        stages.append(Stage("ast.flatten", lambda: [reflatten(a) for a in asts], n))
+        # Loading stored ASTs: plain JSON dicts vs interned nodes (compare peak memory too)
+        struct_text = json.dumps({c: p for c, p in parsed}, default=ast_json)
+        stages.append(Stage("ast.load_dicts", lambda: json.loads(struct_text), n))
+        stages.append(Stage(
+            "ast.load_nodes",
+            lambda: json.loads(struct_text, object_hook=ast_hook),
+            n,
+            setup=intern_clear,
+        ))
+        stages.append(Stage(
+            "ast.requisite_edges",
+            lambda: [requisite_edges(c, p) for c, p in parsed],
+            n,
+            edges=len(corpus_edges),
+        ))
+
+    if "graph" in groups:
+        stages.extend(graph_stages("corpus", corpus_edges))
+    return stages
+
+
+def graph_stages(label: str, edges: list[tuple[str, str]], networkx: bool = True) -> list[Stage]:
+    """Graph stages over one edge set; `items` counts ranked nodes."""
+    nodes = len({x for e in edges for x in e})
+    m = len(edges)
+    g = ArrayGraph(edges)
+    stages = [
+        Stage(f"graph.{label}.rank_array", lambda: rank_graph(edges), nodes, "nodes", m),
+        Stage(f"graph.{label}.pagerank_array", g.pagerank, nodes, "nodes", m),
+    ]
+    if networkx:
+        G = build_graph(set(edges))
+        stages += [
+            Stage(f"graph.{label}.levels_networkx", lambda: condensation_longest_levels(G), nodes, "nodes", m),
+            Stage(f"graph.{label}.pagerank_networkx", lambda: nx.pagerank(G), nodes, "nodes", m),
+            Stage(f"graph.{label}.rank_networkx", lambda: rank_networkx(edges), nodes, "nodes", m),
+        ]
+    return stages
+
+
+def run_benchmarks(
+    groups: set[str],
+    sizes: list[int],
+    repeat: int,
+    networkx_max: int,
+    only: str | None = None,
+) -> dict[str, dict[str, Any]]:
+    corpus = Corpus()
+    print(f"[bench] corpus: {len(corpus)} courses from {STRUCT_JS.name} + {RAW_CSV.name}", flush=True)
+    stages = corpus_stages(corpus, groups)
+    if "graph" in groups:
+        for n in sizes:
+            stages.extend(graph_stages(f"synthetic{n}", synthetic_edges(n), networkx=n <= networkx_max))
+
+    results: dict[str, dict[str, Any]] = {}
+    for st in stages:
+        if only and only not in st.name:
+            continue
+        res = results[st.name] = st.measure(repeat)
+        line = (
+            f"{st.name:<40} {res['per_sec']:>12,.0f} {st.unit}/s"
+            f"  {res['seconds'] * 1e3:>10.2f} ms  peak {res['peak_kib']:>10,.0f} KiB"
+        )
+        if st.edges:
+            line += f"  {res['edges_per_sec']:>12,.0f} edges/s"
+        print(line, flush=True)
+    return results
+
+
+# ============================ Baselines ============================
+
+def environment() -> dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "scipy": scipy.__version__,
+        "networkx": nx.__version__,
+    }
+
+
+def save_baseline(path: Path, results: dict[str, dict[str, Any]]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    doc = {
+        "version": BASELINE_VERSION,
+        "saved_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": environment(),
+        "stages": results,
+    }
+    path.write_text(json.dumps(doc, indent=2, sort_keys=True), encoding="utf-8")
+    print(f"[bench] saved baseline → {path}")
+
+
+def compare_baseline(path: Path, results: dict[str, dict[str, Any]], tolerance: float) -> list[str]:
+    """
+    Compare throughput and peak memory with a saved baseline. Returns the
+    regressions: a stage slower than (1 - tolerance) × its baseline rate,
+    or with a peak above (1 + tolerance) × its baseline peak.
+    """
+    doc = json.loads(path.read_text(encoding="utf-8"))
+    if doc.get("version") != BASELINE_VERSION:
+        raise ValueError(f"unsupported baseline version: {doc.get('version')}")
+    env = environment()
+    drift = {k: (v, env.get(k)) for k, v in doc.get("environment", {}).items() if env.get(k) != v}
+    if drift:
+        print(f"[bench] note: baseline environment differs: {drift}")
+
+    base = doc["stages"]
+    regressions = []
+    print(f"\n{'stage':<40} {'rate Δ':>9} {'peak Δ':>9}")
+    for name, res in results.items():
+        old = base.get(name)
+        if not old:
+            print(f"{name:<40} {'new':>9}")
+            continue
+        speed = res["per_sec"] / old["per_sec"] - 1 if old["per_sec"] else 0.0
+        mem = res["peak_kib"] / old["peak_kib"] - 1 if old["peak_kib"] else 0.0
+        flags = []
+        if speed < -tolerance:
+            flags.append("SLOWER")
+        if mem > tolerance:
+            flags.append("MORE MEMORY")
+        print(f"{name:<40} {speed:>+8.1%} {mem:>+8.1%}  {' '.join(flags)}")
+        if flags:
+            regressions.append(f"{name}: {' & '.join(flags).lower()} (rate {speed:+.1%}, peak {mem:+.1%})")
+    for name in sorted(set(base) - set(results)):
+        print(f"{name:<40} {'missing':>9}")
+    return regressions
+
+
+# ============================== CLI ================================
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Benchmark rank.py's parse and graph stages.")
+    ap.add_argument(
+        "--stages",
+        default=",".join(STAGE_GROUPS),
+        help=f"Comma-separated stage groups: {', '.join(STAGE_GROUPS)}",
+    )
+    ap.add_argument("--only", default=None, help="Run only stages whose name contains this text")
+    ap.add_argument("--sizes", default=DEFAULT_SIZES, help="Synthetic graph sizes (courses), comma-separated")
+    ap.add_argument("--repeat", type=int, default=5, help="Timed runs per stage (best is reported)")
+    ap.add_argument(
+        "--networkx-max",
+        type=int,
+        default=100000,
+        help="Largest synthetic graph to also run the networkx stages on",
+    )
+    ap.add_argument("--save", nargs="?", const=str(BASELINE_JS), default=None, help="Save results as a baseline")
+    ap.add_argument(
+        "--compare",
+        nargs="?",
+        const=str(BASELINE_JS),
+        default=None,
+        help="Compare with a baseline; exit 1 on a regression",
+    )
+    ap.add_argument("--tolerance", type=float, default=0.20, help="Allowed relative slowdown / memory growth")
+    return ap.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    groups = {g.strip() for g in args.stages.split(",") if g.strip()}
+    unknown = groups - set(STAGE_GROUPS)
+    if unknown:
+        sys.exit(f"unknown stage group(s): {', '.join(sorted(unknown))}")
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+
+    results = run_benchmarks(groups, sizes, args.repeat, args.networkx_max, args.only)
+
+    regressions: list[str] = []
+    if args.compare:
+        regressions = compare_baseline(Path(args.compare), results, args.tolerance)
+    if args.save:
+        save_baseline(Path(args.save), results)
+    if regressions:
+        print("\n[bench] regressions vs baseline:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
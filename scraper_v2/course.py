@@ -1,23 +1,40 @@
+import bisect
+import gzip
+import hashlib
 import json
 import os
-from flask import Blueprint, jsonify
+import re
+import threading
+from flask import Blueprint, Response, jsonify, request
+from graph_closure import Closure
+from prereq_grammar import collect_codes_from_ast, is_level7
+
+try:
+    import brotli
+except ImportError:  # optional: without it the list is offered gzip / identity only
+    brotli = None
 
 course_bp = Blueprint('course', __name__)
 
-def load_courses_data():
-    data_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'courses.json')
-    try:
-        with open(data_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {}
-    except json.JSONDecodeError:
-        return {}
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'courses.json')
+
+# Brotli 11 is ~25x slower than 9 for ~10% fewer bytes; a new dataset version
+# is encoded before it is swapped in, so this bounds how stale the API runs
+BROTLI_QUALITY = 9
+
+# /api/courses paging (JSON envelope); NDJSON streams everything unless given a limit
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+COURSE_FIELDS = ('name', 'description', 'incompatible', 'units', 'prerequisites')
+FIELD_ALIASES = {'code': 'name'}
+NDJSON_CHUNK = 16 * 1024  # bytes per streamed write; the first record is flushed alone
+MAX_BATCH_CODES = 1000
+JSON_WS = re.compile(r'[ \t\n\r]*')
 
 def extract_incompatible_codes(incompat_data):
     if not incompat_data or 'args' not in incompat_data:
         return []
-    
+
     codes = []
     for arg in incompat_data['args']:
         if arg.get('op') == 'COURSE' and 'code' in arg:
@@ -33,26 +50,411 @@ def format_course_data(course_code, course_data):
         'prerequisites': course_data.get('prereq')
     }
 
+def closure_edges(requisites):
+    """
+    (course, prereq) pairs from code → (prereq AST, coreq AST), with the
+    same rules as rank.requisite_edges: level-7 prereqs and self-loops skipped.
+    """
+    edges = set()
+    for code, asts in requisites.items():
+        for ast in asts:
+            for p in collect_codes_from_ast(ast):
+                if p != code and not is_level7(p):
+                    edges.add((code, p))
+    return edges
+
+# Codings in order of preference at equal q (smallest body first for JSON)
+ENCODERS = {'gzip': lambda data: gzip.compress(data, compresslevel=9, mtime=0)}
+if brotli is not None:
+    ENCODERS = {'br': lambda data: brotli.compress(data, quality=BROTLI_QUALITY), **ENCODERS}
+
+def load_courses(f):
+    """
+    The top-level object of a courses.json file, decoded one member at a
+    time. Each raw_decode is short, so a background reload lets request
+    threads run in between instead of holding the GIL for the whole parse.
+    Malformed input raises json.JSONDecodeError, as json.load would.
+    """
+    text = f.read()
+    decoder = json.JSONDecoder()
+
+    def expect(pos, chars, what):
+        pos = JSON_WS.match(text, pos).end()
+        if pos == len(text) or text[pos] not in chars:
+            raise json.JSONDecodeError(f'Expecting {what}', text, pos)
+        return text[pos], JSON_WS.match(text, pos + 1).end()
+
+    courses = {}
+    _, pos = expect(0, '{', "'{'")
+    if text[pos:pos + 1] == '}':
+        pos += 1
+    else:
+        while True:
+            if text[pos:pos + 1] != '"':
+                raise json.JSONDecodeError('Expecting property name enclosed in double quotes', text, pos)
+            key, pos = decoder.raw_decode(text, pos)
+            _, pos = expect(pos, ':', "':' delimiter")
+            courses[key], pos = decoder.raw_decode(text, pos)
+            ch, pos = expect(pos, ',}', "',' delimiter")
+            if ch == '}':
+                break
+    if JSON_WS.match(text, pos).end() != len(text):
+        raise json.JSONDecodeError('Extra data', text, pos)
+    return courses
+
+def compact_json(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+
+class EncodedBody:
+    """
+    A JSON payload encoded once, plus its gzip (and brotli, if installed)
+    compressions, each built on first use (or up front by prepare()). Each
+    coding gets its own strong ETag derived from the payload digest, so a
+    client's cached copy validates across requests.
+    """
+
+    def __init__(self, payload):
+        # A list is encoded item by item (the same bytes as one dumps) so a
+        # background build doesn't hold the GIL for the whole payload
+        if isinstance(payload, list):
+            self.identity = ('[' + ','.join(map(compact_json, payload)) + ']').encode('utf-8')
+        else:
+            self.identity = compact_json(payload).encode('utf-8')
+        digest = hashlib.sha256(self.identity).hexdigest()[:32]
+        self.codings = [*ENCODERS, 'identity']
+        self.bodies = {'identity': self.identity}
+        self.etags = {coding: digest if coding == 'identity' else f'{digest}-{coding}' for coding in self.codings}
+        self._encode_lock = threading.Lock()
+
+    def body(self, coding):
+        if coding not in self.bodies:
+            with self._encode_lock:
+                if coding not in self.bodies:
+                    self.bodies[coding] = ENCODERS[coding](self.identity)
+        return self.bodies[coding]
+
+    def prepare(self):
+        """Build every compressed body now."""
+        for coding in ENCODERS:
+            self.body(coding)
+
+    def pick(self, accept_encodings):
+        """Best coding the client accepts: highest q, ties going to the preferred coding."""
+        best = None
+        for coding in self.codings:
+            q = accept_encodings[coding] if coding != 'identity' or coding in accept_encodings else 1
+            if q and (best is None or q > best[0]):
+                best = (q, coding)
+        return best[1] if best else 'identity'
+
+    def response(self):
+        """200 with the negotiated coding, or 304 if the client's ETag is current."""
+        coding = self.pick(request.accept_encodings)
+        if any(request.if_none_match.contains_weak(tag) for tag in self.etags.values()):
+            resp = Response(status=304)
+        else:
+            resp = Response(self.body(coding), mimetype='application/json')
+            if coding != 'identity':
+                resp.headers['Content-Encoding'] = coding
+        resp.set_etag(self.etags[coding])
+        resp.headers['Vary'] = 'Accept-Encoding'
+        resp.headers['Cache-Control'] = 'no-cache'  # always revalidate; a match costs only the headers
+        return resp
+
+class CourseSnapshot:
+    """
+    One loaded version of the dataset: formatted records, in file order and
+    by code, plus the requisite graph's transitive closure (built on first use).
+    """
+
+    def __init__(self, stamp=None, courses_data=None):
+        self.stamp = stamp
+        self.courses = [format_course_data(code, info) for code, info in (courses_data or {}).items()]
+        self.by_code = {c['name']: c for c in self.courses}
+        self.codes = sorted(self.by_code)  # cursor order
+        self.list_body = EncodedBody(self.courses) if self.courses else None
+        # Only the coreq ASTs are kept aside (prereqs live in the records) until closure() needs them
+        self._coreqs = {code: info['coreq'] for code, info in (courses_data or {}).items() if info.get('coreq')}
+        self._closure = None
+        self._closure_lock = threading.Lock()
+
+    def closure(self):
+        if self._closure is None:
+            with self._closure_lock:
+                if self._closure is None:
+                    requisites = {c['name']: (c['prerequisites'], self._coreqs.get(c['name'])) for c in self.courses}
+                    self._closure = Closure(closure_edges(requisites))
+                    self._coreqs = None
+        return self._closure
+
+    def select(self, after=None, prefixes=None, levels=None, limit=None):
+        """
+        Codes in code order strictly after the cursor `after`, within the
+        subject `prefixes` (each a contiguous run of the sorted codes) and
+        `levels` (first digit: '1' for MATH1051). Returns (codes, next_cursor);
+        next_cursor is None once nothing matches past this page.
+        """
+        codes = self.codes
+        start = bisect.bisect_right(codes, after) if after else 0
+        if prefixes:
+            # Drop prefixes a shorter one already covers (MATH1 under MATH): the ranges
+            # are then disjoint and ascending, so no code is listed twice
+            kept = []
+            for p in sorted(prefixes):
+                if not (kept and p.startswith(kept[-1])):
+                    kept.append(p)
+            ranges = [(bisect.bisect_left(codes, p), bisect.bisect_left(codes, p + '\uffff')) for p in kept]
+        else:
+            ranges = [(0, len(codes))]
+        page = []
+        for lo, hi in ranges:
+            for i in range(max(lo, start), hi):
+                code = codes[i]
+                if levels and course_level(code) not in levels:
+                    continue
+                if limit is not None and len(page) == limit:
+                    return page, page[-1]
+                page.append(code)
+        return page, None
+
+class CourseStore:
+    """
+    Process-wide course data: parsed and formatted once, then served from
+    memory. Each access stats the file; when its mtime or size changed, the
+    new version is loaded (and its list body compressed) on a background
+    thread while requests keep getting the current snapshot, which is then
+    swapped out by a single assignment. Only the very first load blocks.
+    A file that fails to parse (e.g. caught mid-write) keeps the previous
+    snapshot until the file changes again.
+    """
+
+    def __init__(self, path=DATA_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._snapshot = CourseSnapshot()
+        self._loaded = False
+        self._loader = None  # background reload in progress
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def snapshot(self):
+        stamp = self._file_stamp()
+        if stamp != self._stamp:
+            with self._lock:
+                # Not already reloaded, or being reloaded, by another request
+                if stamp != self._stamp and self._loader is None:
+                    if self._loaded:
+                        self._loader = threading.Thread(target=self._reload, args=(stamp,), name='course-reload', daemon=True)
+                        self._loader.start()
+                    else:
+                        snapshot = self._load(stamp)  # nothing to serve yet
+                        if snapshot is not None:
+                            self._snapshot = snapshot
+                        self._stamp = stamp
+                        self._loaded = True
+        return self._snapshot
+
+    def _load(self, stamp):
+        """The snapshot for `stamp`, or None to keep the current one."""
+        if stamp is None:
+            return CourseSnapshot()
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return CourseSnapshot(stamp, load_courses(f))
+        except FileNotFoundError:
+            return CourseSnapshot()
+        except json.JSONDecodeError:
+            return None
+
+    def _reload(self, stamp):
+        """Background thread: build and pre-compress the new version, then swap it in."""
+        try:
+            snapshot = self._load(stamp)
+            if snapshot is not None and snapshot.list_body:
+                snapshot.list_body.prepare()
+            with self._lock:
+                if snapshot is not None:
+                    self._snapshot = snapshot
+                self._stamp = stamp
+        finally:
+            with self._lock:
+                self._loader = None
+
+    def get(self, course_code):
+        return self.snapshot().by_code.get(course_code)
+
+course_store = CourseStore()
+
+def course_level(code):
+    """First digit of the course number: '2' for STAT2004."""
+    for ch in code:
+        if ch.isdigit():
+            return ch
+    return ''
+
+def split_param(value):
+    return [v.strip() for v in (value or '').split(',') if v.strip()]
+
+def parse_list_query(args, ndjson):
+    """
+    /api/courses query → dict of cursor, prefixes, levels, fields, limit.
+    Raises ValueError (→ 400) on anything malformed.
+    """
+    fields = parse_fields(split_param(args.get('fields'))) if 'fields' in args else None
+
+    levels = set(split_param(args.get('level')))
+    if any(not (len(lv) == 1 and lv.isdigit()) for lv in levels):
+        raise ValueError('level must be single digits, e.g. level=1,2')
+
+    limit = None if ndjson else DEFAULT_PAGE_SIZE
+    if args.get('limit'):
+        try:
+            limit = int(args['limit'])
+        except ValueError:
+            raise ValueError('limit must be an integer') from None
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ValueError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+
+    return {
+        'cursor': args.get('cursor') or None,
+        'prefixes': {p.upper() for p in split_param(args.get('prefix'))},
+        'levels': levels,
+        'fields': fields,
+        'limit': limit,
+    }
+
+def parse_fields(names):
+    """Requested record fields (aliases resolved, "name" always first), or ValueError."""
+    fields = ['name']  # records always say which course they are
+    for f in names:
+        f = FIELD_ALIASES.get(f, f)
+        if f not in COURSE_FIELDS:
+            raise ValueError(f'Unknown field {f!r}; choose from {", ".join(COURSE_FIELDS)}')
+        if f not in fields:
+            fields.append(f)
+    return fields
+
+def batch_lookup(snapshot, codes, fields):
+    """Formatted records for `codes` in request order (duplicates once), plus the codes not found."""
+    courses = []
+    not_found = []
+    seen = set()
+    for code in codes:
+        code = code.strip().upper()
+        if not code or code in seen:
+            continue
+        seen.add(code)
+        record = snapshot.by_code.get(code)
+        if record is None:
+            not_found.append(code)
+        else:
+            courses.append(project(record, fields))
+    return {'courses': courses, 'not_found': not_found}
+
+def batch_response(snapshot, codes, field_names):
+    if len(codes) > MAX_BATCH_CODES:
+        return jsonify({'error': f'At most {MAX_BATCH_CODES} codes per request'}), 400
+    try:
+        fields = parse_fields(field_names) if field_names is not None else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(batch_lookup(snapshot, codes, fields))
+
+def wants_ndjson():
+    if request.args.get('format') == 'ndjson':
+        return True
+    best = request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson'])
+    return best == 'application/x-ndjson'
+
+def project(record, fields):
+    return record if fields is None else {f: record[f] for f in fields}
+
+def ndjson_chunks(records):
+    """One JSON document per line, written in ~NDJSON_CHUNK batches after the first."""
+    buf = []
+    size = 0
+    first = True
+    for record in records:
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':'), sort_keys=True) + '\n'
+        buf.append(line)
+        size += len(line)
+        if first or size >= NDJSON_CHUNK:
+            yield ''.join(buf)
+            buf = []
+            size = 0
+            first = False
+    if buf:
+        yield ''.join(buf)
+
 @course_bp.route('/courses', methods=['GET'])
 def get_all_courses():
-    courses_data = load_courses_data()
-    
-    if not courses_data:
+    snapshot = course_store.snapshot()
+
+    if 'codes' in request.args:
+        fields = split_param(request.args.get('fields')) if 'fields' in request.args else None
+        return batch_response(snapshot, split_param(request.args.get('codes')), fields)
+
+    if not snapshot.courses:
         return jsonify({'error': 'No courses data found'}), 404
-    
-    formatted_courses = []
-    for course_code, course_info in courses_data.items():
-        formatted_courses.append(format_course_data(course_code, course_info))
-    return jsonify(formatted_courses)
+
+    ndjson = wants_ndjson()
+    if not ndjson and not any(k in request.args for k in ('limit', 'cursor', 'fields', 'prefix', 'level')):
+        return snapshot.list_body.response()
+
+    try:
+        query = parse_list_query(request.args, ndjson)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    codes, next_cursor = snapshot.select(query['cursor'], query['prefixes'], query['levels'], query['limit'])
+    records = (project(snapshot.by_code[c], query['fields']) for c in codes)
+    if ndjson:
+        resp = Response(ndjson_chunks(records), mimetype='application/x-ndjson')
+        if next_cursor:
+            resp.headers['X-Next-Cursor'] = next_cursor
+        return resp
+    return jsonify({'courses': list(records), 'next_cursor': next_cursor})
 
 @course_bp.route('/courses/<course_code>', methods=['GET'])
 def get_course(course_code):
-    courses_data = load_courses_data()
-    
-    if course_code not in courses_data:
+    formatted_course = course_store.get(course_code)
+
+    if formatted_course is None:
         return jsonify({'error': f'Course {course_code} not found'}), 404
-    
-    course_info = courses_data[course_code]
-    formatted_course = format_course_data(course_code, course_info)
+
     return jsonify(formatted_course)
 
+@course_bp.route('/courses:batch', methods=['POST'])
+def batch_courses():
+    """Body: {"codes": ["MATH1051", ...], "fields": [...] (optional)} → {"courses": [...], "not_found": [...]}."""
+    body = request.get_json(silent=True)
+    codes = body.get('codes') if isinstance(body, dict) else None
+    fields = body.get('fields') if isinstance(body, dict) else None
+    if not isinstance(codes, list) or not all(isinstance(c, str) for c in codes):
+        return jsonify({'error': 'Expected a JSON body {"codes": [course codes]}'}), 400
+    if fields is not None and not (isinstance(fields, list) and all(isinstance(f, str) for f in fields)):
+        return jsonify({'error': '"fields" must be a list of field names'}), 400
+    return batch_response(course_store.snapshot(), codes, fields)
+
+def closure_response(course_code, direction):
+    snapshot = course_store.snapshot()
+    if course_code not in snapshot.by_code:
+        return jsonify({'error': f'Course {course_code} not found'}), 404
+    codes = snapshot.closure().closure(course_code, direction)
+    return jsonify({'course': course_code, direction: codes, 'count': len(codes)})
+
+@course_bp.route('/courses/<course_code>/ancestors', methods=['GET'])
+def get_course_ancestors(course_code):
+    """Every course `course_code` transitively requires (prerequisites of prerequisites, ...)."""
+    return closure_response(course_code, 'ancestors')
+
+@course_bp.route('/courses/<course_code>/descendants', methods=['GET'])
+def get_course_descendants(course_code):
+    """Every course that transitively requires `course_code`: what it unlocks downstream."""
+    return closure_response(course_code, 'descendants')
@@ -0,0 +1,224 @@
+# crawl_bench.py
+# ------------------------------------------------------------
+# End-to-end crawl throughput against a local mock_site.py: starts the
+# mock in-process, points rank.run() at it (harvest → crawl → rank →
+# export, in a scratch output directory) and reports
+#   - pages/sec over the crawl, total requests by status
+#   - p50 / p90 / p99 fetch latency as seen by the crawler
+#   - retries (429/503/transport errors) and the HTTP versions used
+#   - where the crawler waited (rank.METRICS: limiter, queues, parse, write)
+#
+# Examples:
+#   python crawl_bench.py --workers 64 --rps 200 --burst 50
+#   python crawl_bench.py --latency lognormal:0.05,0.6 --error-rate 0.03 --adaptive --rps 20
+#   python crawl_bench.py --data big.json --http2 --json runs/h2.json
+#
+# --data takes any prereq_structured.json-style file, e.g. from
+# src/assets/generate_sample_data.py --format structured.
+# ------------------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+import rank
+from mock_site import DEFAULT_DATA, Http2Server, Latency, MockSite, serve_http1
+
+
+class _TimedClient:
+    """Stands in for the httpx client inside one limited_get call: times only client.get."""
+
+    def __init__(self, client: Any) -> None:
+        self.client = client
+        self.t0 = self.seconds = 0.0
+
+    async def get(self, *args: Any, **kwargs: Any) -> Any:
+        self.t0 = time.perf_counter()
+        try:
+            return await self.client.get(*args, **kwargs)
+        finally:
+            self.seconds = time.perf_counter() - self.t0
+
+
+class FetchRecorder:
+    """
+    Wraps rank.limited_get: one (start, seconds, status, http version) per
+    attempt. Times the HTTP GET itself, not the token-bucket wait before it
+    (that is limiter_wait_seconds), so latency matches fetch_seconds.
+    """
+
+    def __init__(self) -> None:
+        self.samples: list[tuple[float, float, int, str]] = []
+        self._orig = rank.limited_get
+
+    async def limited_get(self, client: Any, url: str, headers: dict[str, str] | None = None) -> Any:
+        timed = _TimedClient(client)
+        r = await self._orig(timed, url, headers)
+        status = r.status_code if r is not None else 0
+        self.samples.append((timed.t0, timed.seconds, status, r.http_version if r is not None else "-"))
+        return r
+
+    def __enter__(self) -> FetchRecorder:
+        rank.limited_get = self.limited_get
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        rank.limited_get = self._orig
+
+
+def percentile(sorted_xs: list[float], q: float) -> float:
+    if not sorted_xs:
+        return 0.0
+    return sorted_xs[min(len(sorted_xs) - 1, int(q * len(sorted_xs)))]
+
+
+def summarize(rec: FetchRecorder, wall: float, site: MockSite) -> dict[str, Any]:
+    s = rec.samples
+    ok = sorted(dt for _, dt, st, _ in s if st in (200, 304))
+    by_status: dict[str, int] = {}
+    versions: dict[str, int] = {}
+    for _, _, st, ver in s:
+        by_status[str(st)] = by_status.get(str(st), 0) + 1
+        versions[ver] = versions.get(ver, 0) + 1
+    span = (max(t + dt for t, dt, _, _ in s) - min(t for t, _, _, _ in s)) if s else 0.0
+    server = site.snapshot()["requests"]
+    pages = sum(n for k, n in server.items() if k in ("course 200", "course 304"))
+    return {
+        "requests": len(s),
+        "pages": pages,
+        "crawl_seconds": span,
+        "wall_seconds": wall,
+        "pages_per_sec": pages / span if span else 0.0,
+        "requests_per_sec": len(s) / span if span else 0.0,
+        "latency_ms": {
+            "p50": percentile(ok, 0.50) * 1e3,
+            "p90": percentile(ok, 0.90) * 1e3,
+            "p99": percentile(ok, 0.99) * 1e3,
+            "max": (ok[-1] if ok else 0.0) * 1e3,
+        },
+        "retries": sum(n for st, n in by_status.items() if st not in ("200", "304", "404")),
+        "by_status": dict(sorted(by_status.items())),
+        "http_versions": versions,
+        "server": server,
+        "metrics": rank.METRICS.snapshot(),
+    }
+
+
+def self_signed_cert(tmp: Path) -> tuple[str, str]:
+    """localhost cert + key via the openssl CLI (for --http2)."""
+    cert, key = tmp / "cert.pem", tmp / "key.pem"
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+            "-keyout", str(key), "-out", str(cert), "-subj", "/CN=localhost",
+            "-addext", "subjectAltName=DNS:localhost,IP:127.0.0.1",
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return str(cert), str(key)
+
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Benchmark a full rank.py crawl against a local mock site.")
+    ap.add_argument("--data", default=str(DEFAULT_DATA), help="prereq_structured.json-style dataset to serve")
+    ap.add_argument("--latency", default="const:0.02", help="Mock response delay (see mock_site.py)")
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--error-status", default="429,503")
+    ap.add_argument("--retry-after", type=int, default=1)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--http2", action="store_true", help="Serve h2 over TLS (hypercorn + a throwaway cert)")
+    ap.add_argument("--years", default="2025")
+    ap.add_argument("--prefixes", default="", help="Harvest only these prefixes (crawl still recurses)")
+    ap.add_argument("--workers", type=int, default=64)
+    ap.add_argument("--rps", type=float, default=100.0)
+    ap.add_argument("--burst", type=int, default=20)
+    ap.add_argument("--adaptive", action="store_true")
+    ap.add_argument("--min-rps", type=float, default=None)
+    ap.add_argument("--max-rps", type=float, default=None)
+    ap.add_argument("--parse-workers", type=int, default=None)
+    ap.add_argument("--full-ast", action="store_true")
+    ap.add_argument("--metrics-port", type=int, default=None, help="Expose rank.py's live metrics endpoint")
+    ap.add_argument("--out", default=None, help="Output directory for the crawl (default: a temp dir)")
+    ap.add_argument("--json", default=None, help="Also write the summary as JSON here")
+    return ap.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    with tempfile.TemporaryDirectory(prefix="crawl_bench_") as tmp:
+        tmp_path = Path(tmp)
+        site = MockSite.from_file(
+            Path(args.data),
+            latency=Latency(args.latency),
+            error_rate=args.error_rate,
+            error_status=tuple(int(s) for s in args.error_status.split(",") if s.strip()),
+            retry_after=args.retry_after,
+            seed=args.seed,
+        )
+        if args.http2:
+            cert, key = self_signed_cert(tmp_path)
+            os.environ["SSL_CERT_FILE"] = cert  # httpx trusts it (trust_env)
+            server: Any = Http2Server(site, cert, key)
+            base = f"https://localhost:{server.port}/"
+        else:
+            server = serve_http1(site)
+            base = f"http://127.0.0.1:{server.server_address[1]}/"
+        print(f"[bench] mock: {len(site.pages)} courses at {base} latency={site.latency.spec} "
+              f"errors={site.error_rate:g}", flush=True)
+
+        # Crawl outputs go to a scratch directory, not ./uq_fast
+        rank.OUT = Path(args.out) if args.out else tmp_path / "uq_fast"
+        t0 = time.perf_counter()
+        try:
+            with FetchRecorder() as rec:
+                asyncio.run(rank.run(
+                    years=[y.strip() for y in args.years.split(",") if y.strip()],
+                    prefixes=[p.strip() for p in args.prefixes.split(",") if p.strip()] or None,
+                    workers=args.workers,
+                    level_range=None,
+                    want_ast=args.full_ast,
+                    want_rank=True,
+                    rps=args.rps,
+                    burst=args.burst,
+                    cache_mode="off",
+                    parse_workers=args.parse_workers,
+                    adaptive=args.adaptive,
+                    min_rps=args.min_rps,
+                    max_rps=args.max_rps,
+                    base_url=base,
+                    metrics_port=args.metrics_port,
+                ))
+        finally:
+            server.shutdown()
+        wall = time.perf_counter() - t0
+
+    res = summarize(rec, wall, site)
+    res["config"] = {k: v for k, v in vars(args).items() if k not in ("json", "out")}
+    lat = res["latency_ms"]
+    print(
+        f"\n[bench] {res['pages']} pages in {res['crawl_seconds']:.2f}s → {res['pages_per_sec']:.1f} pages/s "
+        f"({res['requests']} requests, {res['requests_per_sec']:.1f} req/s; wall {wall:.2f}s incl. ranking)\n"
+        f"[bench] fetch latency p50 {lat['p50']:.1f}ms  p90 {lat['p90']:.1f}ms  p99 {lat['p99']:.1f}ms  "
+        f"max {lat['max']:.1f}ms\n"
+        f"[bench] retries {res['retries']}  by status {res['by_status']}  http {res['http_versions']}"
+    )
+    for name, h in res["metrics"]["histograms"].items():
+        if not name.startswith("fetch_seconds"):
+            print(f"[bench]   {name:<42} n={h['count']:<6} total {h['sum']:8.2f}s  p50 {h['p50'] * 1e3:8.2f}ms  "
+                  f"p99 {h['p99'] * 1e3:8.2f}ms")
+    if args.json:
+        Path(args.json).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.json).write_text(json.dumps(res, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+# crawl_metrics.py
+# ------------------------------------------------------------
+# In-process crawl instrumentation for rank.py: counters, gauges and
+# fixed-bucket latency histograms, keyed by name + labels.
+#
+# Exposed two ways:
+#   - Prometheus text format (0.0.4) from a small HTTP server thread:
+#       python rank.py --years 2025 --metrics-port 9108 ...
+#       curl localhost:9108/metrics        (or /metrics.json)
+#   - JSON lines appended to uq_fast/metrics.jsonl on every heartbeat,
+#     one snapshot per line (histograms as count/sum/p50/p90/p99)
+#
+# Usage:
+#   m = Metrics("uq_crawl", {"fetch_seconds": "Time per HTTP GET"})
+#   m.observe("fetch_seconds", 0.12, status="200")
+#   m.inc("retries_total", status="429")
+#   with m.timer("write_seconds"): ...
+# ------------------------------------------------------------
+
+from __future__ import annotations
+
+import bisect
+import contextlib
+import json
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Iterator
+
+# Seconds; spans a cached parse (~100µs) to a long Retry-After cool-off
+DEFAULT_BUCKETS = (
+    0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class Histogram:
+    """Fixed upper-bound buckets (+Inf implied), with sum and count."""
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.bounds = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate, interpolating linearly inside the bucket (like histogram_quantile)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                if i == len(self.bounds):
+                    return self.bounds[-1]
+                lo = self.bounds[i - 1] if i else 0.0
+                return lo + (self.bounds[i] - lo) * (rank - seen) / n
+            seen += n
+        return self.bounds[-1]
+
+
+def _fmt(v: float) -> str:
+    if math.isinf(v):
+        return "+Inf"
+    return repr(float(v)) if v != int(v) else str(int(v))
+
+
+def _label_str(labels: Labels, extra: tuple[str, str] | None = None) -> str:
+    items = labels + ((extra,) if extra else ())
+    if not items:
+        return ""
+    esc = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, esc)) + "}"
+
+
+class Metrics:
+    """
+    Thread-safe registry. The crawl updates it from the event loop; the
+    metrics server thread only reads (render / snapshot) under the lock.
+    `help` maps metric names (without prefix) to their HELP text.
+    """
+
+    def __init__(self, prefix: str = "", help: dict[str, str] | None = None):
+        self.prefix = prefix + "_" if prefix else ""
+        self.help = help or {}
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.counters: dict[tuple[str, Labels], float] = {}
+        self.gauges: dict[tuple[str, Labels], float] = {}
+        self.histograms: dict[tuple[str, Labels], Histogram] = {}
+
+    def inc(self, name: str, n: float = 1.0, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0.0) + n
+
+    def set(self, name: str, value: float, **labels: str) -> None:
+        with self.lock:
+            self.gauges[(name, tuple(sorted(labels.items())))] = float(value)
+
+    def observe(self, name: str, seconds: float, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            h = self.histograms.get(key)
+            if h is None:
+                h = self.histograms[key] = Histogram()
+            h.observe(seconds)
+
+    @contextlib.contextmanager
+    def timer(self, name: str, **labels: str) -> Iterator[None]:
+        """Observe the wall time of the block (awaits included)."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0, **labels)
+
+    # -------- exposition --------
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format 0.0.4."""
+        lines: list[str] = []
+        with self.lock:
+            families: dict[str, tuple[str, list[tuple[Labels, Any]]]] = {}
+            for kind, table in (
+                ("counter", self.counters),
+                ("gauge", self.gauges),
+                ("histogram", self.histograms),
+            ):
+                for (name, labels), v in sorted(table.items(), key=lambda kv: kv[0]):
+                    families.setdefault(name, (kind, []))[1].append((labels, v))
+
+            for name, (kind, series) in sorted(families.items()):
+                full = self.prefix + name
+                if name in self.help:
+                    lines.append(f"# HELP {full} {self.help[name]}")
+                lines.append(f"# TYPE {full} {kind}")
+                for labels, v in series:
+                    if kind != "histogram":
+                        lines.append(f"{full}{_label_str(labels)} {_fmt(v)}")
+                        continue
+                    cum = 0
+                    for bound, n in zip((*v.bounds, math.inf), v.counts):
+                        cum += n
+                        lines.append(f"{full}_bucket{_label_str(labels, ('le', _fmt(bound)))} {cum}")
+                    lines.append(f"{full}_sum{_label_str(labels)} {_fmt(v.sum)}")
+                    lines.append(f"{full}_count{_label_str(labels)} {v.count}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict[str, Any]:
+        """Plain-JSON view: histograms summarised as count/sum/p50/p90/p99."""
+
+        def key(name: str, labels: Labels) -> str:
+            return name + _label_str(labels)
+
+        with self.lock:
+            return {
+                "ts": round(time.time(), 3),
+                "uptime": round(time.time() - self.started, 3),
+                "counters": {key(n, l): v for (n, l), v in sorted(self.counters.items())},
+                "gauges": {key(n, l): v for (n, l), v in sorted(self.gauges.items())},
+                "histograms": {
+                    key(n, l): {
+                        "count": h.count,
+                        "sum": round(h.sum, 6),
+                        "p50": round(h.quantile(0.50), 6),
+                        "p90": round(h.quantile(0.90), 6),
+                        "p99": round(h.quantile(0.99), 6),
+                    }
+                    for (n, l), h in sorted(self.histograms.items())
+                },
+            }
+
+    def write_jsonl(self, path: Path, **extra: Any) -> None:
+        """Append one snapshot line (plus `extra` fields) to `path`."""
+        line = json.dumps({**extra, **self.snapshot()}, separators=(",", ":"))
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+# ============================ Endpoint =============================
+
+class _Handler(BaseHTTPRequestHandler):
+    metrics: Metrics
+
+    def do_GET(self) -> None:
+        path = self.path.split("?", 1)[0]
+        if path in ("/", "/metrics"):
+            body = self.metrics.render_prometheus().encode("utf-8")
+            ctype = "text/plain; version=0.0.4; charset=utf-8"
+        elif path == "/metrics.json":
+            body = json.dumps(self.metrics.snapshot()).encode("utf-8")
+            ctype = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args: Any) -> None:  # scrapes every few seconds; keep stdout for the crawl
+        pass
+
+
+def serve_metrics(metrics: Metrics, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Serve /metrics (Prometheus text) and /metrics.json from a daemon thread."""
+    handler = type("Handler", (_Handler,), {"metrics": metrics})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,260 @@
+# crawl_state.py
+# ------------------------------------------------------------
+# Compact in-memory crawl state for rank.py: course codes interned to
+# dense integer ids, requisite edges / conflict pairs in growable integer
+# arrays with an open-addressing hash index, and per-course text rows
+# spilled to an anonymous temp file.
+#
+# Per course / pair (CPython, 64-bit), roughly:
+#   - code:      one str + dict/list slots (vs. one str per mention, ~57 B each)
+#   - pair:      8-16 B  (vs. a 2-tuple in a set, ~90 B, plus its strings)
+#   - text row:  8 B offset in memory, the row itself on disk
+#
+# Usage:
+#   st = CrawlState(spill_dir=out.root)
+#   st.add_edge("MATH2001", "MATH1051")  → True (new) / False (duplicate)
+#   st.put_row("MATH2001", (url, title, raw_pr, raw_inc, units)); st.row("MATH2001")
+#   st.edge_pairs()  → (course, prereq) code pairs, generated from the ids
+#   st.pairs_state() / st.load_pairs(...)  → compact checkpoint form
+# ------------------------------------------------------------
+
+from __future__ import annotations
+
+import base64
+import json
+import tempfile
+from array import array
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+
+class CodeTable:
+    """
+    Course code ↔ dense id (0, 1, 2, ... in first-seen order). The first
+    str seen for a code is the only one kept; every later mention (a fresh
+    str from each parsed page) maps to the same id and can be dropped.
+    """
+
+    def __init__(self) -> None:
+        self._ids: dict[str, int] = {}
+        self._codes: list[str] = []
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def id(self, code: str) -> int:
+        """Id of `code`, assigning the next one if it is new."""
+        i = self._ids.get(code)
+        if i is None:
+            i = self._ids[code] = len(self._codes)
+            self._codes.append(code)
+        return i
+
+    def get(self, code: str) -> int | None:
+        return self._ids.get(code)
+
+    def code(self, i: int) -> str:
+        return self._codes[i]
+
+    def as_list(self) -> list[str]:
+        """Every code, indexed by id (the table's own list: don't mutate)."""
+        return self._codes
+
+
+class IdBits:
+    """Set of small non-negative ids as a bytearray (one byte per id)."""
+
+    def __init__(self) -> None:
+        self._bits = bytearray()
+        self._n = 0
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __contains__(self, i: int) -> bool:
+        return i < len(self._bits) and self._bits[i] == 1
+
+    def add(self, i: int) -> bool:
+        if i >= len(self._bits):
+            self._bits.extend(bytes(max(i + 1 - len(self._bits), len(self._bits) // 2, 64)))
+        if self._bits[i]:
+            return False
+        self._bits[i] = 1
+        self._n += 1
+        return True
+
+    def __iter__(self) -> Iterator[int]:
+        return (i for i, b in enumerate(self._bits) if b)
+
+
+class PairSet:
+    """
+    Insertion-ordered set of (a, b) id pairs. Pairs live in one array('q')
+    as a << 32 | b; dedup goes through an open-addressing (linear probing)
+    table of 1-based int32 positions in that array, kept at most half full.
+    """
+
+    _MULT = 0x9E3779B97F4A7C15  # Fibonacci hashing: spreads the packed pairs' low bits
+
+    def __init__(self) -> None:
+        self._pairs = array("q")
+        self._index = array("i", bytes(4 * 1024))
+        self._mask = 1023
+
+    def __len__(self) -> int:
+        return len(self._pairs)
+
+    def _slot(self, key: int) -> int:
+        """Slot holding `key`, or the empty slot where it would go."""
+        mask = self._mask
+        i = ((key * self._MULT) >> 24) & mask
+        index, pairs = self._index, self._pairs
+        while True:
+            j = index[i]
+            if j == 0 or pairs[j - 1] == key:
+                return i
+            i = (i + 1) & mask
+
+    def add(self, a: int, b: int) -> bool:
+        """Insert (a, b); False if it was already present."""
+        key = a << 32 | b
+        i = self._slot(key)
+        if self._index[i]:
+            return False
+        self._pairs.append(key)
+        self._index[i] = len(self._pairs)
+        if 2 * len(self._pairs) > self._mask:
+            self._grow()
+        return True
+
+    def __contains__(self, pair: tuple[int, int]) -> bool:
+        return self._index[self._slot(pair[0] << 32 | pair[1])] != 0
+
+    def _grow(self) -> None:
+        self._mask = 2 * self._mask + 1
+        self._index = array("i", bytes(4 * (self._mask + 1)))
+        for n, key in enumerate(self._pairs, 1):
+            self._index[self._slot(key)] = n
+
+    def __iter__(self) -> Iterator[tuple[int, int]]:
+        for key in self._pairs:
+            yield key >> 32, key & 0xFFFFFFFF
+
+    def packed(self) -> array:
+        """The pairs as a << 32 | b in insertion order (the backing array: don't mutate)."""
+        return self._pairs
+
+
+class TextSpill:
+    """
+    Per-id text rows (tuples of str) in an anonymous temp file: memory
+    holds one file offset per id. Re-putting an id appends a new row.
+    """
+
+    def __init__(self, spill_dir: Path | None = None):
+        self._f = tempfile.TemporaryFile(dir=spill_dir, prefix=".crawl_text_")
+        self._offsets = array("q")
+        self._end = 0
+        self._n = 0
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __contains__(self, i: int) -> bool:
+        return i < len(self._offsets) and self._offsets[i] >= 0
+
+    def put(self, i: int, row: Iterable[str]) -> None:
+        line = (json.dumps(list(row), ensure_ascii=False) + "\n").encode("utf-8")
+        if i >= len(self._offsets):
+            self._offsets.extend([-1] * (i + 1 - len(self._offsets)))
+        if self._offsets[i] < 0:
+            self._n += 1
+        self._f.seek(self._end)
+        self._f.write(line)
+        self._offsets[i] = self._end
+        self._end += len(line)
+
+    def get(self, i: int) -> tuple[str, ...] | None:
+        if i not in self:
+            return None
+        self._f.seek(self._offsets[i])
+        return tuple(json.loads(self._f.readline()))
+
+    def ids(self) -> Iterator[int]:
+        return (i for i, off in enumerate(self._offsets) if off >= 0)
+
+    def close(self) -> None:
+        self._f.close()
+
+
+class CrawlState:
+    """
+    Everything a crawl accumulates, keyed by code id:
+      - rows: (url, title, raw_pr, raw_inc, units) per finished course (TextSpill)
+      - edges: (course, prereq) pairs; conflicts: sorted (a, b) pairs
+    Code-level helpers keep call sites in terms of course codes.
+    """
+
+    def __init__(self, codes: CodeTable | None = None, spill_dir: Path | None = None):
+        self.codes = codes or CodeTable()
+        self.rows = TextSpill(spill_dir)
+        self.edges = PairSet()
+        self.conflicts = PairSet()
+
+    # -------- courses --------
+
+    def put_row(self, code: str, row: tuple[str, str, str, str, str]) -> None:
+        self.rows.put(self.codes.id(code), row)
+
+    def row(self, code: str) -> tuple[str, ...] | None:
+        i = self.codes.get(code)
+        return None if i is None else self.rows.get(i)
+
+    def done_codes(self) -> list[str]:
+        """Sorted codes of every finished course."""
+        return sorted(self.codes.code(i) for i in self.rows.ids())
+
+    # -------- pairs --------
+
+    def add_edge(self, course: str, prereq: str) -> bool:
+        return self.edges.add(self.codes.id(course), self.codes.id(prereq))
+
+    def add_conflict(self, a: str, b: str) -> bool:
+        return self.conflicts.add(self.codes.id(a), self.codes.id(b))
+
+    def _code_pairs(self, pairs: PairSet) -> Iterator[tuple[str, str]]:
+        code = self.codes.code
+        return ((code(a), code(b)) for a, b in pairs)
+
+    def edge_pairs(self) -> Iterator[tuple[str, str]]:
+        return self._code_pairs(self.edges)
+
+    def conflict_pairs(self) -> Iterator[tuple[str, str]]:
+        return self._code_pairs(self.conflicts)
+
+    # -------- checkpoints --------
+
+    def pairs_state(self) -> dict[str, Any]:
+        """
+        Codes by id plus both pair arrays as base64 of their raw int64s
+        (native byte order): about 11 B of JSON per pair, with no tuple or
+        str built per pair.
+        """
+        return {
+            "codes": self.codes.as_list(),
+            "edges": base64.b64encode(self.edges.packed().tobytes()).decode("ascii"),
+            "conflicts": base64.b64encode(self.conflicts.packed().tobytes()).decode("ascii"),
+        }
+
+    def load_pairs(self, saved: dict[str, Any]) -> None:
+        """Restore pairs_state() output into a fresh state (before any other code gets an id)."""
+        for code in saved["codes"]:
+            self.codes.id(code)
+        for name, pairs in (("edges", self.edges), ("conflicts", self.conflicts)):
+            keys = array("q")
+            keys.frombytes(base64.b64decode(saved[name]))
+            for key in keys:
+                pairs.add(key >> 32, key & 0xFFFFFFFF)
+
+    def close(self) -> None:
+        self.rows.close()
@@ -0,0 +1,170 @@
+# graph_closure.py
+# ------------------------------------------------------------
+# Transitive prerequisite closure of the prereq graph, precomputed once:
+# for every course, everything it needs first (ancestors) and everything
+# it leads to (descendants).
+#
+# Built over the SCC condensation (graph_engine.ArrayGraph.condensation,
+# the same canonical SCC ids as rank.condensation_longest_levels), whose
+# ids are a topological order: every prereq SCC has a smaller id than the
+# courses it unlocks. So one pass in id order gives every SCC's ancestor
+# set, and one pass in reverse its descendant set, each an int bitset
+# over SCC ids (bit s = SCC s) while it is built. Each finished set is
+# stored in whichever form is smaller:
+#   - dense:  (offset, bits) — the bitset shifted down by its lowest bit,
+#             so it covers only the id span it uses, not 0..s
+#   - sparse: array('i') of sorted SCC ids, when 32 bits per member beat
+#             one bit per id of the span (typical: tens of ancestors
+#             scattered over thousands of ids)
+# Courses in one cycle share their sets.
+#
+# Usage:
+#   cl = Closure(edges_pairs)            # (course, prereq) pairs
+#   cl.ancestors("MATH2001")  → sorted codes it transitively requires
+#   cl.descendants("MATH1051") → sorted codes it transitively unlocks
+#   cl.count("MATH1051", "descendants") → size, without listing
+# ------------------------------------------------------------
+
+from __future__ import annotations
+
+from array import array
+from typing import Iterable, Union
+
+import numpy as np
+
+from graph_engine import ArrayGraph
+
+SccSet = Union[tuple[int, int], array]  # dense (offset, bits) or sparse sorted ids
+
+
+class Closure:
+    """
+    Ancestor / descendant SCC sets per SCC of a (course, prereq) edge set.
+    A lookup is one dict hit plus reading the stored set (an id array, or
+    unpacking the bitset's span), then the size of the answer.
+    """
+
+    def __init__(self, edges_pairs: Iterable[tuple[str, str]]):
+        g = ArrayGraph(edges_pairs)
+        if g.n:
+            scc, k, cs, cd = g.condensation()
+        else:
+            empty = np.zeros(0, dtype=np.int64)
+            scc, k, cs, cd = empty, 0, empty, empty
+
+        self.k = k
+        self.scc_of: dict[str, int] = dict(zip(g.codes, scc.tolist()))
+        self.members: list[list[str]] = [[] for _ in range(k)]
+        for code in sorted(g.codes):
+            self.members[self.scc_of[code]].append(code)
+
+        # Condensation edges point prereq SCC → course SCC, with cs < cd
+        order = np.lexsort((cs, cd))
+        self.ancestor_sets = self._propagate(k, cd[order].tolist(), cs[order].tolist(), range(k))
+        order = np.lexsort((cd, cs))
+        self.descendant_sets = self._propagate(k, cs[order].tolist(), cd[order].tolist(), range(k - 1, -1, -1))
+
+    @staticmethod
+    def _propagate(k: int, to: list[int], frm: list[int], sweep: Iterable[int]) -> list[SccSet]:
+        """
+        set[t] = union of (set[f] | {f}) over edges f → t, visiting t in
+        `sweep` order (every f is finished before any t it points to).
+        `to` must be sorted so each t's edges are one run.
+        """
+        runs: dict[int, tuple[int, int]] = {}
+        start = 0
+        for i in range(1, len(to) + 1):
+            if i == len(to) or to[i] != to[start]:
+                runs[to[start]] = (start, i)
+                start = i
+        empty: SccSet = (0, 0)
+        sets = [empty] * k
+        for t in sweep:
+            run = runs.get(t)
+            if run is None:
+                continue
+            ids: set[int] = set()  # sparse inputs merge as ids, dense ones as bits
+            acc = 0
+            for f in frm[run[0]:run[1]]:
+                stored = sets[f]
+                if isinstance(stored, array):
+                    ids.update(stored)
+                else:
+                    acc |= stored[1] << stored[0]
+                ids.add(f)
+            if acc:
+                sets[t] = _pack(acc | _ids_to_bits(sorted(ids)))
+            else:
+                sets[t] = _pack_ids(sorted(ids))
+        return sets
+
+    def __contains__(self, code: str) -> bool:
+        return code in self.scc_of
+
+    def _scc_ids(self, code: str, direction: str) -> tuple[int, list[int]]:
+        """The SCC of `code` and the SCC ids in its closure."""
+        s = self.scc_of[code]
+        stored = (self.ancestor_sets if direction == "ancestors" else self.descendant_sets)[s]
+        if isinstance(stored, array):
+            return s, stored.tolist()
+        off, bits = stored
+        return s, [off + i for i in _bit_ids(bits)]
+
+    def count(self, code: str, direction: str) -> int:
+        """Size of the closure of `code` ("ancestors" / "descendants"); 0 if not in the graph."""
+        if code not in self.scc_of:
+            return 0
+        s, ids = self._scc_ids(code, direction)
+        # Other members of its own SCC reach it and are reached by it
+        return len(self.members[s]) - 1 + sum(len(self.members[i]) for i in ids)
+
+    def closure(self, code: str, direction: str) -> list[str]:
+        """Sorted codes in the closure of `code`; [] if it has no requisite edges."""
+        if code not in self.scc_of:
+            return []
+        s, ids = self._scc_ids(code, direction)
+        out = [c for c in self.members[s] if c != code]
+        for i in ids:
+            out.extend(self.members[i])
+        out.sort()
+        return out
+
+    def ancestors(self, code: str) -> list[str]:
+        return self.closure(code, "ancestors")
+
+    def descendants(self, code: str) -> list[str]:
+        return self.closure(code, "descendants")
+
+
+def _pack(bits: int) -> SccSet:
+    """A non-empty bitset in its smaller stored form."""
+    off = (bits & -bits).bit_length() - 1
+    bits >>= off
+    if 32 * bits.bit_count() < bits.bit_length():
+        return array("i", [off + i for i in _bit_ids(bits)])
+    return (off, bits)
+
+
+def _pack_ids(ids: list[int]) -> SccSet:
+    """Non-empty sorted ids in their smaller stored form."""
+    if 32 * len(ids) < ids[-1] - ids[0] + 1:
+        return array("i", ids)
+    return (ids[0], _ids_to_bits(ids) >> ids[0])
+
+
+def _ids_to_bits(ids: list[int]) -> int:
+    """Bitset of non-empty sorted ids."""
+    lo = ids[0]
+    buf = bytearray((ids[-1] - lo) // 8 + 1)
+    for i in ids:
+        i -= lo
+        buf[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buf, "little") << lo
+
+
+def _bit_ids(bits: int) -> list[int]:
+    """Positions of the set bits of a non-negative int."""
+    if not bits:
+        return []
+    raw = np.frombuffer(bits.to_bytes((bits.bit_length() + 7) // 8, "little"), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(raw, bitorder="little")).tolist()
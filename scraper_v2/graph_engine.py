@@ -0,0 +1,243 @@
+# graph_engine.py
+# ------------------------------------------------------------
+# Array-backed ranking engine for the prereq graph (numpy + scipy.sparse).
+# Replaces the networkx path in rank.py:
+#   - course codes interned to int ids (networkx node insertion order)
+#   - CSR adjacency
+#   - SCCs via scipy's iterative strong-components labelling
+#   - canonical SCC ids + topological order over the condensation
+#   - longest-path levels by vectorized layered Kahn
+#   - PageRank by sparse power iteration (same arithmetic as nx.pagerank)
+#
+# Both engines define SCC ids the same way, so ranks.csv / topo_order.csv
+# are byte-identical whichever engine produced them
+# (python rank.py ... --graph-engine networkx to compare).
+# ------------------------------------------------------------
+
+from __future__ import annotations
+
+import heapq
+from typing import Iterable, Sequence
+
+import numpy as np
+import scipy.sparse as sps
+from scipy.sparse.csgraph import connected_components
+
+
+class GraphRanking:
+    """
+    Result of ranking a prereq graph (edges prereq → course):
+      - nodes: codes in networkx insertion order; edges: (prereq, course)
+      - level / in_degree / out_degree / pagerank / node_to_scc: per code
+      - scc_sizes: per SCC id; topo_scc: SCC ids in topological order
+    SCC ids are canonical: the position of the SCC in the topological order
+    that always takes the available SCC with the smallest member code.
+    """
+
+    def __init__(
+        self,
+        nodes: list[str],
+        edges: list[tuple[str, str]],
+        level: dict[str, int],
+        in_degree: dict[str, int],
+        out_degree: dict[str, int],
+        pagerank: dict[str, float],
+        node_to_scc: dict[str, int],
+        scc_sizes: dict[int, int],
+        topo_scc: list[int],
+    ):
+        self.nodes = nodes
+        self.edges = edges
+        self.level = level
+        self.in_degree = in_degree
+        self.out_degree = out_degree
+        self.pagerank = pagerank
+        self.node_to_scc = node_to_scc
+        self.scc_sizes = scc_sizes
+        self.topo_scc = topo_scc
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+
+class ArrayGraph:
+    """
+    Interned prereq graph. Node ids follow first appearance over the sorted
+    (course, prereq) pairs, with the prereq added before the course, which
+    is exactly the node order networkx gets from rank.build_graph.
+    """
+
+    def __init__(self, edges_pairs: Iterable[tuple[str, str]]):
+        index: dict[str, int] = {}
+        codes: list[str] = []
+        src: list[int] = []
+        dst: list[int] = []
+        for course, prereq in sorted(edges_pairs):
+            if not course or not prereq or course == prereq:
+                continue
+            for c in (prereq, course):
+                if c not in index:
+                    index[c] = len(codes)
+                    codes.append(c)
+            src.append(index[prereq])
+            dst.append(index[course])
+
+        self._build(codes, index, np.array(src, dtype=np.int64), np.array(dst, dtype=np.int64))
+
+    @classmethod
+    def from_packed(cls, table: list[str], packed: Sequence[int]) -> ArrayGraph:
+        """
+        The same graph from interned (course, prereq) pairs: `table` maps id
+        → code and `packed` holds course_id << 32 | prereq_id per pair
+        (crawl_state.PairSet), so no per-pair tuple or str is built.
+        """
+        key = np.frombuffer(packed, dtype=np.int64) if len(packed) else np.zeros(0, dtype=np.int64)
+        course, prereq = key >> 32, key & 0xFFFFFFFF
+        named = np.fromiter(map(bool, table), dtype=bool, count=len(table))
+        keep = (course != prereq) & named[course] & named[prereq]
+        course, prereq = course[keep], prereq[keep]
+
+        # Sorted (course, prereq) order, then ids by first appearance, prereq first
+        rank = np.empty(len(table), dtype=np.int64)
+        rank[np.argsort(np.array(table, dtype=object), kind="stable")] = np.arange(len(table))
+        order = np.lexsort((rank[prereq], rank[course]))
+        seq = np.column_stack([prereq[order], course[order]]).ravel()
+        used, first = np.unique(seq, return_index=True)
+        node_ids = used[np.argsort(first)]
+        remap = np.full(len(table), -1, dtype=np.int64)
+        remap[node_ids] = np.arange(len(node_ids))
+
+        codes = [table[i] for i in node_ids.tolist()]
+        g = cls.__new__(cls)
+        g._build(codes, {c: i for i, c in enumerate(codes)}, remap[seq[0::2]], remap[seq[1::2]])
+        return g
+
+    def _build(self, codes: list[str], index: dict[str, int], src: np.ndarray, dst: np.ndarray) -> None:
+        self.codes = codes
+        self.index = index
+        self.n = len(codes)
+        # Stable sort by source keeps each row's targets in insertion order,
+        # i.e. the order networkx iterates G.edges()
+        order = np.argsort(src, kind="stable")
+        self.src = src[order]
+        self.dst = dst[order]
+
+        # Rank of every code in sorted order (for canonical tie-breaking)
+        self.code_rank = np.empty(self.n, dtype=np.int64)
+        self.code_rank[np.argsort(np.array(codes, dtype=object), kind="stable")] = np.arange(self.n)
+
+    def adjacency(self, dtype: type = float) -> sps.csr_array:
+        data = np.ones(len(self.src), dtype=dtype)
+        return sps.coo_array((data, (self.src, self.dst)), shape=(self.n, self.n), dtype=dtype).asformat("csr")
+
+    # ---------------- SCC condensation ----------------
+
+    def condensation(self) -> tuple[np.ndarray, int, np.ndarray, np.ndarray]:
+        """
+        Canonical SCC labelling.
+        Returns (node → scc id, n_scc, condensation src, condensation dst)
+        with condensation edges deduplicated and ids in topological order.
+        """
+        k, labels = connected_components(self.adjacency(), directed=True, connection="strong")
+        labels = labels.astype(np.int64)
+
+        min_rank = np.full(k, self.n, dtype=np.int64)
+        np.minimum.at(min_rank, labels, self.code_rank)
+
+        cs, cd = labels[self.src], labels[self.dst]
+        keep = cs != cd
+        pairs = np.unique(cs[keep] * k + cd[keep])
+        cs, cd = pairs // k, pairs % k
+
+        # Lexicographic Kahn: always emit the ready SCC with the smallest member code
+        indptr = np.zeros(k + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cs, minlength=k), out=indptr[1:])
+        indeg = np.bincount(cd, minlength=k)
+        heap = [(int(min_rank[s]), int(s)) for s in np.flatnonzero(indeg == 0)]
+        heapq.heapify(heap)
+        order: list[int] = []
+        while heap:
+            _, s = heapq.heappop(heap)
+            order.append(s)
+            for t in cd[indptr[s]:indptr[s + 1]]:
+                indeg[t] -= 1
+                if indeg[t] == 0:
+                    heapq.heappush(heap, (int(min_rank[t]), int(t)))
+
+        canon = np.empty(k, dtype=np.int64)
+        canon[np.array(order, dtype=np.int64)] = np.arange(k)
+        return canon[labels], k, canon[cs], canon[cd]
+
+    @staticmethod
+    def longest_levels(k: int, cs: np.ndarray, cd: np.ndarray) -> np.ndarray:
+        """Longest-path level per condensation node, one vectorized Kahn layer at a time."""
+        indeg = np.bincount(cd, minlength=k)
+        level = np.zeros(k, dtype=np.int64)
+        frontier = np.flatnonzero(indeg == 0)
+        depth = 0
+        while frontier.size:
+            level[frontier] = depth
+            indeg[frontier] = -1
+            hit = np.isin(cs, frontier)
+            np.subtract.at(indeg, cd[hit], 1)
+            frontier = np.flatnonzero(indeg == 0)
+            depth += 1
+        return level
+
+    # ---------------- PageRank ----------------
+
+    def pagerank(self, alpha: float = 0.85, max_iter: int = 100, tol: float = 1.0e-6) -> np.ndarray:
+        """
+        Power iteration with uniform teleport and dangling redistribution.
+        Mirrors networkx's scipy implementation operation for operation so
+        the floats (and hence ranks.csv) match it exactly.
+        """
+        N = self.n
+        A = self.adjacency()
+        S = A.sum(axis=1)
+        S[S != 0] = 1.0 / S[S != 0]
+        Q = sps.dia_array((S.T, 0), shape=A.shape).tocsr()
+        A = Q @ A
+
+        x = np.repeat(1.0 / N, N)
+        p = np.repeat(1.0 / N, N)
+        dangling_weights = p
+        is_dangling = np.where(S == 0)[0]
+
+        for _ in range(max_iter):
+            xlast = x
+            x = alpha * (x @ A + sum(x[is_dangling]) * dangling_weights) + (1 - alpha) * p
+            err = np.absolute(x - xlast).sum()
+            if err < N * tol:
+                return x
+        raise RuntimeError(f"pagerank failed to converge in {max_iter} iterations")
+
+
+def rank_graph(edges_pairs: Iterable[tuple[str, str]] | ArrayGraph) -> GraphRanking:
+    """Levels, SCCs, topo order, degrees and PageRank for (course, prereq) pairs (or their ArrayGraph)."""
+    g = edges_pairs if isinstance(edges_pairs, ArrayGraph) else ArrayGraph(edges_pairs)
+    codes = g.codes
+    if g.n == 0:
+        return GraphRanking([], [], {}, {}, {}, {}, {}, {}, [])
+
+    scc, k, cs, cd = g.condensation()
+    scc_level = ArrayGraph.longest_levels(k, cs, cd)
+    sizes = np.bincount(scc, minlength=k)
+    indeg = np.bincount(g.dst, minlength=g.n)
+    outdeg = np.bincount(g.src, minlength=g.n)
+    try:
+        pr = g.pagerank().tolist()
+    except RuntimeError:
+        pr = [0.0] * g.n
+
+    return GraphRanking(
+        nodes=list(codes),
+        edges=[(codes[a], codes[b]) for a, b in zip(g.src.tolist(), g.dst.tolist())],
+        level={c: int(scc_level[s]) for c, s in zip(codes, scc.tolist())},
+        in_degree=dict(zip(codes, indeg.tolist())),
+        out_degree=dict(zip(codes, outdeg.tolist())),
+        pagerank=dict(zip(codes, pr)),
+        node_to_scc=dict(zip(codes, scc.tolist())),
+        scc_sizes={i: int(n) for i, n in enumerate(sizes.tolist())},
+        topo_scc=list(range(k)),
+    )
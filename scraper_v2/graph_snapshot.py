@@ -0,0 +1,177 @@
+# graph_snapshot.py
+# ------------------------------------------------------------
+# Compact binary snapshot of the prereq + incompatibility graphs
+# written by rank.py, loadable with numpy.memmap (np.load(mmap_mode="r")).
+#
+# Layout (uq_fast/graph_snapshot → graph_snapshot.<version>/, a symlink
+# swapped atomically on each write; the previous version is kept for readers
+# that opened it just before the swap):
+#   - meta.json                 version, node count, array dtypes/shapes
+#   - codes.npy                 S9, sorted course codes; node id = row
+#   - prereq_indptr.npy         int64 CSR offsets, prereq → course
+#   - prereq_indices.npy        int32 CSR targets
+#   - prereq_rev_indptr.npy     int64 CSR offsets, course → its prereqs
+#   - prereq_rev_indices.npy    int32
+#   - incompat_indptr.npy       int64 CSR offsets, undirected (both ways)
+#   - incompat_indices.npy      int32
+#   - <attr>.npy                per-node numeric attributes
+#                               (level, pagerank, scc_id, scc_size, ...)
+#
+# Usage:
+#   snap = load_snapshot("uq_fast/graph_snapshot")
+#   snap.prereqs_of("MATH2001"), snap.unlocks("MATH1051"), snap.attr("level", "MATH2001")
+# ------------------------------------------------------------
+
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Iterable
+
+import numpy as np
+
+SNAPSHOT_VERSION = 1
+CODE_DTYPE = "S9"  # [A-Z]{4}\d{4}[A-Z]? always fits in 9 ASCII bytes
+
+
+def _csr(n: int, src: np.ndarray, dst: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """CSR (indptr, indices) for edges src→dst over n nodes; targets sorted per row."""
+    order = np.lexsort((dst, src))
+    src, dst = src[order], dst[order]
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+    return indptr, dst.astype(np.int32)
+
+
+def write_snapshot(
+    root: Path,
+    nodes: Iterable[str],
+    prereq_edges: Iterable[tuple[str, str]],
+    incompat_pairs: Iterable[tuple[str, str]],
+    attrs: dict[str, tuple[str, dict[str, Any], Any]],
+) -> None:
+    """
+    Write a snapshot and switch `root` to it atomically: the arrays go to a
+    new <root>.<version> directory and the `root` symlink is replaced by a
+    rename, so a reader sees either the old snapshot or the new one, whole.
+      - prereq_edges: (prereq, course) pairs, same direction as the rank graph
+      - incompat_pairs: undirected pairs, stored in both directions
+      - attrs: name → (numpy dtype, {code: value}, default)
+    Edges touching codes outside `nodes` are dropped.
+    """
+    codes = np.array(sorted(set(nodes)), dtype=CODE_DTYPE)
+    n = len(codes)
+    index = {c.decode("ascii"): i for i, c in enumerate(codes)}
+
+    def id_pairs(pairs: Iterable[tuple[str, str]]) -> tuple[np.ndarray, np.ndarray]:
+        ids = [(index[a], index[b]) for a, b in pairs if a in index and b in index]
+        arr = np.array(ids, dtype=np.int64).reshape(-1, 2)
+        return arr[:, 0], arr[:, 1]
+
+    arrays: dict[str, np.ndarray] = {"codes": codes}
+
+    src, dst = id_pairs(prereq_edges)
+    arrays["prereq_indptr"], arrays["prereq_indices"] = _csr(n, src, dst)
+    arrays["prereq_rev_indptr"], arrays["prereq_rev_indices"] = _csr(n, dst, src)
+
+    a, b = id_pairs(incompat_pairs)
+    keep = a != b
+    a, b = a[keep], b[keep]
+    arrays["incompat_indptr"], arrays["incompat_indices"] = _csr(
+        n, np.concatenate([a, b]), np.concatenate([b, a])
+    )
+
+    for name, (dtype, values, default) in attrs.items():
+        arrays[name] = np.array(
+            [values.get(c.decode("ascii"), default) for c in codes], dtype=dtype
+        )
+
+    version = root.with_name(f"{root.name}.{time.time_ns():x}")
+    version.mkdir(parents=True)
+    for name, arr in arrays.items():
+        np.save(version / f"{name}.npy", arr, allow_pickle=False)
+    meta = {
+        "version": SNAPSHOT_VERSION,
+        "n_nodes": n,
+        "n_prereq_edges": int(arrays["prereq_indices"].shape[0]),
+        "n_incompat_pairs": int(arrays["incompat_indices"].shape[0] // 2),
+        "arrays": {name: {"dtype": arr.dtype.str, "shape": list(arr.shape)} for name, arr in arrays.items()},
+    }
+    (version / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+
+    previous = Path(os.readlink(root)).name if root.is_symlink() else None
+    if root.is_dir() and not root.is_symlink():
+        shutil.rmtree(root)  # plain directory from an older rank.py: one non-atomic switch
+    link = root.with_name(root.name + ".link")
+    with contextlib.suppress(FileNotFoundError):
+        link.unlink()
+    os.symlink(version.name, link)  # relative, so the output directory can move
+    os.replace(link, root)
+
+    # Keep the new and the previous version; older ones have no readers left
+    for stale in root.parent.glob(f"{root.name}.*"):
+        if stale.is_dir() and not stale.is_symlink() and stale.name not in (version.name, previous):
+            shutil.rmtree(stale, ignore_errors=True)
+
+
+class GraphSnapshot:
+    """Read-only, memory-mapped view of a snapshot directory."""
+
+    def __init__(self, root: Path | str, mmap: bool = True):
+        self.root = Path(root).resolve()  # pin one version even if the link is swapped mid-load
+        self.meta = json.loads((self.root / "meta.json").read_text(encoding="utf-8"))
+        if self.meta.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"unsupported snapshot version: {self.meta.get('version')}")
+        mode = "r" if mmap else None
+        self.arrays: dict[str, np.ndarray] = {
+            name: np.load(self.root / f"{name}.npy", mmap_mode=mode, allow_pickle=False)
+            for name in self.meta["arrays"]
+        }
+        self.codes = self.arrays["codes"]
+
+    def __len__(self) -> int:
+        return int(self.meta["n_nodes"])
+
+    def __contains__(self, code: str) -> bool:
+        return self.node_id(code) is not None
+
+    def node_id(self, code: str) -> int | None:
+        key = code.encode("ascii")
+        i = int(np.searchsorted(self.codes, key))
+        if i < len(self.codes) and self.codes[i] == key:
+            return i
+        return None
+
+    def code(self, i: int) -> str:
+        return self.codes[i].decode("ascii")
+
+    def _row(self, kind: str, code: str) -> list[str]:
+        i = self.node_id(code)
+        if i is None:
+            return []
+        indptr = self.arrays[f"{kind}_indptr"]
+        idx = self.arrays[f"{kind}_indices"][indptr[i]:indptr[i + 1]]
+        return [self.code(j) for j in idx]
+
+    def prereqs_of(self, code: str) -> list[str]:
+        """Direct prerequisites (and co-requisites) of `code`."""
+        return self._row("prereq_rev", code)
+
+    def unlocks(self, code: str) -> list[str]:
+        """Courses that list `code` directly as a prerequisite."""
+        return self._row("prereq", code)
+
+    def incompatible(self, code: str) -> list[str]:
+        return self._row("incompat", code)
+
+    def attr(self, name: str, code: str) -> Any:
+        i = self.node_id(code)
+        return None if i is None else self.arrays[name][i].item()
+
+
+def load_snapshot(root: Path | str, mmap: bool = True) -> GraphSnapshot:
+    return GraphSnapshot(root, mmap=mmap)
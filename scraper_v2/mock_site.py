@@ -0,0 +1,336 @@
+# mock_site.py
+# ------------------------------------------------------------
+# Local stand-in for programs-courses.uq.edu.au, for offline crawl
+# benchmarks (see crawl_bench.py). Serves, from a prereq_structured.json
+# style dataset (the checked-in one, or src/assets/generate_sample_data.py
+# --format structured output):
+#   - /search.html?searchType=coursecode&keywords=MATH1***&year=2025
+#   - /course.html?course_code=MATH1051&year=2025   (ETag / 304 aware)
+#   - /__stats                                       (request counters, JSON)
+#
+# Knobs:
+#   --latency     per-response delay: 0 | const:S | uniform:LO,HI |
+#                 lognormal:MEDIAN,SIGMA | exp:MEAN   (seconds)
+#   --error-rate  share of responses replaced by --error-status
+#                 (429/503 with Retry-After: --retry-after)
+#   --http2       serve HTTP/2 over TLS via hypercorn (pip install hypercorn);
+#                 default is the stdlib HTTP/1.1 keep-alive server
+#
+# Example:
+#   python mock_site.py --port 8765 --latency lognormal:0.08,0.5 --error-rate 0.02
+#   python rank.py --base-url http://127.0.0.1:8765/ --cache off --rps 50
+# ------------------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import html
+import json
+import math
+import random
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+
+HERE = Path(__file__).resolve().parent
+DEFAULT_DATA = HERE / "prereq_structured.json"
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html><head><title>{code} - {title}</title></head>
+<body><div id="content">
+<h1 id="course-title">{title} ({code})</h1>
+<p id="course-units">{units}</p>
+<h2><a>Course requirements</a></h2>
+<p id="course-prerequisite">{prereq}</p>
+<p id="course-incompatible">{incompat}</p>
+<h2>Course description</h2>
+<p id="course-summary">{summary}</p>
+</div></body></html>
+"""
+
+
+def course_page(code: str, title: str, prereq: str, incompat: str, units: str, summary: str) -> str:
+    """A course page with the element ids rank.parse_course_page looks for."""
+    title, prereq, incompat, units, summary = (html.escape(x) for x in (title, prereq, incompat, units, summary))
+    return PAGE_TEMPLATE.format(
+        code=code, title=title, prereq=prereq, incompat=incompat, units=units, summary=summary,
+    )
+
+
+# ============================ Models ===============================
+
+class Latency:
+    """Response delay distribution, parsed from "kind:args" (seconds)."""
+
+    KINDS = ("const", "uniform", "lognormal", "exp")
+
+    def __init__(self, spec: str = "0"):
+        kind, _, args = spec.partition(":")
+        if kind in ("", "0", "none"):
+            kind, args = "const", "0"
+        if kind not in self.KINDS:
+            raise ValueError(f"unknown latency distribution: {spec}")
+        self.kind = kind
+        self.args = [float(a) for a in args.split(",") if a]
+        self.spec = spec
+
+    def sample(self, rng: random.Random) -> float:
+        a = self.args
+        if self.kind == "const":
+            return a[0] if a else 0.0
+        if self.kind == "uniform":
+            return rng.uniform(a[0], a[1])
+        if self.kind == "lognormal":
+            return rng.lognormvariate(math.log(a[0]), a[1] if len(a) > 1 else 0.5)
+        return rng.expovariate(1 / a[0]) if a[0] > 0 else 0.0
+
+
+class MockSite:
+    """
+    Request handling shared by the HTTP/1.1 and HTTP/2 front ends:
+    handle() returns (delay, status, headers, body); the caller sleeps.
+    """
+
+    def __init__(
+        self,
+        data: dict[str, Any],
+        latency: Latency | None = None,
+        error_rate: float = 0.0,
+        error_status: tuple[int, ...] = (429, 503),
+        retry_after: int = 1,
+        seed: int = 0,
+    ):
+        self.latency = latency or Latency()
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats: dict[str, int] = {}
+        self.started = time.time()
+
+        self.pages: dict[str, bytes] = {}
+        self.etags: dict[str, str] = {}
+        for code, item in data.items():
+            body = course_page(
+                code,
+                item.get("title") or code,
+                item.get("raw") or "",
+                (item.get("incompat") or {}).get("raw") or "",
+                item.get("units") or "",
+                item.get("summary") or "",
+            ).encode("utf-8")
+            self.pages[code] = body
+            self.etags[code] = '"' + hashlib.md5(body).hexdigest() + '"'
+        # search buckets: (prefix or None, level digit) → codes
+        self.buckets: dict[tuple[str | None, str], list[str]] = {}
+        for code in sorted(self.pages):
+            self.buckets.setdefault((code[:4], code[4]), []).append(code)
+            self.buckets.setdefault((None, code[4]), []).append(code)
+
+    @classmethod
+    def from_file(cls, path: Path, **kw: Any) -> MockSite:
+        return cls(json.loads(Path(path).read_text(encoding="utf-8")), **kw)
+
+    def count(self, key: str) -> None:
+        self.stats[key] = self.stats.get(key, 0) + 1
+
+    def handle(self, target: str, headers: dict[str, str]) -> tuple[float, int, dict[str, str], bytes]:
+        """One request (path + query) → (delay, status, headers, body)."""
+        url = urlsplit(target)
+        q = {k: v[0] for k, v in parse_qs(url.query).items()}
+        path = url.path.rsplit("/", 1)[-1]
+        with self.lock:
+            delay = self.latency.sample(self.rng)
+            fault = self.error_rate > 0 and self.rng.random() < self.error_rate
+            status = self.rng.choice(self.error_status) if fault else 0
+
+        kind = {"search.html": "search", "course.html": "course", "__stats": "stats"}.get(path, "other")
+        if kind == "stats":
+            body = json.dumps(self.snapshot()).encode("utf-8")
+            return 0.0, 200, {"Content-Type": "application/json"}, body
+        if fault:
+            with self.lock:
+                self.count(f"{kind} {status}")
+            return delay, status, {"Retry-After": str(self.retry_after)}, b""
+
+        out_headers = {"Content-Type": "text/html; charset=utf-8"}
+        if kind == "search":
+            kw = q.get("keywords", "")
+            prefix = None if kw[:4] == "****" else kw[:4].upper()
+            codes = self.buckets.get((prefix, kw[4:5]), [])
+            year = q.get("year", "")
+            body = (
+                "<html><body><ul>"
+                + "".join(f'<li><a href="course.html?course_code={c}&year={year}">{c}</a></li>' for c in codes)
+                + "</ul></body></html>"
+            ).encode("utf-8")
+            status = 200
+        elif kind == "course" and q.get("course_code") in self.pages:
+            code = q["course_code"]
+            out_headers["ETag"] = self.etags[code]
+            if headers.get("if-none-match") == self.etags[code]:
+                status, body = 304, b""
+            else:
+                status, body = 200, self.pages[code]
+        else:
+            status, body = 404, b"<html><body>Not found</body></html>"
+        with self.lock:
+            self.count(f"{kind} {status}")
+        return delay, status, out_headers, body
+
+    def snapshot(self) -> dict[str, Any]:
+        with self.lock:
+            return {"uptime": time.time() - self.started, "requests": dict(sorted(self.stats.items()))}
+
+
+# =========================== HTTP/1.1 ==============================
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real site
+    site: MockSite
+
+    def do_GET(self) -> None:
+        delay, status, headers, body = self.site.handle(
+            self.path, {k.lower(): v for k, v in self.headers.items()}
+        )
+        if delay > 0:
+            time.sleep(delay)
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def serve_http1(site: MockSite, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Start the stdlib server in a daemon thread; .server_address has the bound port."""
+    handler = type("Handler", (_Handler,), {"site": site})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ============================ HTTP/2 ===============================
+
+def asgi_app(site: MockSite):
+    """The same site as an ASGI app (for hypercorn)."""
+
+    async def app(scope: dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            return
+        target = scope["path"] + ("?" + scope["query_string"].decode() if scope["query_string"] else "")
+        req_headers = {k.decode().lower(): v.decode() for k, v in scope["headers"]}
+        delay, status, headers, body = site.handle(target, req_headers)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()]
+            + [(b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    return app
+
+
+class Http2Server:
+    """hypercorn (TLS, h2 + http/1.1 via ALPN) in a background thread."""
+
+    def __init__(self, site: MockSite, certfile: str, keyfile: str, host: str = "127.0.0.1", port: int = 0):
+        try:
+            from hypercorn.asyncio import serve
+            from hypercorn.config import Config
+        except ImportError as e:
+            raise RuntimeError("--http2 needs hypercorn: pip install hypercorn") from e
+        if not port:
+            with socket.socket() as sock:  # pick a free port up front; hypercorn doesn't report it
+                sock.bind((host, 0))
+                port = sock.getsockname()[1]
+        config = Config()
+        config.bind = [f"{host}:{port}"]
+        config.certfile = certfile
+        config.keyfile = keyfile
+        config.alpn_protocols = ["h2", "http/1.1"]
+        config.accesslog = None
+        config.errorlog = None
+        self.port = port
+        self._stop: asyncio.Event | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._ready = threading.Event()
+
+        async def main() -> None:
+            self._loop = asyncio.get_running_loop()
+            self._stop = asyncio.Event()
+            task = asyncio.create_task(serve(asgi_app(site), config, shutdown_trigger=self._stop.wait))
+            await asyncio.sleep(0.2)
+            self._ready.set()
+            await task
+
+        self._thread = threading.Thread(target=asyncio.run, args=(main(),), daemon=True)
+        self._thread.start()
+        self._ready.wait(10)
+
+    def shutdown(self) -> None:
+        if self._loop and self._stop:
+            self._loop.call_soon_threadsafe(self._stop.set)
+        self._thread.join(5)
+
+
+# ============================== CLI ================================
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Serve a local mock of the UQ course site.")
+    ap.add_argument("--data", default=str(DEFAULT_DATA), help="prereq_structured.json-style dataset")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency", default="0", help="0 | const:S | uniform:LO,HI | lognormal:MEDIAN,SIGMA | exp:MEAN")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="Share of responses turned into errors")
+    ap.add_argument("--error-status", default="429,503", help="Error statuses to inject (comma-separated)")
+    ap.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds on injected errors")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--http2", action="store_true", help="HTTP/2 over TLS via hypercorn (needs --certfile/--keyfile)")
+    ap.add_argument("--certfile", default=None)
+    ap.add_argument("--keyfile", default=None)
+    return ap.parse_args()
+
+
+def site_from_args(args: argparse.Namespace) -> MockSite:
+    return MockSite.from_file(
+        Path(args.data),
+        latency=Latency(args.latency),
+        error_rate=args.error_rate,
+        error_status=tuple(int(s) for s in args.error_status.split(",") if s.strip()),
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    site = site_from_args(args)
+    if args.http2:
+        if not (args.certfile and args.keyfile):
+            raise SystemExit("--http2 needs --certfile and --keyfile (a self-signed pair is fine)")
+        server = Http2Server(site, args.certfile, args.keyfile, args.host, args.port)
+        print(f"mock site: {len(site.pages)} courses on https://{args.host}:{args.port}/ (h2)", flush=True)
+    else:
+        server = serve_http1(site, args.host, args.port)
+        print(f"mock site: {len(site.pages)} courses on http://{args.host}:{args.port}/", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,206 @@
+# prereq_ast.py
+# ------------------------------------------------------------
+# Compact requisite AST nodes: slotted, read-only and hash-consed, so every
+# identical subtree in the catalog ("MATH1051", "one of MATH1051 or
+# MATH1071", a whole shared prerequisite) is one object.
+#
+# The JSON schema is unchanged and round-trips losslessly:
+#   {"op": "N_OF", "n": 1, "args": [{"op": "COURSE", "code": "MATH1051"}, ...]}
+#     ⇄ Node key ("N_OF", "n", 1, "args", (Node ("COURSE", "code", "MATH1051"), ...))
+# Fields keep their JSON order; JSON lists become tuples. The flat key
+# tuple is both the node's field storage and its intern-table key.
+#
+# Usage:
+#   node("COURSE", code="MATH1051") is node("COURSE", code="MATH1051")  → True
+#   to_json(n) / from_json(obj)            dict ⇄ Node (non-AST values pass through)
+#   json.dumps(obj, default=ast_json)      serialize structures holding Nodes
+#   json.loads(text, object_hook=ast_hook) load prereq_structured.json as Nodes
+#   n.op, n.args, n.code, n.get("min_units"), node_codes(n)
+# ------------------------------------------------------------
+
+from __future__ import annotations
+
+from typing import Any
+
+_TABLE: dict[tuple[Any, ...], Node] = {}
+_NO_CODES: frozenset[str] = frozenset()
+
+
+class Node:
+    """
+    One AST node. Build with node() / Node.of() only: instances are
+    interned, so equality is identity, and they are shared: never mutate one.
+      - key: (op, name1, value1, name2, value2, ...) in JSON field order
+      - op, args (the "args" child tuple, empty if none), code (COURSE's code)
+    """
+
+    __slots__ = ("key", "op", "args", "code", "_codes")
+
+    key: tuple[Any, ...]
+    op: str
+    args: tuple[Node, ...]
+    code: str | None
+    _codes: frozenset[str] | None
+
+    @classmethod
+    def of(cls, key: tuple[Any, ...]) -> Node:
+        """The interned node for a flat (op, name, value, ...) key."""
+        n = _TABLE.get(key)
+        if n is None:
+            n = object.__new__(cls)
+            n.key = key
+            n.op = key[0]
+            n.args = ()
+            n.code = None
+            for i in range(1, len(key), 2):
+                if key[i] == "args":
+                    n.args = key[i + 1]
+                elif key[i] == "code":
+                    n.code = key[i + 1]
+            n._codes = None
+            _TABLE[key] = n
+        return n
+
+    def fields(self) -> list[tuple[str, Any]]:
+        """Every field but "op", as (name, value) pairs in order."""
+        k = self.key
+        return [(k[i], k[i + 1]) for i in range(1, len(k), 2)]
+
+    # dict-style read access, so code written against the JSON dicts still works
+    def get(self, name: str, default: Any = None) -> Any:
+        k = self.key
+        if name == "op":
+            return k[0]
+        for i in range(1, len(k), 2):
+            if k[i] == name:
+                return k[i + 1]
+        return default
+
+    def __getitem__(self, name: str) -> Any:
+        missing = object()
+        v = self.get(name, missing)
+        if v is missing:
+            raise KeyError(name)
+        return v
+
+    def __contains__(self, name: str) -> bool:
+        return name == "op" or name in self.key[1::2]
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        # Re-interned on unpickling, e.g. when a parse-pool worker returns it
+        return (Node.of, (self.key,))
+
+    def __repr__(self) -> str:
+        return f"Node({to_json(self)!r})"
+
+
+def _value(v: Any) -> Any:
+    """JSON field value → hashable node field (lists → tuples, dicts → Nodes)."""
+    if isinstance(v, list):
+        return tuple(_value(x) for x in v)
+    if isinstance(v, dict):
+        return from_json(v)
+    return v
+
+
+def _key(op: str, items: Any) -> tuple[Any, ...]:
+    key: list[Any] = [op]
+    for k, v in items:
+        key += (k, v)
+    return tuple(key)
+
+
+def node(op: str, **fields: Any) -> Node:
+    """Interned node; keyword order is the JSON field order."""
+    return Node.of(_key(op, ((k, _value(v)) for k, v in fields.items())))
+
+
+def with_args(n: Node, args: list[Node] | tuple[Node, ...]) -> Node:
+    """The same node with its "args" replaced."""
+    return Node.of(_key(n.op, ((k, tuple(args) if k == "args" else v) for k, v in n.fields())))
+
+
+def from_json(obj: Any) -> Any:
+    """An AST dict (anything with "op") → Node, recursively; other values unchanged."""
+    if isinstance(obj, dict) and "op" in obj:
+        return Node.of(_key(obj["op"], ((k, _value(v)) for k, v in obj.items() if k != "op")))
+    return obj
+
+
+def _plain(v: Any) -> Any:
+    if isinstance(v, Node):
+        return to_json(v)
+    if isinstance(v, tuple):
+        return [_plain(x) for x in v]
+    return v
+
+
+def to_json(n: Any) -> Any:
+    """Node → the JSON-schema dict, recursively; other values unchanged."""
+    if not isinstance(n, Node):
+        return n
+    out: dict[str, Any] = {"op": n.op}
+    k = n.key
+    for i in range(1, len(k), 2):
+        out[k[i]] = _plain(k[i + 1])
+    return out
+
+
+def ast_json(obj: Any) -> Any:
+    """json.dumps(default=...) hook: Nodes serialize as their JSON dicts."""
+    if isinstance(obj, Node):
+        return to_json(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def ast_hook(obj: dict[str, Any]) -> Any:
+    """json.loads(object_hook=...) hook: children are already Nodes, so one step."""
+    if "op" not in obj:
+        return obj
+    items = ((k, tuple(v) if isinstance(v, list) else v) for k, v in obj.items() if k != "op")
+    return Node.of(_key(obj["op"], items))
+
+
+def node_codes(n: Any) -> frozenset[str]:
+    """Every course code a requisite tree mentions (COURSE leaves, UNITS_FROM lists); memoized per node."""
+    if not isinstance(n, Node):
+        return _NO_CODES
+    codes = n._codes
+    if codes is None:
+        if n.op == "COURSE":
+            codes = frozenset((n.code,)) if n.code else _NO_CODES
+        elif n.op in ("AND", "OR", "N_OF"):
+            codes = _NO_CODES.union(*[node_codes(a) for a in n.args])
+        elif n.op == "UNITS_FROM":
+            codes = frozenset(n.get("courses") or ())
+        else:
+            codes = _NO_CODES
+        n._codes = codes
+    return codes
+
+
+def json_codes(obj: Any) -> set[str]:
+    """node_codes() for an AST still in JSON form, walked as is (nothing is interned)."""
+    if not isinstance(obj, dict):
+        return set()
+    op = obj.get("op")
+    if op == "COURSE":
+        return {obj["code"]} if obj.get("code") else set()
+    if op in ("AND", "OR", "N_OF"):
+        out: set[str] = set()
+        for a in obj.get("args") or ():
+            out |= json_codes(a)
+        return out
+    if op == "UNITS_FROM":
+        return set(obj.get("courses") or ())
+    return set()
+
+
+def intern_size() -> int:
+    """Distinct nodes alive in the intern table."""
+    return len(_TABLE)
+
+
+def intern_clear() -> None:
+    """Forget interned nodes (existing ones stay valid but stop being shared)."""
+    _TABLE.clear()
@@ -0,0 +1,585 @@
+# prereq_grammar.py
+# ------------------------------------------------------------
+# UQ requisite language → logical AST, in one lexer pass + a small grammar.
+#
+#   raw text ──lex──▶ tokens ──rewrite──▶ sections/clauses ──grammar──▶ AST
+#
+# Lexing does all text normalization at once (whitespace, "Prerequisite:"
+# prefixes, brackets, "and/or", "+"/"&", "A or B, C" grouping) and keeps
+# each token's normalized rendering, so the clause text that the keyword
+# rules (units from, level credits, enrolment, permission, N of ...) see is
+# exactly what the old regex pipeline produced. The AST shapes are unchanged:
+#   COURSE, AND, N_OF, UNITS_FROM, CREDITS_AT_LEVEL, ENROLLED, PERMISSION, TEXT
+# and incompatibilities parse to NONE_OF.
+#
+# Nodes are prereq_ast.Node: hash-consed, so identical subtrees across the
+# catalog are one object, and JSON-compatible via to_json / ast_json.
+# Many courses share identical requisite strings, so parses are also
+# cached on the raw text (see parse_cache_info()).
+#
+# Golden file: prereq_golden.json holds corpus strings with the AST each
+# must parse to.
+#   python prereq_grammar.py            → check them (exit 1 on a mismatch)
+#   python prereq_grammar.py --update   → re-record after an intended change
+# ------------------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sys
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+from prereq_ast import Node, ast_json, intern_clear, json_codes, node, node_codes
+
+PARSE_CACHE_SIZE = 16384
+GOLDEN_JS = Path(__file__).with_name("prereq_golden.json")
+
+CODE_RE = re.compile(r"[A-Z]{4}\d{4}[A-Z]?")
+CODE_SUFFIX_RE = re.compile(r"[A-Z]{4}\d{4}[A-Z]?$")
+COURSE_CODE_RE = re.compile(r"\b([A-Z]{4}\d{4}[A-Z]?)\b")
+
+# One alternation, tried in order at every position. Every keyword starts
+# with \b, so it can only match where a \w run starts. "Prerequisite" is
+# dropped before "and/or" is recognised, so it may sit inside one.
+_PRE = r"\b[Pp]re(?:-|\s+)?requisites?\b:?"
+_LEX_RE = re.compile(
+    rf"""
+      (?P<WS>\s+)
+    | (?P<PRE>{_PRE})
+    | (?P<COREQ>\b(?i:co-?requisite):)
+    | (?P<ANDOR>\b(?i:and)(?:\s|{_PRE})*/(?:\s|{_PRE})*(?i:or)\b)
+    | (?P<LP>[(\[])
+    | (?P<RP>[)\]])
+    | (?P<COMMA>,)
+    | (?P<AMP>[+&])
+    | (?P<WORD>\w+)
+    | (?P<PUNCT>[^\w\s()\[\],+&]+)
+    """,
+    re.X,
+)
+
+# Normalized rendering of each token kind (None: the token's own text)
+_RENDER = {
+    "WS": " ",
+    "PRE": "",
+    "ANDOR": "or",
+    "LP": " ( ",
+    "RP": " ) ",
+    "COMMA": " , ",
+    "AMP": " and ",
+    "LPT": "(",  # tight parens inserted by the "A or B, C" rewrites
+    "RPT": ")",
+}
+
+# Token kinds whose rendering starts with whitespace (clause separators need one)
+_SPACED = {"WS", "LP", "RP", "COMMA", "AMP"}
+# Token kinds that end a whitespace-delimited word
+_DELIM = {"WS", "LP", "RP", "COMMA", "AMP", "LPT", "RPT"}
+_BLANK = {"WS", "PRE"}
+
+Token = tuple[str, str, str]  # (kind, source text, normalized rendering)
+
+
+# ========================== AST helpers ==========================
+
+def course_node(code: str) -> Node:
+    return node("COURSE", code=code)
+
+
+def flatten(op: str, args: list[Any]) -> Node:
+    """Flatten nested AND/OR and deduplicate COURSE leaves."""
+    out = []
+    for a in args:
+        if isinstance(a, Node) and a.op == op:
+            out.extend(a.args)
+        else:
+            out.append(a)
+
+    if op in ("AND", "OR"):
+        # COURSE leaves are interned, so one per code; other subtrees are kept as is
+        seen: set[Node] = set()
+        uniq = []
+        for a in out:
+            if isinstance(a, Node) and a.op == "COURSE":
+                if a in seen:
+                    continue
+                seen.add(a)
+            uniq.append(a)
+        return Node.of((op, "args", tuple(uniq)))
+
+    return Node.of((op, "args", tuple(out)))
+
+
+def AND(*xs: Any) -> Node:
+    return flatten("AND", [x for x in xs if x])
+
+
+def OR(*xs: Any) -> Node:
+    return flatten("OR", [x for x in xs if x])
+
+
+def _or_to_nof1(n: Any) -> Any:
+    if not isinstance(n, Node):
+        return n
+    if n.op == "OR":
+        return Node.of(("N_OF", "n", 1, "args", tuple(_or_to_nof1(a) for a in n.args)))
+    if n.op == "AND":
+        return Node.of(("AND", "args", tuple(_or_to_nof1(a) for a in n.args)))
+    if n.op == "N_OF":
+        return Node.of(("N_OF", "n", n.get("n"), "args", tuple(_or_to_nof1(a) for a in n.args)))
+    return n
+
+
+def collect_codes_from_ast(n: Node | dict[str, Any] | None) -> set[str]:
+    """Course codes a requisite tree mentions; JSON dicts are walked without interning."""
+    if isinstance(n, dict):
+        return json_codes(n)
+    return set(node_codes(n))
+
+
+def is_level7(code: str) -> bool:
+    """True for postgraduate 7xxx courses (skip per requirements)."""
+    return bool(re.match(r"^[A-Z]{4}7", code or ""))
+
+
+# ============================= Lexer =============================
+
+def lex(raw: str) -> list[Token]:
+    """Tokenize requisite text; "".join(renderings) is the normalized text."""
+    toks: list[Token] = []
+    has_or = has_comma = has_and = False
+    for m in _LEX_RE.finditer(raw.strip()):
+        kind = m.lastgroup or "PUNCT"
+        text = m.group()
+        toks.append((kind, text, _RENDER.get(kind, text)))
+        if kind == "WORD":
+            has_or = has_or or text == "or"
+            has_and = has_and or text == "and"
+        elif kind == "ANDOR":
+            has_or = True
+        elif kind == "COMMA":
+            has_comma = True
+        elif kind == "AMP":
+            has_and = True
+    # Grouping rewrites only apply around a literal "or"
+    if has_or and has_comma:
+        toks = _group_alternatives(toks, comma=True)
+    if has_or and (has_and or has_comma):  # the comma rewrite emits "and"
+        toks = _group_alternatives(toks, comma=False)
+    return toks
+
+
+def _is_code(tok: Token) -> bool:
+    return tok[0] == "WORD" and CODE_RE.fullmatch(tok[1]) is not None
+
+
+def _is_or(tok: Token) -> bool:
+    return tok[2] == "or" and tok[0] in ("WORD", "ANDOR")
+
+
+def _skip_blank(toks: list[Token], i: int) -> tuple[int, bool]:
+    """Skip WS/PRE tokens from i; return (next index, whether any WS was skipped)."""
+    ws = False
+    while i < len(toks) and toks[i][0] in _BLANK:
+        ws = ws or toks[i][0] == "WS"
+        i += 1
+    return i, ws
+
+
+def _group_alternatives(toks: list[Token], comma: bool) -> list[Token]:
+    """
+    Bracket an alternative that precedes a conjunction:
+      comma=True:  "A or B, C"   → "(A or B) and C"
+      comma=False: "A or B and"  → "(A or B) and"   (also "A or B + ...")
+    """
+    out: list[Token] = []
+    i, n = 0, len(toks)
+    while i < n:
+        # Like the regex it mirrors, the first code may end a longer word ("XMATH1051")
+        a = CODE_SUFFIX_RE.search(toks[i][1]) if toks[i][0] == "WORD" else None
+        m = _match_alternative(toks, i, comma) if a else None
+        if m is None:
+            out.append(toks[i])
+            i += 1
+            continue
+        j, b, tail = m
+        if a.start():
+            head = toks[i][1][:a.start()]
+            out.append(("WORD", head, head))
+        out += [
+            ("LPT", "(", "("), ("WORD", a.group(), a.group()), ("WS", " ", " "), ("WORD", "or", "or"),
+            ("WS", " ", " "), b, ("RPT", ")", ")"), ("WS", " ", " "), ("WORD", "and", "and"), *tail,
+        ]
+        i = j
+    return out
+
+
+def _match_alternative(toks: list[Token], i: int, comma: bool) -> tuple[int, Token, list[Token]] | None:
+    """Match "A or B , C" / "A or B and" at code token i → (end, B, tail tokens)."""
+    j, ws = _skip_blank(toks, i + 1)
+    if not ws or j >= len(toks) or not _is_or(toks[j]):
+        return None
+    j, ws = _skip_blank(toks, j + 1)
+    if not ws or j >= len(toks) or not _is_code(toks[j]):
+        return None
+    b = toks[j]
+    j, ws = _skip_blank(toks, j + 1)
+    if j >= len(toks):
+        return None
+    t = toks[j]
+    if comma:
+        if t[0] != "COMMA":
+            return None
+        j, _ = _skip_blank(toks, j + 1)
+        # the last code may start a longer word ("MATH10531"), which is kept whole
+        if j >= len(toks) or toks[j][0] != "WORD" or not CODE_RE.match(toks[j][1]):
+            return None
+        return j + 1, b, [("WS", " ", " "), toks[j]]
+    if t[0] == "AMP":
+        return j + 1, b, [("WS", " ", " ")]  # its trailing space stays
+    if ws and t[0] == "WORD" and t[1] == "and":
+        return j + 1, b, []
+    return None
+
+
+# ========================= Sections/clauses =========================
+
+def _split_clauses(toks: list[Token]) -> list[list[Token]]:
+    """Split on "." / ";" followed by whitespace (in the normalized text)."""
+    clauses: list[list[Token]] = []
+    cur: list[Token] = []
+    n = len(toks)
+    while n and toks[n - 1][0] in _BLANK:  # the section is stripped first
+        n -= 1
+    for i, tok in enumerate(toks[:n]):
+        kind, text, _ = tok
+        if kind == "PUNCT" and text[-1] in ".;":
+            j = i + 1
+            while j < n and toks[j][0] == "PRE":
+                j += 1
+            if j < n and toks[j][0] in _SPACED:
+                if len(text) > 1:
+                    cur.append(("PUNCT", text[:-1], text[:-1]))
+                clauses.append(cur)
+                cur = []
+                continue
+        cur.append(tok)
+    clauses.append(cur)
+    return clauses
+
+
+def _render(toks: list[Token]) -> str:
+    return "".join(t[2] for t in toks).strip()
+
+
+def _slash_or(toks: list[Token], i: int) -> int | None:
+    """If toks[i:] reads " / or" (as after "+" → " and "), return the index after "or"."""
+    i, _ = _skip_blank(toks, i)
+    if i >= len(toks) or toks[i][:2] != ("PUNCT", "/"):
+        return None
+    i, _ = _skip_blank(toks, i + 1)
+    if i >= len(toks) or not (toks[i][0] == "ANDOR" or (toks[i][0] == "WORD" and toks[i][1].lower() == "or")):
+        return None
+    return i + 1
+
+
+def _word_symbol(word: list[Token]) -> tuple[str, str | None] | None:
+    if len(word) != 1:
+        return None
+    kind, text, _ = word[0]
+    if kind == "ANDOR":
+        return ("OR", None)
+    if kind != "WORD":
+        return None
+    if CODE_RE.fullmatch(text):
+        return ("CODE", text)
+    wl = text.lower()
+    if wl == "and":
+        return ("AND", None)
+    if wl == "or":
+        return ("OR", None)
+    return None
+
+
+def _symbols(toks: list[Token]) -> list[tuple[str, str | None]]:
+    """
+    Boolean-expression symbols: whitespace-delimited words that are a
+    course code, and/or, or a paren. Any other word is ignored (including
+    codes glued to punctuation, e.g. "MATH1051.").
+    """
+    syms: list[tuple[str, str | None]] = []
+    n = len(toks)
+    i = 0
+    while i < n:
+        kind = toks[i][0]
+        if kind in ("WS", "PRE", "COMMA"):
+            i += 1
+            continue
+        if kind in ("LP", "LPT"):
+            syms.append(("LPAREN", None))
+            i += 1
+            continue
+        if kind in ("RP", "RPT"):
+            syms.append(("RPAREN", None))
+            i += 1
+            continue
+
+        if kind == "AMP":
+            j = i + 1
+            sym: tuple[str, str | None] | None = ("AND", None)
+        else:
+            j = i
+            while j < n and toks[j][0] not in _DELIM:
+                j += 1
+            sym = _word_symbol([t for t in toks[i:j] if t[0] != "PRE"])
+
+        if sym and sym[0] == "AND":
+            k = _slash_or(toks, j)
+            if k is not None:
+                # "and / or" reads as "or", unless glued to what follows
+                j = k
+                while j < n and toks[j][0] not in _DELIM:
+                    j += 1
+                sym = ("OR", None) if j == k else None
+        if sym:
+            syms.append(sym)
+        i = j
+    return syms
+
+
+# ============================= Grammar =============================
+
+class _BoolParser:
+    """
+    expr   := term ("or" term)*
+    term   := factor ("and" factor)*
+    factor := CODE | "(" expr ")"
+    Returns None unless the symbols form exactly one expression.
+    """
+
+    def __init__(self, syms: list[tuple[str, str | None]]):
+        self.syms = syms
+        self.i = 0
+
+    def peek(self) -> str | None:
+        return self.syms[self.i][0] if self.i < len(self.syms) else None
+
+    def parse(self) -> Node | None:
+        tree = self.expr()
+        return tree if tree is not None and self.i == len(self.syms) else None
+
+    def expr(self) -> Node | None:
+        tree = self.term()
+        while tree is not None and self.peek() == "OR":
+            self.i += 1
+            rhs = self.term()
+            tree = OR(tree, rhs) if rhs is not None else None
+        return tree
+
+    def term(self) -> Node | None:
+        tree = self.factor()
+        while tree is not None and self.peek() == "AND":
+            self.i += 1
+            rhs = self.factor()
+            tree = AND(tree, rhs) if rhs is not None else None
+        return tree
+
+    def factor(self) -> Node | None:
+        kind = self.peek()
+        if kind == "CODE":
+            tree = course_node(self.syms[self.i][1] or "")
+            self.i += 1
+            return tree
+        if kind == "LPAREN":
+            self.i += 1
+            tree = self.expr()
+            if tree is None or self.peek() != "RPAREN":
+                return None
+            self.i += 1
+            return tree
+        return None
+
+
+_UNITS_FROM_RE = re.compile(r"(\d+)\s+units?\s+from\b(.*)", re.I)
+_LEVEL_CREDITS_RE = re.compile(r"at least\s+(\d+)\s+units?.*level\s+(\d)\b", re.I)
+_ENROLMENT_RE = re.compile(r"\b(enrol(?:ment)?\s+in)\s+([A-Za-z0-9()\-\s]+)", re.I)
+_PERMISSION_RE = re.compile(r"permission\s+of\s+(the\s+)?(course\s+coordinator|head\s+of\s+school)", re.I)
+_ONE_OF_RE = re.compile(r"\b(one|any)\s+of\b|\beither\b", re.I)
+_BOTH_OF_RE = re.compile(r"\bboth\s+of\b", re.I)
+
+
+def _keyword_clause(t: str, words: set[str], codes: list[str]) -> Node | None:
+    """
+    Non-boolean clause forms, first match wins. `words` (lower-cased \\w runs)
+    gate each rule, so a rule's regex only runs when its keywords are present.
+    """
+    if ("units" in words or "unit" in words) and "from" in words:
+        m = _UNITS_FROM_RE.search(t)
+        if m:
+            tail_codes = sorted(set(COURSE_CODE_RE.findall(m.group(2))))
+            if tail_codes:
+                return node("UNITS_FROM", min_units=int(m.group(1)), courses=tail_codes)
+
+    tl = t.lower()
+    if "least" in words and "level" in tl:
+        m = _LEVEL_CREDITS_RE.search(t)
+        if m:
+            return node("CREDITS_AT_LEVEL", min_units=int(m.group(1)), level=int(m.group(2)))
+
+    if "enrol" in words or "enrolment" in words:
+        m = _ENROLMENT_RE.search(t)
+        if m:
+            return node("ENROLLED", program=m.group(2).strip())
+
+    if "permission" in tl and _PERMISSION_RE.search(t):
+        who = "Head of School" if "head of school" in tl else "Course Coordinator"
+        return node("PERMISSION", who=who)
+
+    if ("either" in words or (("one" in words or "any" in words) and "of" in words)) and _ONE_OF_RE.search(t):
+        return node("N_OF", n=1, args=[course_node(c) for c in codes]) if codes else None
+
+    if "both" in words and "of" in words and _BOTH_OF_RE.search(t):
+        return node("N_OF", n=2, args=[course_node(c) for c in codes]) if codes else None
+
+    if "or" in words:
+        return _or_to_nof1(OR(*[course_node(c) for c in codes])) if codes else None
+
+    if "and" in words:
+        return AND(*[course_node(c) for c in codes]) if codes else None
+
+    if codes:
+        return AND(*[course_node(c) for c in codes])
+
+    return node("TEXT", text=t)
+
+
+def _clause_words(toks: list[Token]) -> tuple[set[str], list[str]]:
+    """Lower-cased \\w runs of the normalized clause, and its sorted distinct codes."""
+    words: set[str] = set()
+    codes: set[str] = set()
+    for kind, text, rendered in toks:
+        if kind == "WORD":
+            words.add(text.lower())
+            if CODE_RE.fullmatch(text):
+                codes.add(text)
+        elif kind in ("ANDOR", "AMP"):
+            words.add(rendered.strip())
+        elif kind == "COREQ":
+            words.update(w.lower() for w in re.findall(r"\w+", text))
+    return words, sorted(codes)
+
+
+def parse_clause_tokens(toks: list[Token]) -> Node | None:
+    t = _render(toks)
+    if not t:
+        return None
+
+    syms = _symbols(toks)
+    if any(k == "CODE" for k, _ in syms) and any(k in ("AND", "OR") for k, _ in syms):
+        tree = _BoolParser(syms).parse()
+        if tree:
+            return _or_to_nof1(tree)
+
+    words, codes = _clause_words(toks)
+    return _keyword_clause(t, words, codes)
+
+
+def parse_clause(text: str) -> Node | None:
+    return parse_clause_tokens(lex(text))
+
+
+def combine_clauses(clauses: list[Node | None]) -> Node | None:
+    clean = [c for c in clauses if c]
+    if not clean:
+        return None
+    return clean[0] if len(clean) == 1 else AND(*clean)
+
+
+def _parse_section(toks: list[Token]) -> Node | None:
+    return combine_clauses([parse_clause_tokens(c) for c in _split_clauses(toks)])
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_requisites(raw: str) -> tuple[Node | None, Node | None]:
+    toks = lex(raw)
+    for i, tok in enumerate(toks):
+        if tok[0] == "COREQ":
+            pre, co = toks[:i], toks[i + 1:]
+            break
+    else:
+        pre, co = toks, []
+    return _parse_section(pre), _parse_section(co) if co else None
+
+
+def parse_prereq_text(raw: str) -> dict[str, Any]:
+    if not raw:
+        return {"prereq": None, "coreq": None, "raw": ""}
+    prereq, coreq = _parse_requisites(raw)
+    return {"prereq": prereq, "coreq": coreq, "raw": raw.strip()}
+
+
+def parse_cache_info() -> Any:
+    """lru_cache statistics of the requisite parser (hits = shared strings)."""
+    return _parse_requisites.cache_info()
+
+
+def parse_cache_clear() -> None:
+    """Drop every cached parse (prereq and incompat) and interned node, e.g. for cold-cache benchmarks."""
+    _parse_requisites.cache_clear()
+    parse_incompat_text.cache_clear()
+    intern_clear()
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_incompat_text(raw: str) -> Node | None:
+    if not raw:
+        return None
+    codes = sorted(set(COURSE_CODE_RE.findall(raw)))
+    if not codes:
+        return None
+    return node("NONE_OF", args=[course_node(c) for c in codes], raw=raw.strip())
+
+
+# ========================== Golden file ==========================
+
+def check_golden(path: Path = GOLDEN_JS, update: bool = False) -> list[str]:
+    """
+    Re-parse every golden case ({"prereq" | "incompat": [{raw, expect}]});
+    one message per case whose AST JSON differs from `expect`. With update,
+    `expect` is rewritten from the current parses instead.
+    """
+    golden = json.loads(path.read_text(encoding="utf-8"))
+    parsers = {"prereq": parse_prereq_text, "incompat": parse_incompat_text}
+    problems: list[str] = []
+    for kind, cases in golden.items():
+        for case in cases:
+            got = json.loads(json.dumps(parsers[kind](case["raw"]), default=ast_json))
+            if update:
+                case["expect"] = got
+            elif got != case["expect"]:
+                problems.append(
+                    f"{kind} {case['raw']!r}\n"
+                    f"  expected {json.dumps(case['expect'])}\n"
+                    f"  got      {json.dumps(got)}"
+                )
+    if update:
+        path.write_text(json.dumps(golden, indent=1, ensure_ascii=False) + "\n", encoding="utf-8")
+    return problems
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Check the requisite grammar against its golden file")
+    ap.add_argument("--golden", default=str(GOLDEN_JS), help="Golden cases (default: prereq_golden.json)")
+    ap.add_argument("--update", action="store_true", help="Re-record every expected AST from the current grammar")
+    args = ap.parse_args()
+    problems = check_golden(Path(args.golden), args.update)
+    for msg in problems:
+        print(msg)
+    n = sum(len(v) for v in json.loads(Path(args.golden).read_text(encoding="utf-8")).values())
+    print(f"[golden] {n} cases, {'updated' if args.update else f'{len(problems)} mismatched'}")
+    if problems:
+        sys.exit(1)
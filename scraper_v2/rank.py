@@ -4,12 +4,23 @@
 # → logical AST → prereq graph + ranks + SCC-topo order
 #
 # Install:
-#   pip install httpx lxml networkx pandas
+#   pip install httpx[http2] lxml networkx pandas
+#   pip install numpy scipy
+#   pip install pyarrow              (optional, for --parquet)
 #
 # Examples:
 #   python rank.py --years 2025 --workers 64 --full-ast
 #   python rank.py --years 2025,2024 --prefixes MATH,STAT --workers 96 --full-ast
+#   python rank.py --years 2025,2024 --per-year --full-ast   (uq_fast/2025/, uq_fast/2024/)
 #   python rank.py --years 2025 --level-range 3000-5000 --workers 64 --full-ast
+#   python rank.py --years 2025 --cache only --full-ast   (offline, from http_cache/)
+#   python rank.py --years 2025 --adaptive --rps 2 --max-rps 20 --full-ast
+#   python rank.py --years 2025 --cache only --graph-engine networkx   (reference ranking)
+#   python rank.py --years 2025 --prefixes CSSE --incremental   (refresh one subject)
+#   python rank.py --years 2025 --reparse-from cache --full-ast   (rebuild outputs offline)
+#   python rank.py --years 2025 --reparse-from raw --full-ast     (… from courses_raw.csv only)
+#   python rank.py --years 2025 --metrics-port 9108   (Prometheus text at :9108/metrics)
+#   python rank.py --years 2025 --cache only --full-ast --profile   (per-stage CPU/memory profiles)
 #
 # Outputs (uq_fast/):
 #   - courses_raw.csv                (streamed rows)
@@ -18,10 +29,19 @@
 #   - conflicts.csv                  (streamed rows)
 #   - ranks.csv                      (final)
 #   - topo_order.csv                 (final)
+#   - rank_changes.csv               (--incremental: per-field delta vs the last run)
+#   - *.parquet                      (--parquet: typed companions of the CSVs)
 #   - courses_graph.gexf             (final)
 #   - courses_graph_incompat.gexf    (final)
+#   - graph_snapshot/                (final; symlink to the current graph_snapshot.<version>/ of CSR .npy arrays, see graph_snapshot.py)
 #   - all_courses.txt                (unique seeds)
 #   - heartbeat.log                  (periodic status)
+#   - metrics.jsonl                  (periodic metrics snapshots, see crawl_metrics.py)
+#   - profiles/                      (--profile: per-stage cProfile/tracemalloc, see stage_profile.py)
+#   - http_cache/                    (content-addressed page cache)
+#   - crawl_checkpoint.json          (periodic; removed after a clean run)
+#   - incremental_base/              (--incremental: last run's outputs; removed after a clean run)
+#   - years_done.json                (--per-year: years finished so far; removed once all are)
 # ------------------------------------------------------------
 
 from __future__ import annotations
@@ -30,18 +50,35 @@ import argparse
 import asyncio
 import contextlib
 import csv
+import functools
+import gzip
+import hashlib
+import importlib.util
+import io
 import sys
 import json
 import random
 import re
+import shutil
+import threading
 import time
 import os
 from flask import Flask
 from flask_cors import CORS
 from course import course_bp
-from collections import deque
+from crawl_metrics import Metrics, serve_metrics
+from crawl_state import CodeTable, CrawlState, IdBits
+from graph_engine import ArrayGraph, GraphRanking, rank_graph
+from graph_snapshot import write_snapshot
+from prereq_ast import Node, ast_json
+from prereq_grammar import collect_codes_from_ast, is_level7, parse_cache_info, parse_incompat_text, parse_prereq_text
+from stage_profile import StageProfiler, init_worker, run_profiled
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from email.utils import parsedate_to_datetime
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterable
 
 import httpx
 import networkx as nx
@@ -62,10 +99,20 @@ EDGES_CSV = OUT / "edges_basic.csv"
 CONFL_CSV = OUT / "conflicts.csv"
 RANKS_CSV = OUT / "ranks.csv"
 TOPO_CSV = OUT / "topo_order.csv"
+CHANGES_CSV = OUT / "rank_changes.csv"
 GEXF_FULL = OUT / "courses_graph.gexf"
 GEXF_INCOMPAT = OUT / "courses_graph_incompat.gexf"
 ALL_TXT = OUT / "all_courses.txt"
 HEARTBEAT_LOG = OUT / "heartbeat.log"
+METRICS_JSONL = OUT / "metrics.jsonl"
+CACHE_DIR = OUT / "http_cache"
+CHECKPOINT_JS = OUT / "crawl_checkpoint.json"
+SNAPSHOT_DIR = OUT / "graph_snapshot"
+INCR_BASE_DIR = OUT / "incremental_base"
+YEARS_DONE_JS = OUT / "years_done.json"
+PROFILE_DIR = OUT / "profiles"
+CHECKPOINT_VERSION = 2
+REPARSE_BATCH = 256  # courses per process-pool task in --reparse-from
 
 HEADERS = {
     "User-Agent": (
@@ -78,9 +125,11 @@ HEADERS = {
     "Referer": BASE,
 }
 
+# Longest server-requested pause (Retry-After) we honour
+MAX_RETRY_AFTER = 120.0
+
 # Regexes
 COURSE_LINK_RE = re.compile(r"course\.html\?course_code=([A-Z]{4}\d{4}[A-Z]?)")
-COURSE_CODE_RE = re.compile(r"\b([A-Z]{4}\d{4}[A-Z]?)\b")
 
 # ============================== Router ==============================
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
@@ -100,112 +149,816 @@ def norm_ws(s: str) -> str:
     return " ".join((s or "").split())
 
 
-def is_level7(code: str) -> bool:
-    """True for postgraduate 7xxx courses (skip per requirements)."""
-    return bool(re.match(r"^[A-Z]{4}7", code or ""))
-
-
 def log(msg: str) -> None:
     """Stdout logging with flush."""
     print(msg, flush=True)
 
 
+class OutPaths:
+    """
+    Output file locations for one crawl: uq_fast/ itself, or
+    uq_fast/<year>/ per year in --per-year mode. Same file names either way.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        root.mkdir(parents=True, exist_ok=True)
+        self.raw_csv = root / RAW_CSV.name
+        self.struct_js = root / STRUCT_JS.name
+        self.edges_csv = root / EDGES_CSV.name
+        self.confl_csv = root / CONFL_CSV.name
+        self.ranks_csv = root / RANKS_CSV.name
+        self.topo_csv = root / TOPO_CSV.name
+        self.changes_csv = root / CHANGES_CSV.name
+        self.gexf_full = root / GEXF_FULL.name
+        self.gexf_incompat = root / GEXF_INCOMPAT.name
+        self.all_txt = root / ALL_TXT.name
+        self.heartbeat_log = root / HEARTBEAT_LOG.name
+        self.metrics_jsonl = root / METRICS_JSONL.name
+        self.checkpoint = root / CHECKPOINT_JS.name
+        self.snapshot = root / SNAPSHOT_DIR.name
+        self.incr_base = root / INCR_BASE_DIR.name
+
+
 # ======================= Streaming Writers =========================
 
+WRITER_FLUSH_ROWS = 512   # hand a writer's buffer to the flush thread at this size
+WRITER_FLUSH_SECS = 1.0   # ...or at least this often
+
+
+def _reopen_truncated(path: Path, offset: int):
+    """Cut a streamed file back to a checkpointed byte offset and append from there."""
+    with open(path, "r+b") as fb:
+        fb.truncate(offset)
+    return open(path, "a", encoding="utf-8", newline="")
+
+
+class _FlushThread(threading.Thread):
+    """One daemon thread that drains every open _BufferedFile."""
+
+    def __init__(self) -> None:
+        super().__init__(name="stream-writer", daemon=True)
+        self.files: set[_BufferedFile] = set()
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+
+    def register(self, bf: _BufferedFile) -> None:
+        with self.lock:
+            self.files.add(bf)
+
+    def unregister(self, bf: _BufferedFile) -> None:
+        with self.lock:
+            self.files.discard(bf)
+
+    def run(self) -> None:
+        while True:
+            self.wake.wait(WRITER_FLUSH_SECS)
+            self.wake.clear()
+            with self.lock:
+                files = list(self.files)
+            for bf in files:
+                bf.drain()
+
+
+_FLUSHER: _FlushThread | None = None
+
+
+def _flusher() -> _FlushThread:
+    global _FLUSHER
+    if _FLUSHER is None:
+        _FLUSHER = _FlushThread()
+        _FLUSHER.start()
+    return _FLUSHER
+
+
+class _BufferedFile:
+    """
+    Append-only text file fed from the event loop, written by the flush thread.
+    Data goes to `<name>.part`; finalize() renames it over the real path, so
+    readers never see a half-written output. With resume_at, an existing
+    .part (or finished file) is cut back to that offset and appended to.
+    """
+
+    def __init__(self, path: Path, head: str, resume_at: int | None = None):
+        self.path = path
+        self.part = path.with_name(path.name + ".part")
+        self.resumed = False
+        if resume_at is not None:
+            if not self.part.exists() and path.exists():
+                os.replace(path, self.part)
+            if self.part.exists():
+                self.f = _reopen_truncated(self.part, resume_at)
+                self.resumed = True
+        if not self.resumed:
+            self.f = open(self.part, "w", encoding="utf-8", newline="")
+            self.f.write(head)
+        self.buf: list[str] = []
+        self.buf_lock = threading.Lock()
+        self.io_lock = threading.Lock()
+        self.error: BaseException | None = None
+        _flusher().register(self)
+
+    def append(self, text: str) -> None:
+        """Queue text for the flush thread (cheap; called in the event loop)."""
+        with self.buf_lock:
+            self.buf.append(text)
+            full = len(self.buf) >= WRITER_FLUSH_ROWS
+        if full:
+            _flusher().wake.set()
+
+    def drain(self) -> None:
+        """Write + flush whatever is buffered (flush thread, or sync/finalize)."""
+        with self.io_lock:
+            with self.buf_lock:
+                chunk, self.buf = self.buf, []
+            if not chunk or self.f.closed:
+                return
+            try:
+                self.f.write("".join(chunk))
+                self.f.flush()
+            except OSError as e:
+                self.error = e
+
+    def sync(self) -> int:
+        """Drain + fsync; return the byte offset a checkpoint can resume from."""
+        self.drain()
+        with self.io_lock:
+            if self.error:
+                raise self.error
+            os.fsync(self.f.fileno())
+            return self.f.tell()
+
+    def finalize(self, tail: str = "") -> None:
+        """Write the tail, fsync, close and atomically rename .part → path."""
+        if self.f.closed:
+            return
+        _flusher().unregister(self)
+        self.drain()
+        with self.io_lock:
+            self.f.write(tail)
+            self.f.flush()
+            os.fsync(self.f.fileno())
+            self.f.close()
+        os.replace(self.part, self.path)
+        if self.error:
+            raise self.error
+
+
 class StreamingJSONMap:
     """
     Stream a JSON object to disk as `{ "...": {...}, ... }`.
     Useful when you can't hold the whole dict in memory.
+    With resume_at, continue a previous file from a checkpointed offset.
     """
 
-    def __init__(self, path: Path):
+    HEAD = "{\n"
+
+    def __init__(self, path: Path, resume_at: int | None = None):
         self.path = path
-        self.f = open(self.path, "w", encoding="utf-8", newline="")
-        self.f.write("{\n")
-        self.first = True
-        self.lock = asyncio.Lock()
+        self.out = _BufferedFile(path, self.HEAD, resume_at)
+        self.first = not self.out.resumed or resume_at <= len(self.HEAD)
 
     async def write_item(self, key: str, obj: dict[str, Any]) -> None:
         js_key = json.dumps(key, ensure_ascii=False)
-        js_val = json.dumps(obj, ensure_ascii=False)
-        async with self.lock:
-            if not self.first:
-                self.f.write(",\n")
-            else:
-                self.first = False
-            self.f.write(f"  {js_key}: {js_val}")
-            self.f.flush()
+        js_val = json.dumps(obj, ensure_ascii=False, default=ast_json)
+        sep = "" if self.first else ",\n"
+        self.first = False
+        self.out.append(f"{sep}  {js_key}: {js_val}")
+
+    def sync(self) -> int:
+        return self.out.sync()
 
     async def close(self) -> None:
-        async with self.lock:
-            self.f.write("\n}\n")
-            self.f.flush()
-            self.f.close()
+        self.out.finalize("\n}\n")
 
 
 class StreamingCSV:
-    """CSV writer with header that flushes each appended row."""
+    """
+    CSV writer with header; rows are buffered and written by the flush thread.
+    With resume_at, continue a previous file from a checkpointed offset.
+    """
 
-    def __init__(self, path: Path, header: list[str]):
+    def __init__(
+        self,
+        path: Path,
+        header: list[str],
+        resume_at: int | None = None,
+        parquet: str | None = None,
+    ):
         self.path = path
-        self.f = open(self.path, "w", encoding="utf-8", newline="")
-        self.writer = csv.writer(self.f)
-        self.writer.writerow(header)
-        self.f.flush()
-        self.lock = asyncio.Lock()
+        self.sio = io.StringIO()
+        self.writer = csv.writer(self.sio)
+        self.out = _BufferedFile(path, self._format(header), resume_at)
+        # Optional typed companion (<name>.parquet); `parquet` is its PARQUET_SCHEMAS kind
+        self.columnar: StreamingParquet | None = None
+        if parquet:
+            seed = None
+            if self.out.resumed:
+                self.out.drain()
+                with open(self.out.part, "r", encoding="utf-8", newline="") as f:
+                    seed = list(csv.reader(f))[1:]
+            self.columnar = StreamingParquet(path.with_suffix(".parquet"), parquet, seed)
+
+    def _format(self, row: list[Any]) -> str:
+        self.sio.seek(0)
+        self.sio.truncate()
+        self.writer.writerow(row)
+        return self.sio.getvalue()
 
     async def write_row(self, row: list[Any]) -> None:
-        async with self.lock:
-            self.writer.writerow(row)
-            self.f.flush()
+        self.out.append(self._format(row))
+        if self.columnar:
+            self.columnar.write_row(row)
+
+    def sync(self) -> int:
+        return self.out.sync()
 
     async def close(self) -> None:
-        async with self.lock:
-            self.f.flush()
-            self.f.close()
+        self.out.finalize()
+        if self.columnar:
+            self.columnar.close()
+
+
+# ========================= Columnar Outputs ========================
+
+# Column types for the Parquet companions of each CSV.
+#   code: dictionary-encoded course code   str: utf8   i32/f64: numeric
+PARQUET_SCHEMAS: dict[str, list[tuple[str, str]]] = {
+    "raw": [("course_code", "code"), ("url", "str"), ("title", "str"),
+            ("prereq_raw", "str"), ("incompat_raw", "str")],
+    "edges": [("course", "code"), ("prereq", "code")],
+    "conflicts": [("course", "code"), ("conflict_with", "code")],
+    "ranks": [("course", "code"), ("level", "i32"), ("in_degree", "i32"), ("out_degree", "i32"),
+              ("pagerank", "f64"), ("scc_id", "i32"), ("scc_size", "i32")],
+    "topo": [("order", "i32"), ("course", "code"), ("scc_id", "i32"), ("level", "i32"),
+             ("scc_size", "i32")],
+}
+PARQUET_ROW_GROUP = 16384
+PARQUET_COMPRESSION = "zstd"
+
+
+def _pyarrow():
+    """Import pyarrow lazily: only needed with --parquet."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise SystemExit("--parquet needs pyarrow (pip install pyarrow)") from e
+    return pa, pq
+
+
+def arrow_schema(kind: str):
+    pa, _ = _pyarrow()
+    types = {
+        "code": pa.dictionary(pa.int32(), pa.string()),
+        "str": pa.string(),
+        "i32": pa.int32(),
+        "f64": pa.float64(),
+    }
+    return pa.schema([(name, types[t]) for name, t in PARQUET_SCHEMAS[kind]])
+
+
+def arrow_table(kind: str, columns: list[list[Any]]):
+    """Typed Arrow table from per-column Python lists (CSV strings are cast)."""
+    pa, _ = _pyarrow()
+    arrays = []
+    for (_, t), col in zip(PARQUET_SCHEMAS[kind], columns):
+        if t == "code":
+            arrays.append(pa.array(col, type=pa.string()).dictionary_encode())
+        elif t == "str":
+            arrays.append(pa.array(["" if v is None else str(v) for v in col], type=pa.string()))
+        elif t == "i32":
+            arrays.append(pa.array([int(v) for v in col], type=pa.int32()))
+        else:
+            arrays.append(pa.array([float(v) for v in col], type=pa.float64()))
+    return pa.Table.from_arrays(arrays, schema=arrow_schema(kind))
+
+
+def write_parquet_df(df: pd.DataFrame, path: Path, kind: str) -> None:
+    """Write a finished table (ranks/topo) as Parquet next to its CSV."""
+    _, pq = _pyarrow()
+    names = [name for name, _ in PARQUET_SCHEMAS[kind]]
+    table = arrow_table(kind, [df[n].tolist() for n in names])
+    tmp = path.with_name(path.name + ".part")
+    pq.write_table(table, tmp, compression=PARQUET_COMPRESSION, row_group_size=PARQUET_ROW_GROUP)
+    os.replace(tmp, path)
+
+
+class StreamingParquet:
+    """
+    Row-group writer for crawl-time tables: rows are buffered per column and
+    written as one compressed row group every PARQUET_ROW_GROUP rows.
+    Parquet can't be appended to after a crash, so a resumed run seeds the
+    new file with the rows already in the (truncated) CSV.
+    """
+
+    def __init__(self, path: Path, kind: str, seed_rows: list[list[str]] | None = None):
+        _, pq = _pyarrow()
+        self.path = path
+        self.part = path.with_name(path.name + ".part")
+        self.kind = kind
+        self.cols: list[list[Any]] = [[] for _ in PARQUET_SCHEMAS[kind]]
+        self.writer = pq.ParquetWriter(self.part, arrow_schema(kind), compression=PARQUET_COMPRESSION)
+        for row in seed_rows or ():
+            self.write_row(row)
+
+    def write_row(self, row: list[Any]) -> None:
+        for col, v in zip(self.cols, row):
+            col.append(v)
+        if len(self.cols[0]) >= PARQUET_ROW_GROUP:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self.cols[0]:
+            self.writer.write_table(arrow_table(self.kind, self.cols))
+            self.cols = [[] for _ in self.cols]
+
+    def close(self) -> None:
+        if self.writer is None:
+            return
+        self._flush()
+        self.writer.close()
+        self.writer = None
+        os.replace(self.part, self.path)
+
+
+# =========================== Checkpoints ===========================
+
+def save_checkpoint(path: Path, state: dict[str, Any]) -> None:
+    """Atomically replace the checkpoint file (write tmp → fsync → rename)."""
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path: Path) -> dict[str, Any] | None:
+    """Return the last checkpoint, or None if missing/unreadable."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return state if state.get("version") == CHECKPOINT_VERSION else None
+
+
+def load_raw_results(path: Path) -> dict[str, tuple[str, str, str, str, str]]:
+    """Rebuild `results` from a (truncated) courses_raw.csv after a resume."""
+    out: dict[str, tuple[str, str, str, str, str]] = {}
+    with contextlib.suppress(OSError):
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                out[row["course_code"]] = (
+                    row.get("url", ""),
+                    row.get("title", ""),
+                    row.get("prereq_raw", ""),
+                    row.get("incompat_raw", ""),
+                    "",
+                )
+    return out
+
+
+# ========================= Incremental Runs ========================
+
+RANK_FIELDS = ["level", "in_degree", "out_degree", "pagerank", "scc_id", "scc_size"]
+
+
+class PreviousRun:
+    """
+    Outputs of the last completed run in an output directory, loaded before
+    an --incremental crawl overwrites them:
+      - results / struct: per-course raw rows and AST items
+      - edges / conflicts: (course, prereq) pairs and sorted conflict pairs
+      - rank_rows: ranks.csv as {course: {field: text}}
+    """
+
+    def __init__(self, out: OutPaths):
+        self.results = load_raw_results(out.raw_csv)
+        self.seeds = out.all_txt.read_text(encoding="utf-8").split() if out.all_txt.exists() else []
+
+        self.edges: set[tuple[str, str]] = set()
+        with open(out.edges_csv, "r", encoding="utf-8", newline="") as f:
+            self.edges.update((r["course"], r["prereq"]) for r in csv.DictReader(f))
+
+        self.conflicts: set[tuple[str, str]] = set()
+        with open(out.confl_csv, "r", encoding="utf-8", newline="") as f:
+            for r in csv.DictReader(f):
+                a, b = sorted((r["course"], r["conflict_with"]))
+                self.conflicts.add((a, b))
+
+        self.struct: dict[str, Any] = {}
+        if out.struct_js.exists():
+            with contextlib.suppress(ValueError):
+                self.struct = json.loads(out.struct_js.read_text(encoding="utf-8"))
+
+        self.rank_rows: dict[str, dict[str, str]] = {}
+        with contextlib.suppress(OSError):
+            with open(out.ranks_csv, "r", encoding="utf-8", newline="") as f:
+                self.rank_rows = {r["course"]: r for r in csv.DictReader(f)}
+
+
+def load_previous_run(out: OutPaths) -> PreviousRun | None:
+    """
+    Last completed outputs in `out`, or None if there are none to build on.
+    They are copied to out.incr_base first, which is kept until the
+    incremental run finishes: an interrupted run still closes (replaces) the
+    outputs, and its --resume must build on the old ones, not on those.
+    """
+    base = out.incr_base
+    if not base.exists():
+        if not (out.raw_csv.exists() and out.edges_csv.exists() and out.confl_csv.exists()):
+            return None
+        tmp = base.with_name(base.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        for p in (out.raw_csv, out.edges_csv, out.confl_csv, out.struct_js, out.ranks_csv, out.all_txt):
+            if p.exists():
+                shutil.copy2(p, tmp / p.name)
+        os.replace(tmp, base)
+    try:
+        return PreviousRun(OutPaths(base))
+    except (OSError, KeyError, csv.Error):
+        return None
+
+
+def rank_changes(
+    prev_rows: dict[str, dict[str, str]],
+    rows: list[dict[str, Any]],
+) -> list[list[str]]:
+    """
+    Row-level delta between the previous ranks.csv and the new rows:
+      [course, "added" | "removed" | "changed", field, old, new]
+    """
+    changes: list[list[str]] = []
+    seen: set[str] = set()
+    for row in sorted(rows, key=lambda r: r["course"]):
+        c = row["course"]
+        seen.add(c)
+        old = prev_rows.get(c)
+        if old is None:
+            changes.append([c, "added", "", "", ""])
+            continue
+        for field in RANK_FIELDS:
+            new_v = str(row[field])
+            if old.get(field) != new_v:
+                changes.append([c, "changed", field, old.get(field, ""), new_v])
+    for c in sorted(set(prev_rows) - seen):
+        changes.append([c, "removed", "", "", ""])
+    return changes
+
+
+def same_pairs(n: int, pairs: Iterable[tuple[str, str]], prev: set[tuple[str, str]]) -> bool:
+    """Whether `n` distinct `pairs` are exactly `prev`, without building a set of them."""
+    return n == len(prev) and all(p in prev for p in pairs)
+
+
+def write_if_changed(path: Path, data: str | bytes) -> bool:
+    """Atomically (re)write `path` only if its content differs; True if written."""
+    raw = data.encode("utf-8") if isinstance(data, str) else data
+    with contextlib.suppress(OSError):
+        if path.read_bytes() == raw:
+            return False
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(raw)
+    os.replace(tmp, path)
+    return True
+
+
+def write_gexf_if_changed(G: nx.Graph, path: Path) -> bool:
+    buf = io.BytesIO()
+    nx.write_gexf(G, buf)
+    return write_if_changed(path, buf.getvalue())
 
 
 # ===================== Token-Bucket Rate Limit =====================
 
 class AsyncTokenBucket:
     """
-    Simple token-bucket limiter:
+    Token-bucket limiter shared by every request:
       - rate: tokens per second
       - capacity: max burst tokens
-    acquire(n) blocks until at least n tokens are available.
+    acquire(n) blocks until at least n tokens are available and no
+    cool-off is in force.
+
+    With adaptive=True the rate follows AIMD between min_rate and max_rate:
+      - record(latency): additive increase while responses are healthy,
+        multiplicative decrease when latency climbs well above its baseline
+      - cooloff(seconds): every worker pauses, and the rate is cut
     """
 
-    def __init__(self, rate: float, capacity: int):
+    INCREASE = 0.5          # ≈ +0.5 rps per second of healthy traffic
+    THROTTLE_CUT = 0.5      # 429/403/503
+    LATENCY_CUT = 0.8       # latency well above baseline
+    LATENCY_RATIO = 2.5
+    LATENCY_FLOOR = 0.2     # seconds; ignore ratios on very fast responses
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: int,
+        adaptive: bool = False,
+        min_rate: float | None = None,
+        max_rate: float | None = None,
+    ):
         self.rate = max(0.1, float(rate))
         self.capacity = max(1, int(capacity))
         self.tokens = float(self.capacity)
         self.updated = asyncio.get_event_loop().time()
         self.lock = asyncio.Lock()
 
+        self.adaptive = adaptive
+        self.min_rate = max(0.1, float(min_rate) if min_rate else self.rate / 8)
+        self.max_rate = max(self.rate, float(max_rate) if max_rate else self.rate * 8)
+        self.paused_until = 0.0
+        self.last_cut = 0.0
+        self.cuts = 0
+        self.lat_ewma: float | None = None
+        self.lat_base: float | None = None
+
     async def acquire(self, n: int = 1) -> None:
         while True:
             async with self.lock:
                 now = asyncio.get_event_loop().time()
-                elapsed = now - self.updated
-                self.updated = now
-                self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
-                if self.tokens >= n:
-                    self.tokens -= n
-                    return
-                need = n - self.tokens
-                wait = need / self.rate
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    elapsed = now - self.updated
+                    self.updated = now
+                    self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+                    if self.tokens >= n:
+                        self.tokens -= n
+                        return
+                    need = n - self.tokens
+                    wait = need / self.rate
             await asyncio.sleep(wait)
 
+    def _cut(self, factor: float) -> None:
+        """Multiplicative decrease, at most once per ~RTT so a burst of errors counts once."""
+        now = asyncio.get_event_loop().time()
+        if now - self.last_cut < max(1.0, 2 * (self.lat_ewma or 0.0)):
+            return
+        self.last_cut = now
+        self.cuts += 1
+        self.rate = max(self.min_rate, self.rate * factor)
+
+    def record(self, latency: float) -> None:
+        """Feed back one healthy response's latency (adaptive mode only)."""
+        if not self.adaptive:
+            return
+        self.lat_ewma = latency if self.lat_ewma is None else 0.8 * self.lat_ewma + 0.2 * latency
+        # Baseline tracks the fastest recent responses and creeps up slowly
+        self.lat_base = latency if self.lat_base is None else min(latency, self.lat_base * 1.002)
+
+        if self.lat_ewma > self.LATENCY_FLOOR and self.lat_ewma > self.LATENCY_RATIO * self.lat_base:
+            self._cut(self.LATENCY_CUT)
+        else:
+            self.rate = min(self.max_rate, self.rate + self.INCREASE / self.rate)
+
     async def cooloff(self, seconds: float) -> None:
-        """Force a pause (e.g., after 429/403)."""
-        await asyncio.sleep(max(0.0, seconds))
+        """
+        Force a pause (e.g., after 429/403) for every worker, not just the
+        caller: acquire() holds all requests until the cool-off ends.
+        """
+        now = asyncio.get_event_loop().time()
+        self.paused_until = max(self.paused_until, now + max(0.0, seconds))
+        self.tokens = 0.0
+        self.updated = self.paused_until
+        if self.adaptive:
+            self._cut(self.THROTTLE_CUT)
+        await asyncio.sleep(max(0.0, self.paused_until - now))
+
+    def status(self) -> str:
+        """Current effective rate (and cool-off state) for the heartbeat."""
+        msg = f"rps={self.rate:.2f}"
+        if self.adaptive:
+            msg += f" [{self.min_rate:g}..{self.max_rate:g}] cuts={self.cuts}"
+        left = self.paused_until - asyncio.get_event_loop().time()
+        if left > 0:
+            msg += f" paused={left:.1f}s"
+        return msg
+
+
+def retry_after_seconds(value: str | None) -> float | None:
+    """Parse a Retry-After header (delta-seconds or HTTP-date)."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    with contextlib.suppress(TypeError, ValueError):
+        when = parsedate_to_datetime(value)
+        return max(0.0, when.timestamp() - time.time())
+    return None
 
 
 REQUEST_LIMITER: AsyncTokenBucket | None = None
 
 
+# ============================= Metrics =============================
+# Where a crawl spends its time. Histograms are in seconds; run() starts a
+# fresh registry, the heartbeat sets the gauges and appends metrics.jsonl.
+
+METRIC_HELP = {
+    "fetch_seconds": "HTTP GET latency by response status (error = transport failure)",
+    "limiter_wait_seconds": "Time spent waiting for a token-bucket slot (incl. cool-offs)",
+    "semaphore_wait_seconds": "Time spent waiting for a concurrency slot",
+    "queue_wait_seconds": "Time a pipeline stage blocked handing work to a full queue",
+    "parse_seconds": "Parse time per course page (pool = incl. process-pool queueing)",
+    "parse_errors_total": "Pages whose parse raised (recorded as empty rows)",
+    "write_seconds": "Streaming-writer time per course (rows, AST, edges, conflicts)",
+    "retries_total": "Retried requests by status (error = transport failure)",
+    "backoff_seconds_total": "Seconds slept backing off, by status",
+    "stage_seconds_total": "Wall time per pipeline stage",
+    "courses": "Courses in the crawl frontier, by state",
+    "edges": "Prereq edges found so far",
+    "conflicts": "Incompatibility pairs found so far",
+    "rate_limit_rps": "Current token-bucket rate",
+}
+
+METRICS = Metrics("uq_crawl", METRIC_HELP)
+
+
+# ============================ Profiling ============================
+# --profile: one CPU + memory profile per pipeline stage (stage_profile.py)
+
+PROFILER: StageProfiler | None = None
+
+
+def profile_stage(name: str, memory: bool = True) -> Any:
+    """Context manager profiling the block as stage `name` (no-op without --profile)."""
+    return PROFILER.stage(name, memory) if PROFILER else contextlib.nullcontext()
+
+
+def pool_job(stage: str, fn: Any) -> Any:
+    """fn for parse_pool; under --profile, wrapped so the worker profiles it as `stage`."""
+    return functools.partial(run_profiled, stage, fn) if PROFILER else fn
+
+
+# ============================ Page Cache ===========================
+
+# Placeholder for the crawl year inside stored pages: the same course page
+# for 2024 and 2025 usually differs only in year strings (links, headings),
+# so masking them lets identical years share one blob and one parse.
+YEAR_MARK = "\x00YEAR\x00"
+
+
+def page_fingerprint(text: str, year: int | None) -> tuple[str, bytes]:
+    """(sha256, masked bytes) of a page with its year replaced by YEAR_MARK."""
+    if year:
+        text = text.replace(str(year), YEAR_MARK)
+    data = text.encode("utf-8")
+    return hashlib.sha256(data).hexdigest(), data
+
+
+def read_blob(blob: Path, year: int | None = None) -> str | None:
+    """Decompress one stored page; put `year` back where it was masked."""
+    try:
+        text = gzip.decompress(blob.read_bytes()).decode("utf-8")
+    except (OSError, ValueError):
+        return None
+    if year:
+        text = text.replace(YEAR_MARK, str(year))
+    return text
+
+
+class PageCache:
+    """
+    Content-addressed on-disk response cache.
+      - index/<sha256(year|url)>.json : url, year, etag, last_modified, body sha
+      - blobs/<sha[:2]>/<sha>.html.gz : gzip body (year-masked), shared by
+                                        identical pages across URLs and years
+    Modes:
+      - "revalidate": conditional GET (If-None-Match / If-Modified-Since);
+                      a 304 serves the stored body
+      - "only":       never touch the network; misses return None
+    """
+
+    MODES = ("revalidate", "only")
+
+    def __init__(self, root: Path, mode: str = "revalidate"):
+        if mode not in self.MODES:
+            raise ValueError(f"unknown cache mode: {mode}")
+        self.root = root
+        self.mode = mode
+        self.index_dir = root / "index"
+        self.blob_dir = root / "blobs"
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+
+    @staticmethod
+    def key(url: str, year: int | None) -> str:
+        return hashlib.sha256(f"{year or ''}|{url}".encode("utf-8")).hexdigest()
+
+    def _blob_path(self, sha: str) -> Path:
+        return self.blob_dir / sha[:2] / f"{sha}.html.gz"
+
+    @staticmethod
+    def _atomic_write(path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    def lookup(self, url: str, year: int | None) -> dict[str, Any] | None:
+        """Index entry for (url, year) whose blob still exists, else None."""
+        try:
+            entry = json.loads((self.index_dir / f"{self.key(url, year)}.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if not self._blob_path(entry.get("sha", "")).exists():
+            return None
+        return entry
+
+    def read_body(self, entry: dict[str, Any]) -> str | None:
+        if "sha" not in entry:
+            return None
+        return read_blob(self._blob_path(entry["sha"]), entry.get("year") if entry.get("year_masked") else None)
+
+    def course_pages(self, year: int | None) -> dict[str, tuple[str, str, int | None]]:
+        """
+        Every stored course page fetched for `year`:
+        code → (url, blob path, year to unmask or None). For offline reparses.
+        """
+        pages: dict[str, tuple[str, str, int | None]] = {}
+        for p in sorted(self.index_dir.glob("*.json")):
+            try:
+                entry = json.loads(p.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            m = COURSE_LINK_RE.search(entry.get("url") or "")
+            blob = self._blob_path(entry.get("sha", ""))
+            if m and entry.get("year") == year and blob.exists():
+                masked = entry.get("year") if entry.get("year_masked") else None
+                pages[m.group(1)] = (entry["url"], str(blob), masked)
+        return pages
+
+    def serve(self, entry: dict[str, Any] | None) -> str | None:
+        """Cache-only read; counts a hit or a miss."""
+        body = self.read_body(entry) if entry else None
+        if body is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return body
+
+    def revalidated(self, entry: dict[str, Any]) -> str | None:
+        """Body for a 304 Not Modified response."""
+        body = self.read_body(entry)
+        if body is not None:
+            self.revalidations += 1
+        return body
+
+    @staticmethod
+    def conditional_headers(entry: dict[str, Any] | None) -> dict[str, str] | None:
+        if not entry:
+            return None
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers or None
+
+    def store(self, url: str, year: int | None, text: str, headers: Any) -> None:
+        """Persist a fresh 200 body (deduplicated by content hash) + validators."""
+        self.misses += 1
+        sha, data = page_fingerprint(text, year)
+        entry = {
+            "url": url,
+            "year": year,
+            "year_masked": bool(year),
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "sha": sha,
+            "fetched_at": time.time(),
+        }
+        with contextlib.suppress(OSError):
+            blob = self._blob_path(sha)
+            if not blob.exists():
+                self._atomic_write(blob, gzip.compress(data, compresslevel=6))
+            self._atomic_write(
+                self.index_dir / f"{self.key(url, year)}.json",
+                json.dumps(entry, ensure_ascii=False).encode("utf-8"),
+            )
+
+    def status(self) -> str:
+        return f"cache[{self.mode}] hit={self.hits} reval={self.revalidations} miss={self.misses}"
+
+
+PAGE_CACHE: PageCache | None = None
+
+
 # =========================== HTTP Layer ============================
 
+# HTTP/2 needs the optional h2 package (pip install httpx[http2])
+HTTP2 = importlib.util.find_spec("h2") is not None
+
+
 def client_factory(workers: int, rps: float) -> httpx.AsyncClient:
     """
     Create an HTTPX client with modest connection pools.
@@ -217,12 +970,12 @@ def client_factory(workers: int, rps: float) -> httpx.AsyncClient:
         max_connections=max_conns,
         max_keepalive_connections=max(8, max_conns // 2),
     )
+    # Pool limits and HTTP/2 are transport settings: a client given its own
+    # transport ignores them
     return httpx.AsyncClient(
-        http2=True,
         headers=HEADERS,
         timeout=httpx.Timeout(30.0, connect=15.0, read=30.0),
-        limits=limits,
-        transport=httpx.AsyncHTTPTransport(retries=0),
+        transport=httpx.AsyncHTTPTransport(retries=0, http2=HTTP2, limits=limits),
     )
 
 
@@ -238,59 +991,93 @@ def looks_like_course_html(text: str) -> bool:
     )
 
 
-async def limited_get(client: httpx.AsyncClient, url: str) -> httpx.Response | None:
-    """GET with token-bucket gating."""
+async def limited_get(
+    client: httpx.AsyncClient,
+    url: str,
+    headers: dict[str, str] | None = None,
+) -> httpx.Response | None:
+    """GET with token-bucket gating; healthy latencies feed the limiter."""
     if REQUEST_LIMITER:
-        await REQUEST_LIMITER.acquire()
+        with METRICS.timer("limiter_wait_seconds"):
+            await REQUEST_LIMITER.acquire()
+    t0 = time.perf_counter()
     try:
-        return await client.get(url)
+        r = await client.get(url, headers=headers)
     except Exception:
+        METRICS.observe("fetch_seconds", time.perf_counter() - t0, status="error")
         return None
+    dt = time.perf_counter() - t0
+    METRICS.observe("fetch_seconds", dt, status=str(r.status_code))
+    if REQUEST_LIMITER and r.status_code in (200, 304):
+        REQUEST_LIMITER.record(dt)
+    return r
 
 
 async def robust_get_text(
     client: httpx.AsyncClient,
     url: str,
     attempts: int = 6,
+    year: int | None = None,
 ) -> str | None:
     """
     GET with retry/backoff + rate-limit cooling on 429/403/503.
+    Goes through PAGE_CACHE (if enabled): conditional GETs, 304 → cached body.
     """
+    entry = PAGE_CACHE.lookup(url, year) if PAGE_CACHE else None
+    if PAGE_CACHE and PAGE_CACHE.mode == "only":
+        return PAGE_CACHE.serve(entry)
+    cond = PAGE_CACHE.conditional_headers(entry) if PAGE_CACHE else None
+
     delay = 0.4
 
     for _ in range(attempts):
-        r = await limited_get(client, url)
+        r = await limited_get(client, url, cond)
         if r is None:
-            await asyncio.sleep(delay + jitter(0.05, 0.15))
+            pause = delay + jitter(0.05, 0.15)
+            METRICS.inc("retries_total", status="error")
+            METRICS.inc("backoff_seconds_total", pause, status="error")
+            await asyncio.sleep(pause)
             delay = min(delay * 1.7, 3.0)
             continue
 
+        if r.status_code == 304 and entry and PAGE_CACHE:
+            return PAGE_CACHE.revalidated(entry)
+
         if r.status_code == 200 and r.text:
+            if PAGE_CACHE:
+                PAGE_CACHE.store(url, year, r.text, r.headers)
             return r.text
 
         if r.status_code in (429, 403, 503):
-            ra = r.headers.get("Retry-After")
-            if ra and ra.isdigit():
-                cool = min(10.0, float(ra))
-            else:
-                cool = delay
+            ra = retry_after_seconds(r.headers.get("Retry-After"))
+            cool = min(MAX_RETRY_AFTER, ra) if ra is not None else delay
 
             log(f"[backoff] {r.status_code} on {url} → cooling {cool:.2f}s")
+            pause = cool + jitter(0.05, 0.2)
+            METRICS.inc("retries_total", status=str(r.status_code))
+            METRICS.inc("backoff_seconds_total", pause, status=str(r.status_code))
             if REQUEST_LIMITER:
-                await REQUEST_LIMITER.cooloff(cool + jitter(0.05, 0.2))
+                await REQUEST_LIMITER.cooloff(pause)
             else:
-                await asyncio.sleep(cool + jitter(0.05, 0.2))
+                await asyncio.sleep(pause)
 
             delay = min(delay * 1.9, 6.0)
             continue
 
         # Other non-200s, just back off a bit and retry
-        await asyncio.sleep(delay + jitter(0.05, 0.15))
+        pause = delay + jitter(0.05, 0.15)
+        METRICS.inc("retries_total", status=str(r.status_code))
+        METRICS.inc("backoff_seconds_total", pause, status=str(r.status_code))
+        await asyncio.sleep(pause)
         delay = min(delay * 1.7, 3.0)
 
     # Final best-effort try
-    r = await limited_get(client, url)
+    r = await limited_get(client, url, cond)
+    if r and r.status_code == 304 and entry and PAGE_CACHE:
+        return PAGE_CACHE.revalidated(entry)
     if r and r.status_code == 200 and r.text:
+        if PAGE_CACHE:
+            PAGE_CACHE.store(url, year, r.text, r.headers)
         return r.text
     return None
 
@@ -311,7 +1098,7 @@ async def search_bucket(
     params = {"searchType": "coursecode", "keywords": kw, "year": str(year)}
     url = f"{BASE}search.html?{urlencode(params)}"
 
-    html = await robust_get_text(client, url)
+    html = await robust_get_text(client, url, year=year)
     if not html:
         return set()
 
@@ -332,9 +1119,13 @@ async def harvest_codes(
         sem = asyncio.Semaphore(max(4, min(12, workers // 8)))
 
         async def one(y: int, d: int, p: str | None) -> None:
-            async with sem:
+            with METRICS.timer("semaphore_wait_seconds", stage="harvest"):
+                await sem.acquire()
+            try:
                 got = await search_bucket(client, y, d, p)
                 codes.update(got)
+            finally:
+                sem.release()
 
         await asyncio.gather(*(one(y, d, p) for (y, d, p) in jobs))
 
@@ -415,18 +1206,27 @@ def parse_course_page(html_text: str) -> tuple[str, str, str, str, str]:
     return title, prereq, incompat, units, summary
 
 
-async def fetch_course(
+async def fetch_course_html(
     client: httpx.AsyncClient,
     code: str,
     year_hint: int | None = None,
-) -> tuple[str, str, str, str, str, str, str]:
-    """Fetch + parse one course page; always return a 7-tuple."""
+) -> tuple[str, str, str | None]:
+    """Fetch stage: one course page → (code, url, html or None)."""
     params = {"course_code": code}
     if year_hint:
         params["year"] = str(year_hint)
 
     url = f"{BASE}course.html?{urlencode(params)}"
-    text = await robust_get_text(client, url)
+    return code, url, await robust_get_text(client, url, year=year_hint)
+
+
+async def fetch_course(
+    client: httpx.AsyncClient,
+    code: str,
+    year_hint: int | None = None,
+) -> tuple[str, str, str, str, str, str, str]:
+    """Fetch + parse one course page; always return a 7-tuple."""
+    code, url, text = await fetch_course_html(client, code, year_hint)
 
     if not text:
         return code, url, "", "", "", "", ""
@@ -436,272 +1236,104 @@ async def fetch_course(
 
 
 # ====================== AST / Text Normalization ===================
+# Requisite text → AST lives in prereq_grammar.py (single-pass lexer +
+# grammar, cached per distinct raw string).
 
-def course_node(code: str) -> dict[str, Any]:
-    return {"op": "COURSE", "code": code}
-
-
-def flatten(op: str, args: list[Any]) -> dict[str, Any]:
-    """Flatten nested AND/OR and deduplicate COURSE leaves."""
-    out = []
-    for a in args:
-        if isinstance(a, dict) and a.get("op") == op:
-            out.extend(a.get("args", []))
-        else:
-            out.append(a)
-
-    if op in ("AND", "OR"):
-        seen: set[Any] = set()
-        uniq = []
-        for a in out:
-            key = ("COURSE", a.get("code")) if isinstance(a, dict) and a.get("op") == "COURSE" else id(a)
-            if key in seen:
-                continue
-            seen.add(key)
-            uniq.append(a)
-        return {"op": op, "args": uniq}
-
-    return {"op": op, "args": out}
-
-
-def AND(*xs: Any) -> dict[str, Any]:
-    return flatten("AND", [x for x in xs if x])
-
-
-def OR(*xs: Any) -> dict[str, Any]:
-    return flatten("OR", [x for x in xs if x])
-
-
-def norm_text(t: str) -> str:
-    if not t:
-        return ""
-    t = re.sub(r"\s+", " ", t).strip()
-    t = re.sub(r"\b[Pp]re[- ]?requisites?\b:?", "", t)
-    t = re.sub(r"\b[Pp]re[- ]?requisite\(s\)\b:?", "", t)
-    t = re.sub(r"\b[Cc]o[- ]?requisite\(s\)\b:?", "Co-requisite:", t)
-    t = t.replace("[", "(").replace("]", ")")
-    t = re.sub(r"\band\s*/\s*or\b", "or", t, flags=re.I)
-    t = re.sub(r"[+&]", " and ", t)
-    t = re.sub(r"([(),])", r" \1 ", t)
-
-    code_pat = r"[A-Z]{4}\d{4}[A-Z]?"
-    t = re.sub(rf"({code_pat})\s+or\s+({code_pat})\s*,\s*({code_pat})", r"(\1 or \2) and \3", t)
-    t = re.sub(rf"({code_pat})\s+or\s+({code_pat})\s+and\b", r"(\1 or \2) and", t)
-    return t.strip()
-
-
-def parse_units_from(text: str) -> dict[str, Any] | None:
-    m = re.search(r"(\d+)\s+units?\s+from\b(.*)", text, re.I)
-    if not m:
-        return None
-    n = int(m.group(1))
-    tail = m.group(2)
-    codes = sorted(set(COURSE_CODE_RE.findall(tail)))
-    return {"op": "UNITS_FROM", "min_units": n, "courses": codes} if codes else None
-
-
-def parse_level_credits(text: str) -> dict[str, Any] | None:
-    m = re.search(r"at least\s+(\d+)\s+units?.*level\s+(\d)\b", text, re.I)
-    if not m:
-        return None
-    return {"op": "CREDITS_AT_LEVEL", "min_units": int(m.group(1)), "level": int(m.group(2))}
-
-
-def parse_enrolment(text: str) -> dict[str, Any] | None:
-    m = re.search(r"\b(enrol(?:ment)?\s+in)\s+([A-Za-z0-9()\-\s]+)", text, re.I)
-    if not m:
-        return None
-    return {"op": "ENROLLED", "program": m.group(2).strip()}
-
-
-def parse_permission(text: str) -> dict[str, Any] | None:
-    if re.search(r"permission\s+of\s+(the\s+)?(course\s+coordinator|head\s+of\s+school)", text, re.I):
-        who = "Head of School" if "head of school" in text.lower() else "Course Coordinator"
-        return {"op": "PERMISSION", "who": who}
-    return None
-
-
-def _tokenize_bool_expr(t: str) -> list[tuple[str, str | None]]:
-    t = re.sub(r"\band\s*/\s*or\b", "or", t, flags=re.I)
-    t = re.sub(r"([()])", r" \1 ", t)
-    toks: list[tuple[str, str | None]] = []
-    for w in t.split():
-        wl = w.lower()
-        if COURSE_CODE_RE.fullmatch(w):
-            toks.append(("CODE", w))
-        elif wl == "and":
-            toks.append(("AND", None))
-        elif wl == "or":
-            toks.append(("OR", None))
-        elif w == "(":
-            toks.append(("LPAREN", None))
-        elif w == ")":
-            toks.append(("RPAREN", None))
-    return toks
-
-
-def _reduce_op(op: str, vals: list[dict[str, Any]]) -> bool:
-    if len(vals) < 2:
-        return False
-    b = vals.pop()
-    a = vals.pop()
-    vals.append(AND(a, b) if op == "AND" else OR(a, b))
-    return True
-
+def parse_page_job(code: str, url: str, text: str | None) -> tuple[Any, ...]:
+    """
+    Parse stage for one fetched page: HTML fields + prereq/incompat ASTs.
+    Module-level and pure so it can run in a ProcessPoolExecutor worker.
+    Returns (code, url, title, raw_pr, raw_inc, units, summary, parsed, inc_ast).
+    """
+    if text:
+        title, raw_pr, raw_inc, units, summary = parse_course_page(text)
+    else:
+        title = raw_pr = raw_inc = units = summary = ""
+    return (
+        code,
+        url,
+        title,
+        raw_pr,
+        raw_inc,
+        units,
+        summary,
+        parse_prereq_text(raw_pr),
+        parse_incompat_text(raw_inc),
+    )
 
-def parse_boolean_course_expr(t: str) -> dict[str, Any] | None:
-    toks = _tokenize_bool_expr(t)
-    if not toks or all(k != "CODE" for k, _ in toks) or all(k not in ("AND", "OR") for k, _ in toks):
-        return None
 
-    prec = {"OR": 1, "AND": 2}
-    ops: list[str] = []
-    vals: list[dict[str, Any]] = []
-    prev: str | None = None
-
-    for kind, val in toks:
-        if kind == "CODE":
-            vals.append(course_node(val or ""))  # val is non-None here
-            prev = "CODE"
-        elif kind in ("AND", "OR"):
-            if prev in (None, "AND", "OR", "LPAREN"):
-                return None
-            while ops and ops[-1] in prec and prec[ops[-1]] >= prec[kind]:
-                if not _reduce_op(ops.pop(), vals):
-                    return None
-            ops.append(kind)
-            prev = kind
-        elif kind == "LPAREN":
-            ops.append("LPAREN")
-            prev = "LPAREN"
-        elif kind == "RPAREN":
-            if prev in (None, "AND", "OR", "LPAREN"):
-                return None
-            while ops and ops[-1] != "LPAREN":
-                if not _reduce_op(ops.pop(), vals):
-                    return None
-            if not ops or ops[-1] != "LPAREN":
-                return None
-            ops.pop()
-            prev = "RPAREN"
+def reparse_batch(jobs: list[tuple[Any, ...]]) -> list[tuple[Any, ...]]:
+    """
+    Parse stage for --reparse-from (one process-pool task per batch).
+    Each job is (code, url, blob, year, row): the stored page at `blob` is
+    parsed like a fetched one; without it, `row` = (title, raw_pr, raw_inc,
+    units, summary) from the last run supplies the requisite text.
+    Returns parse_page_job tuples in job order.
+    """
+    parsed = []
+    for code, url, blob, year, row in jobs:
+        text = read_blob(Path(blob), year) if blob else None
+        if text is not None:
+            parsed.append(parse_page_job(code, url, text))
+            continue
+        title, raw_pr, raw_inc, units, summary = row
+        parsed.append((
+            code, url, title, raw_pr, raw_inc, units, summary,
+            parse_prereq_text(raw_pr), parse_incompat_text(raw_inc),
+        ))
+    return parsed
+
+
+def requisite_edges(code: str, parsed: dict[str, Any]) -> list[tuple[str, str]]:
+    """Sorted (course, prereq) edges from one course's prereq + coreq ASTs, skipping level-7."""
+    edges: set[tuple[str, str]] = set()
+    for node in (parsed["prereq"], parsed["coreq"]):
+        for p in collect_codes_from_ast(node):
+            if not is_level7(p):
+                edges.add((code, p))
+    return sorted(edges)
+
+
+def incompat_pairs(code: str, inc_ast: Any) -> list[tuple[str, str]]:
+    """Sorted (a, b) incompatibility pairs listed on one course page, in page order."""
+    if not (isinstance(inc_ast, Node) and inc_ast.op == "NONE_OF"):
+        return []
+    pairs = []
+    for x in inc_ast.args:
+        a = x.code if x.op == "COURSE" else None
+        if a and a != code and not is_level7(a):
+            pairs.append(tuple(sorted([code, a])))
+    return pairs
+
+
+class ParseMemo:
+    """
+    Parse results keyed by page fingerprint, for --per-year crawls: a course
+    page that is identical across years (up to the year itself) is parsed
+    once. A result is reused for another year only if no parsed field
+    mentions the year it was parsed for.
+    """
 
-    if prev in (None, "AND", "OR", "LPAREN"):
-        return None
+    def __init__(self) -> None:
+        self.items: dict[str, tuple[int | None, bool, tuple[Any, ...]]] = {}
+        self.shared = 0
 
-    while ops:
-        if ops[-1] == "LPAREN":
+    def get(self, key: str, year: int | None) -> tuple[Any, ...] | None:
+        hit = self.items.get(key)
+        if not hit:
             return None
-        if not _reduce_op(ops.pop(), vals):
+        src_year, year_free, fields = hit
+        if src_year != year and not year_free:
             return None
+        self.shared += 1
+        return fields
 
-    return vals[0] if len(vals) == 1 else None
-
-
-def _or_to_nof1(node: dict[str, Any]) -> dict[str, Any]:
-    if not isinstance(node, dict):
-        return node
-    op = node.get("op")
-    if op == "OR":
-        return {"op": "N_OF", "n": 1, "args": [_or_to_nof1(a) for a in node.get("args", [])]}
-    if op == "AND":
-        return {"op": "AND", "args": [_or_to_nof1(a) for a in node.get("args", [])]}
-    if op == "N_OF":
-        return {"op": "N_OF", "n": node.get("n"), "args": [_or_to_nof1(a) for a in node.get("args", [])]}
-    return node
-
-
-def parse_clause(text: str) -> dict[str, Any] | None:
-    t = text.strip()
-    if not t:
-        return None
-
-    node = parse_boolean_course_expr(t)
-    if node:
-        return _or_to_nof1(node)
-
-    for f in (parse_units_from, parse_level_credits, parse_enrolment, parse_permission):
-        node = f(t)
-        if node:
-            return node
-
-    if re.search(r"\b(one|any)\s+of\b|\beither\b", t, re.I):
-        codes = sorted(set(COURSE_CODE_RE.findall(t)))
-        return {"op": "N_OF", "n": 1, "args": [course_node(c) for c in codes]} if codes else None
-
-    if re.search(r"\bboth\s+of\b", t, re.I):
-        codes = sorted(set(COURSE_CODE_RE.findall(t)))
-        return {"op": "N_OF", "n": 2, "args": [course_node(c) for c in codes]} if codes else None
-
-    if re.search(r"\bor\b", t, re.I):
-        codes = sorted(set(COURSE_CODE_RE.findall(t)))
-        return _or_to_nof1(OR(*[course_node(c) for c in codes])) if codes else None
-
-    if re.search(r"\band\b", t, re.I):
-        codes = sorted(set(COURSE_CODE_RE.findall(t)))
-        return AND(*[course_node(c) for c in codes]) if codes else None
-
-    codes = sorted(set(COURSE_CODE_RE.findall(t)))
-    if codes:
-        return AND(*[course_node(c) for c in codes])
-
-    return {"op": "TEXT", "text": t}
+    def put(self, key: str, year: int | None, fields: tuple[Any, ...]) -> None:
+        year_free = not year or str(year) not in repr(fields)
+        self.items[key] = (year, year_free, fields)
 
 
-def combine_clauses(clauses: list[dict[str, Any] | None]) -> dict[str, Any] | None:
-    clean = [c for c in clauses if c]
-    if not clean:
-        return None
-    return clean[0] if len(clean) == 1 else AND(*clean)
-
-
-def parse_prereq_text(raw: str) -> dict[str, Any]:
-    if not raw:
-        return {"prereq": None, "coreq": None, "raw": ""}
-
-    text = norm_text(raw)
-    coreq_part = None
-
-    m = re.search(r"\bco-?requisite(?:\(s\))?:\s*(.*)$", text, re.I)
-    if m:
-        coreq_part = m.group(1)
-        text = text[: m.start()].strip()
-
-    parts = re.split(r"\.\s+|;\s+", text)
-    prereq_nodes = [parse_clause(p) for p in parts if p.strip()]
-
-    coreq_node = None
-    if coreq_part:
-        coreq_parts = re.split(r"\.\s+|;\s+", coreq_part)
-        coreq_nodes = [parse_clause(p) for p in coreq_parts if p.strip()]
-        coreq_node = combine_clauses(coreq_nodes)
-
-    return {"prereq": combine_clauses(prereq_nodes), "coreq": coreq_node, "raw": raw.strip()}
-
-
-def parse_incompat_text(raw: str) -> dict[str, Any] | None:
-    if not raw:
-        return None
-    codes = sorted(set(COURSE_CODE_RE.findall(raw)))
-    if not codes:
-        return None
-    return {"op": "NONE_OF", "args": [course_node(c) for c in codes], "raw": raw.strip()}
-
-
-def collect_codes_from_ast(node: dict[str, Any] | None) -> set[str]:
-    if not isinstance(node, dict):
-        return set()
-
-    op = node.get("op")
-    if op == "COURSE":
-        return {node["code"]}
-    if op in ("AND", "OR", "N_OF"):
-        out: set[str] = set()
-        for a in node.get("args", []):
-            out |= collect_codes_from_ast(a)
-        return out
-    if op == "UNITS_FROM":
-        return set(node.get("courses") or [])
-    return set()
+PARSE_MEMO: ParseMemo | None = None
 
 
 # =========================== Graph Helpers =========================
@@ -709,49 +1341,86 @@ def collect_codes_from_ast(node: dict[str, Any] | None) -> set[str]:
 def build_graph(edges_pairs: set[tuple[str, str]]) -> nx.DiGraph:
     """
     Build a DiGraph of prereq -> course from pairs (course, prereq).
-    Self-loops are skipped.
+    Self-loops are skipped. Pairs are added in sorted order so node/edge
+    iteration order does not depend on set hashing.
     """
     G = nx.DiGraph()
-    for (course, prereq) in edges_pairs:
+    for (course, prereq) in sorted(edges_pairs):
         if course and prereq and course != prereq:
             G.add_edge(prereq, course)
     return G
 
 
-def condensation_longest_levels(G: nx.DiGraph) -> tuple[dict[str, int], dict[str, int], dict[int, int], nx.DiGraph]:
-    """SCC condensation + longest-path 'level' per node."""
+def condensation_longest_levels(G: nx.DiGraph) -> tuple[dict[str, int], dict[str, int], dict[int, int], list[int]]:
+    """
+    SCC condensation + longest-path 'level' per node.
+    SCC ids are canonical (see graph_engine.GraphRanking): their position in
+    the topological order that prefers the SCC with the smallest member code.
+    Returns (level, node_to_scc, scc_sizes, topo_scc).
+    """
     sccs = list(nx.strongly_connected_components(G))
+    CG = nx.condensation(G, scc=sccs)
+    first = {i: min(comp) for i, comp in enumerate(sccs)}
+    topo = list(nx.lexicographical_topological_sort(CG, key=first.__getitem__))
+    canon = {s: i for i, s in enumerate(topo)}
 
     node_to_scc: dict[str, int] = {}
     for i, comp in enumerate(sccs):
         for n in comp:
-            node_to_scc[n] = i
+            node_to_scc[n] = canon[i]
 
-    scc_sizes = {i: len(comp) for i, comp in enumerate(sccs)}
-    CG = nx.condensation(G, scc=sccs)
-    topo = list(nx.topological_sort(CG))
+    scc_sizes = {canon[i]: len(comp) for i, comp in enumerate(sccs)}
 
     scc_level = {s: 0 for s in topo}
     for u in topo:
         for v in CG.successors(u):
             scc_level[v] = max(scc_level[v], scc_level[u] + 1)
 
-    level = {n: scc_level[node_to_scc[n]] for n in G.nodes()}
-    return level, node_to_scc, scc_sizes, CG
+    level = {n: scc_level[topo[node_to_scc[n]]] for n in G.nodes()}
+    return level, node_to_scc, scc_sizes, list(range(len(topo)))
+
+
+def rank_networkx(edges_pairs: set[tuple[str, str]]) -> GraphRanking:
+    """Reference (networkx) implementation of graph_engine.rank_graph."""
+    G = build_graph(edges_pairs)
+    if len(G) == 0:
+        return GraphRanking([], [], {}, {}, {}, {}, {}, {}, [])
+
+    level, node_to_scc, scc_sizes, topo_scc = condensation_longest_levels(G)
+    try:
+        pr = nx.pagerank(G, alpha=0.85, max_iter=100)
+    except Exception:
+        pr = {n: 0.0 for n in G.nodes()}
+
+    return GraphRanking(
+        nodes=list(G.nodes()),
+        edges=list(G.edges()),
+        level=level,
+        in_degree=dict(G.in_degree()),
+        out_degree=dict(G.out_degree()),
+        pagerank=pr,
+        node_to_scc=node_to_scc,
+        scc_sizes=scc_sizes,
+        topo_scc=topo_scc,
+    )
+
+
+GRAPH_ENGINES = {"array": rank_graph, "networkx": rank_networkx}
 
 
 def export_topological_order(
-    CG: nx.DiGraph,
+    topo_scc: list[int],
     node_to_scc: dict[str, int],
     level: dict[str, int],
     out_csv: Path,
-) -> None:
+    out_parquet: Path | None = None,
+) -> bool:
     """
-    Flatten SCC-topological order into a per-node CSV:
+    Flatten SCC-topological order into a per-node CSV (+ optional Parquet):
       order, course, scc_id, level, scc_size
+    The CSV is only rewritten if its content changed; returns whether it was.
     """
     order_rows: list[dict[str, Any]] = []
-    topo_scc = list(nx.topological_sort(CG))
     rank = 0
 
     scc_to_nodes: dict[int, list[str]] = {}
@@ -772,7 +1441,69 @@ def export_topological_order(
             )
             rank += 1
 
-    pd.DataFrame(order_rows).to_csv(out_csv, index=False, encoding="utf-8")
+    df = pd.DataFrame(order_rows, columns=["order", "course", "scc_id", "level", "scc_size"])
+    written = write_if_changed(out_csv, df.to_csv(index=False))
+    if out_parquet and (written or not out_parquet.exists()):
+        write_parquet_df(df, out_parquet, "topo")
+    return written
+
+
+# ========================== Crawl Frontier =========================
+
+class Frontier:
+    """
+    Continuously fed crawl frontier:
+      - dedup on enqueue: a code is queued at most once per crawl
+      - codes stay "in flight" from take() until done(), so workers only see
+        the frontier as drained when nothing queued could still add codes
+    Codes are held as CodeTable ids: a bitmap of known ids, an int array of
+    queued ones.
+    """
+
+    def __init__(self, seeds: list[str], done: set[str] | None = None, codes: CodeTable | None = None):
+        self.codes = codes or CodeTable()
+        self.known = IdBits()
+        self.queue = array("i")
+        self.in_flight: set[int] = set()
+        self.changed = asyncio.Event()
+        for code in done or ():
+            self.known.add(self.codes.id(code))
+        for code in seeds:
+            self.push(code)
+
+    def push(self, code: str) -> bool:
+        """Queue `code` unless it was ever queued before."""
+        i = self.codes.id(code)
+        if not self.known.add(i):
+            return False
+        self.queue.append(i)
+        self.changed.set()
+        return True
+
+    @property
+    def drained(self) -> bool:
+        return not self.queue and not self.in_flight
+
+    async def take(self) -> str | None:
+        """Next code to fetch, waiting while others are in flight; None once drained."""
+        while True:
+            if self.queue:
+                i = self.queue.pop()
+                self.in_flight.add(i)
+                return self.codes.code(i)
+            if not self.in_flight:
+                return None
+            self.changed.clear()
+            await self.changed.wait()
+
+    def done(self, code: str) -> None:
+        self.in_flight.discard(self.codes.get(code))
+        if self.drained:
+            self.changed.set()
+
+    def pending(self) -> list[str]:
+        """In-flight + queued codes (what a checkpoint must re-crawl)."""
+        return [self.codes.code(i) for i in (*self.in_flight, *self.queue)]
 
 
 # ============================== Pipeline ===========================
@@ -786,111 +1517,414 @@ async def run(
     want_rank: bool,  # kept for API symmetry
     rps: float,
     burst: int,
+    cache_mode: str = "revalidate",
+    cache_dir: Path = CACHE_DIR,
+    resume: bool = False,
+    checkpoint_every: float = 60.0,
+    parse_workers: int | None = None,
+    adaptive: bool = False,
+    min_rps: float | None = None,
+    max_rps: float | None = None,
+    per_year: bool = False,
+    want_parquet: bool = False,
+    graph_engine: str = "array",
+    incremental: bool = False,
+    reparse_from: str | None = None,
+    base_url: str | None = None,
+    metrics_port: int | None = None,
+    metrics_host: str = "127.0.0.1",
+    profile: bool = False,
+    profile_top: int = 15,
 ) -> None:
     # Normalize CLI inputs
     years_int = [int(y) for y in years]
     prefixes_norm = [p.strip().upper() for p in prefixes] if prefixes else None
-
-    # Global rate limiter
-    global REQUEST_LIMITER
-    REQUEST_LIMITER = AsyncTokenBucket(rate=rps, capacity=burst)
+    if parse_workers is None:
+        parse_workers = max(1, min(8, (os.cpu_count() or 2) - 1))
+    if want_parquet:
+        _pyarrow()  # fail fast, before any crawling
+
+    # Global rate limiter + page cache (+ cross-year parse memo)
+    global REQUEST_LIMITER, PAGE_CACHE, PARSE_MEMO, BASE, METRICS, PROFILER
+    if base_url:
+        BASE = base_url.rstrip("/") + "/"
+    REQUEST_LIMITER = AsyncTokenBucket(
+        rate=rps,
+        capacity=burst,
+        adaptive=adaptive,
+        min_rate=min_rps,
+        max_rate=max_rps,
+    )
+    # Size connection pools for the fastest rate the limiter may reach
+    pool_rps = REQUEST_LIMITER.max_rate if adaptive else rps
+    PAGE_CACHE = PageCache(cache_dir, cache_mode) if cache_mode != "off" else None
+    per_year = per_year and len(years_int) > 1
+    PARSE_MEMO = ParseMemo() if per_year else None
+    METRICS = Metrics("uq_crawl", METRIC_HELP)
+    metrics_server = serve_metrics(METRICS, metrics_host, metrics_port) if metrics_port else None
+    if metrics_server:
+        log(f"[metrics] Prometheus text at http://{metrics_host}:{metrics_server.server_address[1]}/metrics")
 
     log(
         f"[cfg] years={years_int} prefixes={prefixes_norm} workers={workers} "
-        f"rps={rps} burst={burst}"
+        f"{REQUEST_LIMITER.status()} burst={burst} cache={cache_mode} parse_workers={parse_workers} "
+        f"per_year={per_year}"
     )
 
-    # -------- 1) Harvest seeds --------
-    log("[harvest] sweeping search buckets…")
-    seeds = await harvest_codes(
-        years_int,
-        prefixes_norm,
-        workers=max(4, min(workers, 64)),
-        rps=rps,
+    PROFILER = StageProfiler(OUT / PROFILE_DIR.name, top=profile_top) if profile else None
+
+    # Parse stage: CPU-bound HTML/AST work off the event loop (0 → inline)
+    parse_pool = None
+    if parse_workers > 0:
+        parse_pool = ProcessPoolExecutor(
+            max_workers=parse_workers,
+            initializer=init_worker if PROFILER else None,
+            initargs=(str(PROFILER.root),) if PROFILER else (),
+        )
+
+    common = dict(
+        prefixes_norm=prefixes_norm,
+        workers=workers,
+        level_range=level_range,
+        want_ast=want_ast,
+        burst=burst,
+        pool_rps=pool_rps,
+        resume=resume,
+        checkpoint_every=checkpoint_every,
+        parse_pool=parse_pool,
+        parse_workers=parse_workers,
+        want_parquet=want_parquet,
+        graph_engine=graph_engine,
+        incremental=incremental,
     )
+    try:
+        if reparse_from:
+            # Offline rebuild from stored pages / rows: no harvest, no client
+            if resume or incremental:
+                log("[reparse] --resume/--incremental do not apply to a reparse; ignored")
+            cache = PageCache(cache_dir, "only") if reparse_from == "cache" else None
+            if per_year:
+                targets = [(OutPaths(OUT / str(y)), y) for y in years_int]
+            else:
+                targets = [(OutPaths(OUT), max(years_int) if years_int else None)]
+            for out, y in targets:
+                log(f"[reparse] ===== {out.root} from {reparse_from} (year {y}) =====")
+                with profile_stage("reparse"):
+                    await reparse_and_rank(
+                        out,
+                        y,
+                        reparse_from,
+                        cache,
+                        want_ast,
+                        parse_pool,
+                        want_parquet=want_parquet,
+                        graph_engine=graph_engine,
+                    )
+        elif per_year:
+            # Each (course, year) page is fetched, but identical pages share one
+            # cache blob and one parse (see page_fingerprint / PARSE_MEMO).
+            # A finished year drops its checkpoint, so --resume skips it by this record.
+            years_done = OUT / YEARS_DONE_JS.name
+            scope = {"prefixes": prefixes_norm, "level_range": list(level_range) if level_range else None}
+            finished = load_checkpoint(years_done) if resume else None
+            if finished and any(finished.get(k) != v for k, v in scope.items()):
+                # A year finished under another seed filter isn't this crawl's
+                log(
+                    f"[resume] finished years {finished['done']} were crawled with "
+                    f"prefixes={finished.get('prefixes')} level_range={finished.get('level_range')}; "
+                    "crawling them again"
+                )
+                finished = None
+            done_years = set(finished["done"]) if finished else set()
+            for y in years_int:
+                if y in done_years:
+                    log(f"[resume] {y} already finished; skipping")
+                    continue
+                log(f"[year] ===== {y} → {OUT / str(y)} =====")
+                with profile_stage("crawl"):
+                    await crawl_and_rank(OutPaths(OUT / str(y)), [y], y, **common)
+                done_years.add(y)
+                save_checkpoint(years_done, {"version": CHECKPOINT_VERSION, **scope, "done": sorted(done_years)})
+            years_done.unlink(missing_ok=True)
+        else:
+            year_hint = max(years_int) if years_int else None
+            with profile_stage("crawl"):
+                await crawl_and_rank(OutPaths(OUT), years_int, year_hint, **common)
+    finally:
+        if parse_pool:
+            parse_pool.shutdown(cancel_futures=True)
+        if metrics_server:
+            metrics_server.shutdown()
+        if PROFILER:
+            # After the pool shutdown, so every worker's profile is on disk
+            PROFILER.report(log)
+
+
+async def crawl_and_rank(
+    out: OutPaths,
+    years_int: list[int],
+    year_hint: int | None,
+    prefixes_norm: list[str] | None,
+    workers: int,
+    level_range: tuple[int, int] | None,
+    want_ast: bool,
+    burst: int,
+    pool_rps: float,
+    resume: bool,
+    checkpoint_every: float,
+    parse_pool: ProcessPoolExecutor | None,
+    parse_workers: int,
+    want_parquet: bool = False,
+    graph_engine: str = "array",
+    incremental: bool = False,
+) -> None:
+    """
+    Harvest (or resume) → crawl → rank → export for one output directory.
+    years_int drives the search sweep; year_hint is the year of course pages.
+    With incremental, only the harvested seeds (and courses new to the
+    catalog) are crawled; every other course is carried over from the last
+    run, and the merged graph is re-ranked.
+    """
+    # Last run's outputs, read before the writers replace them
+    prev = load_previous_run(out) if incremental else None
+    if incremental and not prev:
+        log(f"[incr] no previous outputs in {out.raw_csv.parent}; doing a full crawl")
+    elif prev:
+        log(
+            f"[incr] previous run: {len(prev.results)} courses, {len(prev.edges)} edges, "
+            f"{len(prev.conflicts)} conflicts"
+        )
+
+    # -------- 0) Resume from checkpoint? --------
+    ckpt = load_checkpoint(out.checkpoint) if resume else None
+    if resume and not ckpt:
+        log(f"[resume] no usable checkpoint at {out.checkpoint}; starting fresh")
+    if ckpt and (ckpt.get("years") != years_int or ckpt.get("prefixes") != prefixes_norm):
+        log(
+            f"[resume] checkpoint was taken with years={ckpt.get('years')} "
+            f"prefixes={ckpt.get('prefixes')}; continuing its frontier anyway"
+        )
+
+    if ckpt:
+        seeds = list(ckpt["frontier"])
+        log(
+            f"[resume] {len(ckpt['done'])} done, {len(seeds)} in frontier "
+            f"(checkpoint from {time.ctime(ckpt.get('saved_at', 0))})"
+        )
+    else:
+        # -------- 1) Harvest seeds --------
+        log("[harvest] sweeping search buckets…")
+        t0 = time.perf_counter()
+        with profile_stage("harvest"):
+            seeds = await harvest_codes(
+                years_int,
+                prefixes_norm,
+                workers=max(4, min(workers, 64)),
+                rps=pool_rps,
+            )
+        METRICS.inc("stage_seconds_total", time.perf_counter() - t0, stage="harvest")
 
-    # Filter seeds
-    seeds = [c for c in seeds if not is_level7(c)]
-    if level_range:
-        lo, hi = level_range
-        seeds = [c for c in seeds if c[4:8].isdigit() and lo <= int(c[4:8]) <= hi]
+        # Filter seeds
+        seeds = [c for c in seeds if not is_level7(c)]
+        if level_range:
+            lo, hi = level_range
+            seeds = [c for c in seeds if c[4:8].isdigit() and lo <= int(c[4:8]) <= hi]
 
-    log(f"[harvest] initial codes: {len(seeds)}")
-    ALL_TXT.write_text("\n".join(seeds), encoding="utf-8")
+        log(f"[harvest] initial codes: {len(seeds)}")
+        all_seeds = sorted(set(seeds) | set(prev.seeds)) if prev else seeds
+        out.all_txt.write_text("\n".join(all_seeds), encoding="utf-8")
 
     # -------- 2) Crawl pages & recurse via prereq refs --------
-    seen: set[str] = set()
-    queue: deque[str] = deque(seeds)
-    results: dict[str, tuple[str, str, str, str, str]] = {}  # code -> (url, title, raw_pr, raw_inc, units)
-
-    raw_writer = StreamingCSV(RAW_CSV, ["course_code", "url", "title", "prereq_raw", "incompat_raw"])
-    edges_writer = StreamingCSV(EDGES_CSV, ["course", "prereq"])
-    confl_writer = StreamingCSV(CONFL_CSV, ["course", "conflict_with"])
-    struct_writer = StreamingJSONMap(STRUCT_JS) if want_ast else None
+    # Finished courses' (url, title, raw_pr, raw_inc, units) rows, prereq edges
+    # and conflict pairs, with codes interned to ids (see crawl_state.py)
+    state = CrawlState(spill_dir=out.root)
+
+    offsets: dict[str, int | None] = {"raw": None, "edges": None, "conflicts": None, "struct": None}
+    if ckpt:
+        offsets.update(ckpt["offsets"])
+        state.load_pairs(ckpt["pairs"])
+
+    raw_writer = StreamingCSV(
+        out.raw_csv,
+        ["course_code", "url", "title", "prereq_raw", "incompat_raw"],
+        resume_at=offsets["raw"],
+        parquet="raw" if want_parquet else None,
+    )
+    edges_writer = StreamingCSV(
+        out.edges_csv,
+        ["course", "prereq"],
+        resume_at=offsets["edges"],
+        parquet="edges" if want_parquet else None,
+    )
+    confl_writer = StreamingCSV(
+        out.confl_csv,
+        ["course", "conflict_with"],
+        resume_at=offsets["conflicts"],
+        parquet="conflicts" if want_parquet else None,
+    )
+    struct_writer = StreamingJSONMap(out.struct_js, resume_at=offsets["struct"]) if want_ast else None
 
-    prereq_edges: set[tuple[str, str]] = set()
-    conflict_pairs: set[tuple[str, str]] = set()
+    if ckpt:
+        # Raw CSV was cut back to the checkpoint, so it holds exactly the done set
+        for code, row in load_raw_results(raw_writer.out.part).items():
+            state.put_row(code, row)
 
-    year_hint = max(years_int) if years_int else None
+    done = set(ckpt["done"]) if ckpt else set()
+    if prev:
+        # Courses outside this crawl's seeds are reused, not re-fetched
+        done |= set(prev.results) - set(seeds)
+    frontier = Frontier(seeds, done=done, codes=state.codes)
+    del done
 
     # Crawl concurrency (decoupled from RPS limiter)
     crawl_concurrency = max(6, min(32, workers // 4))
 
+    parse_slots = max(1, parse_workers * 2)  # keep every worker fed while results return
+    stage_queue = max(16, crawl_concurrency * 2)  # bound on pages held between stages
+
+    def checkpoint() -> None:
+        """
+        Snapshot crawl state. Only called between fully-processed courses so
+        the writer offsets and the done/edge/conflict sets agree.
+        """
+        snapshot = {
+            "version": CHECKPOINT_VERSION,
+            "years": years_int,
+            "prefixes": prefixes_norm,
+            "saved_at": time.time(),
+            "done": state.done_codes(),
+            # in-flight codes go back on the frontier
+            "frontier": frontier.pending(),
+            # codes + id arrays, not code pairs (see CrawlState.pairs_state)
+            "pairs": state.pairs_state(),
+            "offsets": {
+                "raw": raw_writer.sync(),
+                "edges": edges_writer.sync(),
+                "conflicts": confl_writer.sync(),
+                "struct": struct_writer.sync() if struct_writer else None,
+            },
+        }
+        save_checkpoint(out.checkpoint, snapshot)
+
     # Heartbeat
     start_ts = time.time()
+    last_ckpt = start_ts
     hb_stop = False
 
+    def record_progress() -> None:
+        """Frontier/graph gauges, then one metrics.jsonl line."""
+        METRICS.set("courses", len(frontier.known), state="seen")
+        METRICS.set("courses", len(state.rows), state="done")
+        METRICS.set("courses", len(frontier.queue), state="queued")
+        METRICS.set("courses", len(frontier.in_flight), state="inflight")
+        METRICS.set("edges", len(state.edges))
+        METRICS.set("conflicts", len(state.conflicts))
+        METRICS.set("rate_limit_rps", REQUEST_LIMITER.rate)
+        with contextlib.suppress(Exception):
+            METRICS.write_jsonl(out.metrics_jsonl, out=str(out.root))
+
     async def heartbeat() -> None:
-        """Periodic status to stdout + heartbeat.log."""
+        """Periodic status to stdout + heartbeat.log (+ metrics.jsonl)."""
         while not hb_stop:
             await asyncio.sleep(5.0)
+            record_progress()
             elapsed = time.time() - start_ts
             msg = (
-                f"[hb] t+{elapsed:6.1f}s seen={len(seen):5d} "
-                f"done={len(results):5d} queued={len(queue):5d} "
-                f"edges={len(prereq_edges):6d} conflicts={len(conflict_pairs):6d} "
-                f"(cc={crawl_concurrency}, rps={rps}, burst={burst})"
+                f"[hb] t+{elapsed:6.1f}s seen={len(frontier.known):5d} "
+                f"done={len(state.rows):5d} queued={len(frontier.queue):5d} "
+                f"inflight={len(frontier.in_flight):4d} "
+                f"edges={len(state.edges):6d} conflicts={len(state.conflicts):6d} "
+                f"(cc={crawl_concurrency}, {REQUEST_LIMITER.status()}, burst={burst})"
             )
+            if PAGE_CACHE:
+                msg += f" {PAGE_CACHE.status()}"
             log(msg)
             with contextlib.suppress(Exception):
-                with open(HEARTBEAT_LOG, "a", encoding="utf-8") as hb:
+                with open(out.heartbeat_log, "a", encoding="utf-8") as hb:
                     hb.write(msg + "\n")
 
-    async with client_factory(workers, rps) as client:
-        sem = asyncio.Semaphore(crawl_concurrency)
-        hb_task = asyncio.create_task(heartbeat())
-
-        try:
-            while queue:
-                # Build a batch; limiter + sem will pace it
-                batch: list[str] = []
-                cap = max(200, min(800, workers * 3))
-                while queue and len(batch) < cap:
-                    c = queue.pop()
-                    if c in seen:
-                        continue
-                    seen.add(c)
-                    batch.append(c)
-
-                if not batch:
-                    break
-
-                async def one(code: str):
-                    async with sem:
-                        return await fetch_course(client, code, year_hint)
-
-                tasks = [one(c) for c in batch]
-
-                # Consume as they complete to keep memory small
-                async for coro in _as_completed_iter(tasks):
-                    code, url, title, raw_pr, raw_inc, units, summary = await coro
-
-                    results[code] = (url, title, raw_pr, raw_inc, units)
+    try:
+        async with client_factory(workers, pool_rps) as client:
+            hb_task = asyncio.create_task(heartbeat())
+
+            # Fetch workers (asyncio) → page_q → parse stage (process pool) → done_q.
+            # Bounded stage queues give backpressure: fetchers stop pulling codes
+            # while parsed pages wait to be written.
+            page_q: asyncio.Queue = asyncio.Queue(maxsize=stage_queue)
+            done_q: asyncio.Queue = asyncio.Queue(maxsize=stage_queue)
+
+            async def fetch_worker() -> None:
+                while (code := await frontier.take()) is not None:
+                    page = await fetch_course_html(client, code, year_hint)
+                    with METRICS.timer("queue_wait_seconds", queue="page"):
+                        await page_q.put(page)
+
+            async def parse_stage() -> None:
+                loop = asyncio.get_running_loop()
+                while (page := await page_q.get()) is not None:
+                    code, url, text = page
+                    key = page_fingerprint(text, year_hint)[0] if PARSE_MEMO and text else None
+                    fields = PARSE_MEMO.get(key, year_hint) if key else None
+                    t0 = time.perf_counter()
+                    try:
+                        if fields is not None:
+                            res, where = (code, url, *fields), "memo"
+                        elif parse_pool:
+                            res = await loop.run_in_executor(parse_pool, pool_job("parse", parse_page_job), *page)
+                            where = "pool"
+                        else:
+                            with profile_stage("parse", memory=False):
+                                res = parse_page_job(*page)
+                            where = "inline"
+                    except BrokenProcessPool:
+                        raise  # every later page would fail too; drain_stages surfaces it
+                    except Exception as e:
+                        # Record the course like an unfetchable page so the frontier still drains
+                        log(f"[parse] {code}: {type(e).__name__}: {e}")
+                        METRICS.inc("parse_errors_total")
+                        res, where, key = parse_page_job(code, url, None), "error", None
+                    METRICS.observe("parse_seconds", time.perf_counter() - t0, where=where)
+                    if key and fields is None:
+                        PARSE_MEMO.put(key, year_hint, res[2:])
+                    with METRICS.timer("queue_wait_seconds", queue="done"):
+                        await done_q.put(res)
+
+            fetchers = [asyncio.create_task(fetch_worker()) for _ in range(crawl_concurrency)]
+            parsers = [asyncio.create_task(parse_stage()) for _ in range(parse_slots)]
+
+            async def stop_parsers() -> None:
+                await asyncio.gather(*fetchers)
+                for _ in parsers:
+                    await page_q.put(None)
+
+            async def drain_stages() -> None:
+                # Watch every stage task: one that dies would otherwise leave the
+                # rest blocked on page_q (fetchers on a full one, parsers on an empty one)
+                closer = asyncio.create_task(stop_parsers())
+                finished, _ = await asyncio.wait(
+                    {closer, *fetchers, *parsers}, return_when=asyncio.FIRST_EXCEPTION
+                )
+                for t in finished:
+                    if t.exception():
+                        closer.cancel()
+                        raise t.exception()
+
+            stages = asyncio.create_task(drain_stages())
+
+            try:
+                while not frontier.drained:
+                    get = asyncio.create_task(done_q.get())
+                    await asyncio.wait({get, stages}, return_when=asyncio.FIRST_COMPLETED)
+                    if stages.done() and stages.exception():
+                        # A stage died before delivering everything; surface its error
+                        get.cancel()
+                        raise stages.exception()
+                    (code, url, title, raw_pr, raw_inc, units, summary,
+                     parsed, inc_ast) = await get
+
+                    t_write = time.perf_counter()
                     await raw_writer.write_row([code, url, title, raw_pr, raw_inc])
 
-                    parsed = parse_prereq_text(raw_pr)
-                    inc_ast = parse_incompat_text(raw_inc)
-
                     if want_ast and struct_writer:
                         obj = {
                             **parsed,
@@ -903,69 +1937,134 @@ async def run(
                     # Recurse into referenced courses (from prereq/coreq), skipping level-7
                     for node in (parsed["prereq"], parsed["coreq"]):
                         for nxt in collect_codes_from_ast(node):
-                            if nxt not in seen and not is_level7(nxt):
-                                queue.append(nxt)
+                            if not is_level7(nxt):
+                                frontier.push(nxt)
 
                     # Stream edges
-                    course_edges: set[tuple[str, str]] = set()
-                    for node in (parsed["prereq"], parsed["coreq"]):
-                        for p in collect_codes_from_ast(node):
-                            if not is_level7(p):
-                                course_edges.add((code, p))
-                    for c, p in sorted(course_edges):
-                        if (c, p) not in prereq_edges:
-                            prereq_edges.add((c, p))
+                    for c, p in requisite_edges(code, parsed):
+                        if state.add_edge(c, p):
                             await edges_writer.write_row([c, p])
 
                     # Stream incompatibility pairs (as undirected → two directed rows)
-                    if isinstance(inc_ast, dict) and inc_ast.get("op") == "NONE_OF":
-                        codes = [
-                            x.get("code")
-                            for x in inc_ast.get("args", [])
-                            if isinstance(x, dict) and x.get("op") == "COURSE"
-                        ]
-                        for a in codes:
-                            if a and a != code and not is_level7(a):
-                                pair = tuple(sorted([code, a]))
-                                if pair not in conflict_pairs:
-                                    conflict_pairs.add(pair)
-                                    await confl_writer.write_row([pair[0], pair[1]])
-                                    await confl_writer.write_row([pair[1], pair[0]])
-
-                await asyncio.sleep(jitter(0.05, 0.15))
-                log(f"[crawl] seen={len(seen)} queue={len(queue)} (cc={crawl_concurrency})")
-
-        finally:
-            # stop heartbeat promptly
-            hb_stop = True
-            hb_task.cancel()
-            with contextlib.suppress(asyncio.CancelledError):
-                await hb_task
-
-    # Close streaming writers
-    await raw_writer.close()
-    await edges_writer.close()
-    await confl_writer.close()
-    if want_ast and struct_writer:
-        await struct_writer.close()
+                    for pair in incompat_pairs(code, inc_ast):
+                        if state.add_conflict(*pair):
+                            await confl_writer.write_row([pair[0], pair[1]])
+                            await confl_writer.write_row([pair[1], pair[0]])
+                    METRICS.observe("write_seconds", time.perf_counter() - t_write)
+
+                    # Course is complete only once all of its rows are written
+                    state.put_row(code, (url, title, raw_pr, raw_inc, units))
+                    frontier.done(code)
+
+                    if time.time() - last_ckpt >= checkpoint_every:
+                        checkpoint()
+                        last_ckpt = time.time()
+
+                await stages
+                log(
+                    f"[crawl] done={len(state.rows)} seen={len(frontier.known)} "
+                    f"(cc={crawl_concurrency}, {REQUEST_LIMITER.status()})"
+                )
+                if PARSE_MEMO:
+                    log(f"[crawl] parses shared across years so far: {PARSE_MEMO.shared}")
+
+                if prev:
+                    # Carry over everything this crawl didn't revisit. A re-crawled
+                    # course replaces its own edges; a conflict pair is dropped only
+                    # if both sides were re-crawled (either page may have listed it).
+                    crawled = set(state.done_codes())
+                    kept = 0
+                    for code in sorted(set(prev.results) - crawled):
+                        url, title, raw_pr, raw_inc, _ = prev.results[code]
+                        await raw_writer.write_row([code, url, title, raw_pr, raw_inc])
+                        if want_ast and struct_writer and code in prev.struct:
+                            await struct_writer.write_item(code, prev.struct[code])
+                        state.put_row(code, prev.results[code])
+                        kept += 1
+                    for c, p in sorted(prev.edges):
+                        if c not in crawled and state.add_edge(c, p):
+                            await edges_writer.write_row([c, p])
+                    for pair in sorted(prev.conflicts):
+                        if not (pair[0] in crawled and pair[1] in crawled) and state.add_conflict(*pair):
+                            await confl_writer.write_row([pair[0], pair[1]])
+                            await confl_writer.write_row([pair[1], pair[0]])
+                    log(f"[incr] re-crawled {len(crawled)} courses, carried over {kept}")
+
+                # Crawl finished: record it so a crash in the rank stage resumes there
+                checkpoint()
+
+            finally:
+                for t in (stages, *fetchers, *parsers):
+                    t.cancel()
+                # stop heartbeat promptly
+                hb_stop = True
+                hb_task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await hb_task
+    finally:
+        # Close streaming writers (also on Ctrl-C/errors, so the JSON map stays valid)
+        await raw_writer.close()
+        await edges_writer.close()
+        await confl_writer.close()
+        if want_ast and struct_writer:
+            await struct_writer.close()
+
+    if PAGE_CACHE:
+        log(f"[crawl] {PAGE_CACHE.status()}")
+    info = parse_cache_info()
+    if info.hits or info.misses:
+        log(f"[crawl] requisite parse cache (this process): {info.hits} hits, {info.misses} distinct")
+    METRICS.inc("stage_seconds_total", time.time() - start_ts, stage="crawl")
+
+    t0 = time.perf_counter()
+    with profile_stage("export"):
+        rank_and_export(out, state, graph_engine, want_parquet, prev)
+    state.close()
+    METRICS.inc("stage_seconds_total", time.perf_counter() - t0, stage="rank")
+    record_progress()
+
+
+def rank_and_export(
+    out: OutPaths,
+    state: CrawlState,
+    graph_engine: str = "array",
+    want_parquet: bool = False,
+    prev: PreviousRun | None = None,
+) -> None:
+    """
+    Rank the prereq graph and write every final output of `out` (ranks,
+    topo order, GEXF, CSR snapshot). With prev, the merged edge set is
+    ranked in full and rank_changes.csv records the difference.
+    """
+    # Pairs are generated from the interned ids where needed, never held as
+    # a set; course text comes off the spill
 
     # -------- 5) Graph, ranks, topo --------
-    G = build_graph(prereq_edges)
-    if len(G) == 0:
+    t_rank = time.perf_counter()
+    with profile_stage("rank"):
+        if graph_engine == "array":
+            ranking = rank_graph(ArrayGraph.from_packed(state.codes.as_list(), state.edges.packed()))
+        else:
+            ranking = GRAPH_ENGINES[graph_engine](set(state.edge_pairs()))
+    if len(ranking) == 0:
         log("[rank] graph empty; nothing to rank/sort")
+        out.checkpoint.unlink(missing_ok=True)
+        shutil.rmtree(out.incr_base, ignore_errors=True)
         return
+    log(
+        f"[rank] {graph_engine} engine: {len(ranking)} nodes, {len(ranking.edges)} edges, "
+        f"{len(ranking.scc_sizes)} SCCs in {time.perf_counter() - t_rank:.3f}s"
+    )
 
-    level, node_to_scc, scc_sizes, CG = condensation_longest_levels(G)
-    indeg = dict(G.in_degree())
-    outdeg = dict(G.out_degree())
-
-    try:
-        pr = nx.pagerank(G, alpha=0.85, max_iter=100)
-    except Exception:
-        pr = {n: 0.0 for n in G.nodes()}
+    level = ranking.level
+    node_to_scc = ranking.node_to_scc
+    scc_sizes = ranking.scc_sizes
+    indeg = ranking.in_degree
+    outdeg = ranking.out_degree
+    pr = ranking.pagerank
 
     rows = []
-    for n in G.nodes():
+    for n in ranking.nodes:
         rows.append(
             {
                 "course": n,
@@ -978,22 +2077,43 @@ async def run(
             }
         )
 
-    pd.DataFrame(rows).sort_values(
+    ranks_df = pd.DataFrame(rows).sort_values(
         by=["level", "pagerank", "course"],
         ascending=[True, False, True],
-    ).to_csv(RANKS_CSV, index=False, encoding="utf-8")
-    log(f"[rank] wrote {RANKS_CSV}")
-
-    export_topological_order(CG, node_to_scc, level, TOPO_CSV)
-    log(f"[topo] wrote {TOPO_CSV}")
+    )
+    ranks_pq = out.ranks_csv.with_suffix(".parquet")
+    ranks_written = write_if_changed(out.ranks_csv, ranks_df.to_csv(index=False))
+    if want_parquet and (ranks_written or not ranks_pq.exists()):
+        write_parquet_df(ranks_df, ranks_pq, "ranks")
+    log(f"[rank] {'wrote' if ranks_written else 'unchanged:'} {out.ranks_csv}")
+
+    changes: list[list[str]] = []
+    if prev:
+        changes = rank_changes(prev.rank_rows, rows)
+        with open(out.changes_csv, "w", encoding="utf-8", newline="") as f:
+            w = csv.writer(f)
+            w.writerow(["course", "change", "field", "old", "new"])
+            w.writerows(changes)
+        log(f"[incr] {len({c[0] for c in changes})} ranked courses changed → {out.changes_csv}")
+
+    if export_topological_order(
+        ranking.topo_scc,
+        node_to_scc,
+        level,
+        out.topo_csv,
+        out.topo_csv.with_suffix(".parquet") if want_parquet else None,
+    ):
+        log(f"[topo] wrote {out.topo_csv}")
+    else:
+        log(f"[topo] unchanged: {out.topo_csv}")
 
     # -------- 6) Graph exports --------
-    all_nodes = {n for n in G.nodes() if not is_level7(n)}
-    all_nodes |= {x for pair in conflict_pairs for x in pair if not is_level7(x)}
+    all_nodes = {n for n in ranking.nodes if not is_level7(n)}
+    all_nodes |= {x for pair in state.conflict_pairs() for x in pair if not is_level7(x)}
 
     # Incompat lists as node attributes
     inc_list: dict[str, list[str]] = {n: [] for n in all_nodes}
-    for a, b in conflict_pairs:
+    for a, b in state.conflict_pairs():
         if is_level7(a) or is_level7(b):
             continue
         inc_list.setdefault(a, []).append(b)
@@ -1002,15 +2122,15 @@ async def run(
     # Prereqs-only (directed)
     H = nx.DiGraph()
     for n in sorted(all_nodes):
-        url, title, *_ = results.get(n, ("", "", "", "", ""))
+        url, title, *_ = state.row(n) or ("", "", "", "", "")
         H.add_node(
             n,
             label=n,
             title=title,
             url=url,
             level=level.get(n, 0),
-            indegree=G.in_degree(n) if n in G else 0,
-            outdegree=G.out_degree(n) if n in G else 0,
+            indegree=indeg.get(n, 0),
+            outdegree=outdeg.get(n, 0),
             pagerank=pr.get(n, 0.0),
             scc_id=node_to_scc.get(n, -1),
             scc_size=scc_sizes.get(node_to_scc.get(n, -1), 1),
@@ -1018,19 +2138,21 @@ async def run(
             incompat_with=",".join(sorted(inc_list.get(n, [])))[:1000],
         )
 
-    for p, c in G.edges():
+    for p, c in ranking.edges:
         if not is_level7(p) and not is_level7(c):
             H.add_edge(p, c, relation="prereq")
 
-    nx.write_gexf(H, GEXF_FULL)
-    log(f"[graph] wrote {GEXF_FULL} (prereqs only; nodes carry incompat_* attributes)")
+    if write_gexf_if_changed(H, out.gexf_full):
+        log(f"[graph] wrote {out.gexf_full} (prereqs only; nodes carry incompat_* attributes)")
+    else:
+        log(f"[graph] unchanged: {out.gexf_full}")
 
     # Incompat-only (undirected)
     I = nx.Graph()
     for n, data in H.nodes(data=True):
         I.add_node(n, **data)
 
-    for a, b in conflict_pairs:
+    for a, b in sorted(state.conflict_pairs()):
         if a != b and not (is_level7(a) or is_level7(b)):
             I.add_edge(a, b, relation="incompat")
 
@@ -1041,18 +2163,139 @@ async def run(
                 cc_idx[n] = cid
         nx.set_node_attributes(I, cc_idx, name="incompat_component")
 
-    nx.write_gexf(I, GEXF_INCOMPAT)
-    log(f"[graph] wrote {GEXF_INCOMPAT} (incompatibilities only, undirected)")
+    if write_gexf_if_changed(I, out.gexf_incompat):
+        log(f"[graph] wrote {out.gexf_incompat} (incompatibilities only, undirected)")
+    else:
+        log(f"[graph] unchanged: {out.gexf_incompat}")
+
+    # Binary CSR snapshot of both graphs (numpy.memmap-able, see graph_snapshot.py)
+    unchanged = (
+        bool(prev)
+        and not changes
+        and same_pairs(len(state.edges), state.edge_pairs(), prev.edges)
+        and same_pairs(len(state.conflicts), state.conflict_pairs(), prev.conflicts)
+    )
+    if unchanged and out.snapshot.exists():
+        log(f"[graph] unchanged: {out.snapshot}/")
+    else:
+        write_snapshot(
+            out.snapshot,
+            all_nodes,
+            ranking.edges,
+            state.conflict_pairs(),
+            {
+                "level": ("int32", level, 0),
+                "in_degree": ("int32", indeg, 0),
+                "out_degree": ("int32", outdeg, 0),
+                "pagerank": ("float64", pr, 0.0),
+                "scc_id": ("int32", node_to_scc, -1),
+                "scc_size": ("int32", {n: scc_sizes[s] for n, s in node_to_scc.items()}, 1),
+                "incompat_count": ("int32", {n: len(v) for n, v in inc_list.items()}, 0),
+            },
+        )
+        log(f"[graph] wrote {out.snapshot}/ (CSR snapshot, memory-mappable)")
+
+    # Clean finish: the next run starts fresh
+    out.checkpoint.unlink(missing_ok=True)
+    shutil.rmtree(out.incr_base, ignore_errors=True)
 
 
-async def _as_completed_iter(tasks: list[asyncio.Future]):
+async def reparse_and_rank(
+    out: OutPaths,
+    year_hint: int | None,
+    source: str,
+    cache: PageCache | None,
+    want_ast: bool,
+    parse_pool: ProcessPoolExecutor | None,
+    want_parquet: bool = False,
+    graph_engine: str = "array",
+) -> None:
     """
-    Async iterator over tasks in completion order.
-    Lets callers 'await' each finished task inline without collecting
-    the entire list of results in memory.
+    Offline rebuild of every output in `out` without any HTTP request.
+    The course set is the last run's courses_raw.csv (or, with
+    source="cache" and no CSV, every stored course page for year_hint).
+    source="cache" re-parses the stored HTML; source="raw" (and cache
+    misses) re-parse the requisite text in courses_raw.csv. Courses are
+    written in code order, so the rebuild is deterministic.
     """
-    for fut in asyncio.as_completed(tasks):
-        yield fut
+    t0 = time.perf_counter()
+    raw = load_raw_results(out.raw_csv)
+    struct: dict[str, Any] = {}
+    if out.struct_js.exists():
+        with contextlib.suppress(ValueError):
+            struct = json.loads(out.struct_js.read_text(encoding="utf-8"))
+    pages = cache.course_pages(year_hint) if source == "cache" and cache else {}
+
+    codes = sorted(raw) if raw else sorted(c for c in pages if not is_level7(c))
+    if not codes:
+        log(f"[reparse] nothing stored to rebuild {out.root} from ({source})")
+        return
+    jobs = []
+    for code in codes:
+        url, title, raw_pr, raw_inc, _ = raw.get(code, ("", "", "", "", ""))
+        item = struct.get(code) if isinstance(struct.get(code), dict) else {}
+        row = (title, raw_pr, raw_inc, item.get("units", ""), item.get("summary", ""))
+        page_url, blob, year = pages.get(code, (url, None, None))
+        jobs.append((code, url or page_url, blob, year, row))
+    n_pages = sum(1 for j in jobs if j[2])
+    log(f"[reparse] {len(jobs)} courses: {n_pages} stored pages, {len(jobs) - n_pages} from {out.raw_csv.name}")
+
+    # Fan batches out over the pool; consume them in submission (= code) order
+    batches = [jobs[i:i + REPARSE_BATCH] for i in range(0, len(jobs), REPARSE_BATCH)]
+    loop = asyncio.get_running_loop()
+    job = pool_job("parse", reparse_batch)
+    futures = [loop.run_in_executor(parse_pool, job, b) for b in batches] if parse_pool else []
+
+    state = CrawlState(spill_dir=out.root)
+
+    raw_writer = StreamingCSV(
+        out.raw_csv,
+        ["course_code", "url", "title", "prereq_raw", "incompat_raw"],
+        parquet="raw" if want_parquet else None,
+    )
+    edges_writer = StreamingCSV(out.edges_csv, ["course", "prereq"], parquet="edges" if want_parquet else None)
+    confl_writer = StreamingCSV(
+        out.confl_csv,
+        ["course", "conflict_with"],
+        parquet="conflicts" if want_parquet else None,
+    )
+    struct_writer = StreamingJSONMap(out.struct_js) if want_ast else None
+    try:
+        for i, batch in enumerate(batches):
+            if futures:
+                parsed_batch = await futures[i]
+            else:
+                with profile_stage("parse", memory=False):
+                    parsed_batch = reparse_batch(batch)
+            for (code, url, title, raw_pr, raw_inc, units, summary, parsed, inc_ast) in parsed_batch:
+                await raw_writer.write_row([code, url, title, raw_pr, raw_inc])
+                if struct_writer:
+                    obj = {**parsed, "incompat": inc_ast, "units": units, "summary": summary}
+                    await struct_writer.write_item(code, obj)
+                for c, p in requisite_edges(code, parsed):
+                    if state.add_edge(c, p):
+                        await edges_writer.write_row([c, p])
+                for pair in incompat_pairs(code, inc_ast):
+                    if state.add_conflict(*pair):
+                        await confl_writer.write_row([pair[0], pair[1]])
+                        await confl_writer.write_row([pair[1], pair[0]])
+                state.put_row(code, (url, title, raw_pr, raw_inc, units))
+    finally:
+        for fut in futures:
+            fut.cancel()
+        await raw_writer.close()
+        await edges_writer.close()
+        await confl_writer.close()
+        if struct_writer:
+            await struct_writer.close()
+
+    log(
+        f"[reparse] {len(state.rows)} courses, {len(state.edges)} edges, {len(state.conflicts)} conflicts "
+        f"in {time.perf_counter() - t0:.2f}s (0 HTTP requests)"
+    )
+    with profile_stage("export"):
+        rank_and_export(out, state, graph_engine, want_parquet)
+    state.close()
 
 
 # ============================== CLI ================================
@@ -1069,8 +2312,86 @@ def parse_args() -> argparse.Namespace:
     ap.add_argument("--level-range", default=None, help="Numeric level filter for seeds, e.g., 3000-5000")
     ap.add_argument("--full-ast", dest="full_ast", action="store_true", help="Save structured AST JSON as well")
     ap.add_argument("--rank", action="store_true", help="(Kept for compatibility; ranks always emitted)")
+    ap.add_argument(
+        "--parquet",
+        action="store_true",
+        help="Also write typed, zstd-compressed .parquet companions of every CSV (needs pyarrow)",
+    )
+    ap.add_argument(
+        "--graph-engine",
+        choices=sorted(GRAPH_ENGINES),
+        default="array",
+        help="Ranking backend: numpy/scipy arrays (default) or the networkx reference implementation",
+    )
+    ap.add_argument("--base-url", default=BASE, help="Site root to crawl (e.g. a local mock_site.py)")
     ap.add_argument("--rps", type=float, default=1.0, help="Global requests per second (token bucket)")
     ap.add_argument("--burst", type=int, default=4, help="Burst size (token bucket capacity)")
+    ap.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="AIMD rate control: start at --rps, speed up while healthy, back off on throttling/latency",
+    )
+    ap.add_argument("--min-rps", type=float, default=None, help="Adaptive floor (default: rps/8)")
+    ap.add_argument("--max-rps", type=float, default=None, help="Adaptive ceiling (default: rps*8)")
+    ap.add_argument(
+        "--cache",
+        choices=["revalidate", "only", "off"],
+        default="revalidate",
+        help="Page cache: conditional GETs against stored pages, cache-only (no network), or disabled",
+    )
+    ap.add_argument("--cache-dir", default=str(CACHE_DIR), help="Page cache directory")
+    ap.add_argument(
+        "--per-year",
+        action="store_true",
+        help="With several --years: crawl every (course, year) page and write uq_fast/<year>/ outputs",
+    )
+    ap.add_argument("--resume", action="store_true", help="Continue from the last crawl checkpoint")
+    ap.add_argument(
+        "--incremental",
+        action="store_true",
+        help=(
+            "Partial re-crawl: fetch only the harvested seeds (e.g. --prefixes) and new courses, "
+            "keep the rest of the last run, re-rank the merged graph (→ rank_changes.csv)"
+        ),
+    )
+    ap.add_argument(
+        "--reparse-from",
+        choices=["cache", "raw"],
+        default=None,
+        help=(
+            "Offline rebuild of every output, no HTTP: re-parse the stored pages in --cache-dir "
+            "(cache) or the requisite text in courses_raw.csv (raw) across --parse-workers processes"
+        ),
+    )
+    ap.add_argument(
+        "--parse-workers",
+        type=int,
+        default=None,
+        help="Processes for HTML/AST parsing (default: cores-1, max 8; 0 = parse on the event loop)",
+    )
+    ap.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="Serve crawl metrics (Prometheus text at /metrics, JSON at /metrics.json) on this port",
+    )
+    ap.add_argument(
+        "--metrics-host",
+        default="127.0.0.1",
+        help="Interface for --metrics-port (default: localhost only; 0.0.0.0 to expose it to a remote scraper)",
+    )
+    ap.add_argument(
+        "--profile",
+        action="store_true",
+        help="Per-stage cProfile + tracemalloc profiles in uq_fast/profiles/ with a hot-function summary",
+    )
+    ap.add_argument("--profile-top", type=int, default=15, help="Functions per stage in the --profile summary")
+    ap.add_argument(
+        "--checkpoint-every",
+        type=float,
+        default=60.0,
+        help="Seconds between crawl checkpoints",
+    )
     return ap.parse_args()
 
 
@@ -1099,6 +2420,24 @@ if __name__ == "__main__":
             want_rank=True,
             rps=args.rps,
             burst=args.burst,
+            cache_mode=args.cache,
+            cache_dir=Path(args.cache_dir),
+            resume=args.resume,
+            checkpoint_every=args.checkpoint_every,
+            parse_workers=args.parse_workers,
+            adaptive=args.adaptive,
+            min_rps=args.min_rps,
+            max_rps=args.max_rps,
+            per_year=args.per_year,
+            want_parquet=args.parquet,
+            graph_engine=args.graph_engine,
+            incremental=args.incremental,
+            reparse_from=args.reparse_from,
+            base_url=args.base_url,
+            metrics_port=args.metrics_port,
+            metrics_host=args.metrics_host,
+            profile=args.profile,
+            profile_top=args.profile_top,
         )
     )
     
@@ -0,0 +1,218 @@
+# stage_profile.py
+# ------------------------------------------------------------
+# Per-stage CPU (cProfile) + memory (tracemalloc) profiles for rank.py
+# --profile. Each pipeline stage gets its own profiler; entering a nested
+# stage pauses the outer one, so e.g. the crawl profile excludes the
+# harvest, parse, rank and export work done inside it.
+#
+# Stages (rank.py): harvest, crawl (fetch/write event loop), reparse,
+# parse (inline, or merged from every parse-pool worker), rank, export.
+#
+# Outputs (uq_fast/profiles/):
+#   - <stage>.prof        pstats dump (python -m pstats, snakeviz, ...)
+#   - <stage>.txt         top functions by self time and by cumulative time
+#   - <stage>.mem.txt     tracemalloc: peak, net growth, top allocation sites
+#   - summary.json        per-stage wall / CPU seconds and memory peaks
+#
+# Notes:
+#   - cProfile sees one thread: the streaming writers' flush thread is not
+#     profiled, and pool workers profile themselves (init_worker / run_profiled)
+#   - coroutine frames count one call per resume, so for async stages the
+#     self-time ranking is the one to read
+# ------------------------------------------------------------
+
+from __future__ import annotations
+
+import contextlib
+import cProfile
+import io
+import json
+import multiprocessing.util
+import os
+import pstats
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+MEM_TOP = 25  # allocation sites per .mem.txt section
+
+
+class _Frame:
+    def __init__(self, name: str, memory: bool):
+        self.name = name
+        self.memory = memory
+        self.snap = tracemalloc.take_snapshot() if memory else None
+        self.peak = 0
+        self.since = time.perf_counter()
+
+
+class StageProfiler:
+    """
+    One cProfile.Profile per stage name (re-entering a stage accumulates)
+    plus one tracemalloc diff per stage run. Not for concurrent use from
+    several tasks: stages are entered around synchronous work, or awaited
+    when nothing else is running yet.
+    """
+
+    def __init__(self, root: Path, top: int = 15):
+        self.root = root
+        self.top = top
+        root.mkdir(parents=True, exist_ok=True)
+        # Start clean: a stage missing from this run must not leave last run's files
+        for pattern in ("*.prof", "*.txt", "summary.json"):
+            for old in root.glob(pattern):
+                old.unlink()
+        self.profiles: dict[str, cProfile.Profile] = {}
+        self.wall: dict[str, float] = {}
+        self.peaks: dict[str, int] = {}
+        self.mem_reports: dict[str, list[str]] = {}
+        self.stack: list[_Frame] = []
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _pause(self, frame: _Frame) -> None:
+        self.profiles[frame.name].disable()
+        self.wall[frame.name] = self.wall.get(frame.name, 0.0) + time.perf_counter() - frame.since
+        frame.peak = max(frame.peak, tracemalloc.get_traced_memory()[1])
+
+    def _resume(self, frame: _Frame) -> None:
+        tracemalloc.reset_peak()
+        frame.since = time.perf_counter()
+        self.profiles[frame.name].enable()
+
+    @contextlib.contextmanager
+    def stage(self, name: str, memory: bool = True) -> Iterator[None]:
+        """Profile the block as `name`; memory=False skips the (slow) snapshots."""
+        if self.stack:
+            self._pause(self.stack[-1])
+        frame = _Frame(name, memory)
+        self.profiles.setdefault(name, cProfile.Profile())
+        self.stack.append(frame)
+        self._resume(frame)
+        try:
+            yield
+        finally:
+            self._pause(frame)
+            self.stack.pop()
+            self.peaks[name] = max(self.peaks.get(name, 0), frame.peak)
+            if frame.snap is not None:
+                self._memory_report(frame)
+            if self.stack:
+                parent = self.stack[-1]
+                parent.peak = max(parent.peak, frame.peak)
+                self._resume(parent)
+
+    def _memory_report(self, frame: _Frame) -> None:
+        skip = (tracemalloc.Filter(False, tracemalloc.__file__),)
+        after = tracemalloc.take_snapshot().filter_traces(skip)
+        diff = after.compare_to(frame.snap.filter_traces(skip), "lineno")
+        growth = sum(d.size_diff for d in diff)
+        lines = [
+            f"== {frame.name} @ {time.strftime('%H:%M:%S')}: peak {frame.peak / 2**20:.1f} MiB, "
+            f"net {growth / 2**20:+.1f} MiB (traced memory, incl. nested stages)",
+        ]
+        lines += [f"  {d}" for d in diff[:MEM_TOP]]
+        self.mem_reports.setdefault(frame.name, []).append("\n".join(lines))
+
+    # -------- reporting --------
+
+    def report(self, log: Callable[[str], None] = print) -> None:
+        """Write every stage's files, merge worker profiles, log a top-N summary."""
+        summary: dict[str, Any] = {}
+        stats: dict[str, pstats.Stats] = {}
+        for name, prof in self.profiles.items():
+            with contextlib.suppress(TypeError):  # never enabled → no stats
+                stats[name] = pstats.Stats(prof)
+        for dump in sorted(self.root.glob("_*.worker-*.prof")):
+            name = dump.name[1:].split(".worker-", 1)[0]
+            if name in stats:
+                stats[name].add(str(dump))
+            else:
+                stats[name] = pstats.Stats(str(dump))
+            dump.unlink()
+
+        for name, st in stats.items():
+            st.dump_stats(str(self.root / f"{name}.prof"))
+            (self.root / f"{name}.txt").write_text(self._text(st), encoding="utf-8")
+            if name in self.mem_reports:
+                (self.root / f"{name}.mem.txt").write_text(
+                    "\n\n".join(self.mem_reports[name]) + "\n", encoding="utf-8"
+                )
+            summary[name] = {
+                "wall_seconds": round(self.wall.get(name, 0.0), 4),
+                "cpu_seconds": round(st.total_tt, 4),
+                "calls": st.total_calls,
+                "peak_traced_mib": round(self.peaks.get(name, 0) / 2**20, 2) if name in self.peaks else None,
+            }
+            log(
+                f"[profile] ===== {name}: {summary[name]['cpu_seconds']:.2f}s profiled"
+                + (f", wall {self.wall[name]:.2f}s" if name in self.wall else " (pool workers)")
+                + (f", peak {summary[name]['peak_traced_mib']:.1f} MiB" if name in self.peaks else "")
+            )
+            for line in self._top(st, self.top):
+                log(f"[profile]   {line}")
+        (self.root / "summary.json").write_text(json.dumps(summary, indent=2), encoding="utf-8")
+        log(f"[profile] wrote {self.root}/ (<stage>.prof / .txt / .mem.txt, summary.json)")
+
+    @staticmethod
+    def _top(st: pstats.Stats, n: int) -> list[str]:
+        """Hottest functions by self time: tottime, cumtime, calls, where."""
+        rows = sorted(st.stats.items(), key=lambda kv: kv[1][2], reverse=True)[:n]
+        out = [f"{'self s':>8} {'cum s':>8} {'calls':>9}  function"]
+        for (file, line, func), (_, nc, tt, ct, _) in rows:
+            where = f"{Path(file).name}:{line}" if line else file
+            out.append(f"{tt:8.3f} {ct:8.3f} {nc:9d}  {func} ({where})")
+        return out
+
+    @staticmethod
+    def _text(st: pstats.Stats, n: int = 40) -> str:
+        buf = io.StringIO()
+        st.stream = buf
+        for key in ("tottime", "cumulative"):
+            buf.write(f"===== sorted by {key} =====\n")
+            st.sort_stats(key).print_stats(n)
+        return buf.getvalue()
+
+
+# ========================= Pool Workers ============================
+# A ProcessPoolExecutor worker profiles its own jobs: init_worker() is the
+# pool initializer, run_profiled(stage, fn, *args) wraps each job. Each
+# worker writes _<stage>.worker-<pid>.prof when it exits (pool shutdown)
+# and, as a fallback for a worker that is killed, at most every
+# WORKER_DUMP_EVERY seconds; report() merges and removes them.
+
+WORKER_DUMP_EVERY = 10.0
+
+_WORKER_DIR: Path | None = None
+_WORKER_PROFILES: dict[str, cProfile.Profile] = {}
+_WORKER_LAST_DUMP = 0.0
+
+
+def init_worker(root: str) -> None:
+    global _WORKER_DIR, _WORKER_LAST_DUMP
+    _WORKER_DIR = Path(root)
+    _WORKER_LAST_DUMP = time.monotonic()
+    multiprocessing.util.Finalize(None, _dump_worker, exitpriority=10)
+
+
+def _dump_worker() -> None:
+    global _WORKER_LAST_DUMP
+    _WORKER_LAST_DUMP = time.monotonic()
+    if _WORKER_DIR is None:
+        return
+    for stage, prof in _WORKER_PROFILES.items():
+        path = _WORKER_DIR / f"_{stage}.worker-{os.getpid()}.prof"
+        prof.dump_stats(str(path) + ".tmp")
+        os.replace(str(path) + ".tmp", path)
+
+
+def run_profiled(stage: str, fn: Callable[..., Any], *args: Any) -> Any:
+    prof = _WORKER_PROFILES.setdefault(stage, cProfile.Profile())
+    prof.enable()
+    try:
+        return fn(*args)
+    finally:
+        prof.disable()
+        if time.monotonic() - _WORKER_LAST_DUMP >= WORKER_DUMP_EVERY:
+            _dump_worker()
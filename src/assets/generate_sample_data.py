@@ -1,4 +1,37 @@
+# generate_sample_data.py
+# ------------------------------------------------------------
+# Sample/synthetic course catalogs for the frontend and for load tests.
+#
+# With no arguments this writes the small hand-written sample below to
+# sample_data.json, as it always has. With --courses N it generates a
+# reproducible synthetic catalog (same --seed → same bytes) shaped like
+# the UQ data:
+#   - codes ABCD1234 over --prefixes, levels drawn from --levels
+#   - prerequisite DAG of at least --depth layers (each course needs
+#     something from the layer below), AND of single courses and "(A or B)" groups
+#     up to --or-fanout wide, "One of ..." lists, co-requisites
+#   - --cycles: fraction of courses put on an injected 2-cycle
+#   - --incompat: mean incompatible courses per course
+#   - requisite prose in the forms rank.py's parser reads back to the
+#     same AST (plus permission / units-from / enrolment clauses)
+#
+# Output is streamed course by course, in either or both schemas:
+#   - sample:     sample_data.json layout (degrees, majors, courses)
+#   - structured: prereq_structured.json layout ({code: {prereq, ...}})
+#
+# Examples:
+#   python generate_sample_data.py
+#   python generate_sample_data.py --courses 10000 --format both
+#   python generate_sample_data.py --courses 500000 --format structured \
+#       --structured-out ../../data/courses.json --cycles 0.001 --seed 7
+# ------------------------------------------------------------
+
+import argparse
+import bisect
+import itertools
 import json
+import random
+import string
 
 sample_data = {
     "degrees": [
@@ -132,5 +165,386 @@ sample_data = {
     "prerequisites": []
 }
 
-with open("sample_data.json", "w") as f:
-    json.dump(sample_data, f, indent=2)
+# ============================== Vocabulary ==============================
+
+DEFAULT_PREFIXES = (
+    "MATH,STAT,CSSE,COMP,INFS,DECO,PHYS,CHEM,BIOL,BIOC,ECON,FINM,ACCT,MGTS,ENGG,ELEC,"
+    "MECH,CIVL,CHEE,METR,PSYC,PHIL,HIST,ENGL,LAWS,MUSC,ARCH,BIOM,GEOS,ERTH"
+)
+DEFAULT_LEVELS = "1:30,2:30,3:25,4:8,5:4,6:3"
+
+TOPICS = [
+    "Algebra", "Analysis", "Probability", "Statistical Modelling", "Algorithms", "Data Structures",
+    "Software Design", "Databases", "Networks", "Operating Systems", "Machine Learning", "Optimisation",
+    "Mechanics", "Thermodynamics", "Electromagnetism", "Quantum Physics", "Organic Chemistry",
+    "Physical Chemistry", "Cell Biology", "Genetics", "Ecology", "Microeconomics", "Macroeconomics",
+    "Econometrics", "Corporate Finance", "Accounting", "Marketing", "Signals and Systems", "Control",
+    "Structural Analysis", "Fluid Mechanics", "Process Engineering", "Cognition", "Ethics", "Logic",
+    "Modern History", "Literature", "Contract Law", "Music Theory", "Design Studio", "Geology",
+    "Hydrology", "Human Physiology", "Biomechanics", "Numerical Methods", "Cryptography",
+]
+LEAD_BY_LEVEL = {
+    1: ["Introduction to", "Foundations of", "Principles of"],
+    2: ["Intermediate", "Applied", "Methods in"],
+    3: ["Advanced", "Theory of", "Project in"],
+}
+LEAD_POSTGRAD = ["Topics in", "Research in", "Special Studies in"]
+SUMMARY_SENTENCES = [
+    "Core concepts and methods of {t}.",
+    "Students develop practical skills in {t} through laboratories and projects.",
+    "Emphasis on problem solving, modelling and communication in {t}.",
+    "Recent developments in {t} and their applications.",
+    "Mathematical and computational tools for {t}.",
+    "Case studies drawn from industry and research in {t}.",
+]
+PERMISSION_WHO = ["Head of School", "Course Coordinator"]
+PROGRAMS = ["the Bachelor of Science", "the Bachelor of Engineering", "the Bachelor of Arts",
+            "the Bachelor of Commerce", "the Master of Data Science"]
+COLORS = ["#FF5733", "#337AFF", "#FFC300", "#DAF7A6", "#C70039", "#900C3F", "#581845", "#FF8C00",
+          "#4682B4", "#FFD700", "#ADFF2F", "#8A2BE2", "#8B0000", "#4B0082", "#FF4500"]
+
+
+# ============================== Catalog plan ==============================
+
+class CatalogPlan:
+    """
+    Every course code with its prefix and DAG layer, drawn up front so
+    requisites can point at any course while courses are still streamed.
+    Courses are ordered by layer; a course only requires earlier ones
+    (except on injected cycles).
+    """
+
+    def __init__(self, n, prefixes, levels, depth, rng):
+        weights = [1 / (i + 1) ** 0.5 for i in range(len(prefixes))]  # a few big subjects
+        lvl_values = [lv for lv, _ in levels]
+        lvl_weights = [w for _, w in levels]
+        prefixes = list(prefixes)
+        taken = set(prefixes)
+        spare = (p for p in ("".join(t) for t in itertools.product(string.ascii_uppercase, repeat=4))
+                 if p not in taken)
+        used = {}
+        drawn = []
+        for _ in range(n):
+            i = rng.choices(range(len(prefixes)), weights)[0]
+            level = rng.choices(lvl_values, lvl_weights)[0]
+            while used.get((prefixes[i], level), 0) >= 1000:
+                # Bucket full (ABCD + level digit + 3 digits): move on, adding subjects as needed
+                i += 1
+                if i == len(prefixes):
+                    prefixes.append(next(spare))
+                    weights.append(weights[-1])
+            seq = used.get((prefixes[i], level), 0)
+            used[(prefixes[i], level)] = seq + 1
+            drawn.append((level, rng.random(), prefixes[i], f"{prefixes[i]}{level}{seq:03d}"))
+        drawn.sort()
+
+        self.prefixes = prefixes
+        self.codes = [d[3] for d in drawn]
+        self.prefix_of = [d[2] for d in drawn]
+        self.level_of = [d[0] for d in drawn]
+        self.layer = [i * depth // max(1, n) for i in range(n)]
+        # layer_start[L] = first index of layer L (layers are contiguous)
+        self.layer_start = [bisect.bisect_left(self.layer, L) for L in range(depth + 1)]
+        self.by_prefix_layer = {}
+        for i, (p, L) in enumerate(zip(self.prefix_of, self.layer)):
+            self.by_prefix_layer.setdefault((p, L), []).append(i)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def pick(self, rng, layer, prefix, same_prefix):
+        """Random course index in `layer`, from `prefix` when asked and possible."""
+        pool = self.by_prefix_layer.get((prefix, layer)) if same_prefix else None
+        if pool:
+            return rng.choice(pool)
+        return rng.randrange(self.layer_start[layer], self.layer_start[layer + 1])
+
+
+# ============================== Requisites ==============================
+
+def course(code):
+    return {"op": "COURSE", "code": code}
+
+
+def one_of(codes):
+    return {"op": "N_OF", "n": 1, "args": [course(c) for c in codes]}
+
+
+def requisite(cfg, rng, plan, i, pinned):
+    """
+    (prereq AST, coreq AST, prose) for course i. The AST is what rank.py's
+    parser makes of the prose: a lone code or an AND of codes and
+    "(A or B)" groups, "A or B" / "One of ..." alternatives, or a single
+    permission / units-from / enrolment clause. `pinned` (course indices)
+    overrides the prerequisite, for courses on injected cycles.
+    """
+    L = plan.layer[i]
+    prefix = plan.prefix_of[i]
+    codes = plan.codes
+
+    def lower(first):
+        lo = L - 1 if first else max(0, L - 3)
+        j = plan.pick(rng, rng.randint(lo, L - 1), prefix, rng.random() < cfg.same_prefix)
+        return codes[j]
+
+    prereq = coreq = None
+    parts = []
+    if pinned:
+        # On an injected cycle: exactly the courses that close it
+        prereq = {"op": "AND", "args": [course(codes[j]) for j in pinned]}
+        parts.append(" and ".join(codes[j] for j in pinned))
+    elif L > 0 and rng.random() < cfg.prereq_rate:
+        r = rng.random()
+        if r < cfg.text_rate:
+            kind = rng.randrange(3)
+            if kind == 0:
+                who = rng.choice(PERMISSION_WHO)
+                prereq = {"op": "PERMISSION", "who": who}
+                parts.append(f"Permission of {who}")
+            elif kind == 1:
+                opts = sorted(set(lower(False) for _ in range(rng.randint(2, cfg.or_fanout + 1))))
+                units = 2 * rng.randint(1, len(opts))
+                prereq = {"op": "UNITS_FROM", "min_units": units, "courses": opts}
+                parts.append(f"{units} units from {', '.join(opts)}")
+            else:
+                program = rng.choice(PROGRAMS)
+                prereq = {"op": "ENROLLED", "program": program}
+                parts.append(f"Enrolment in {program}")
+        elif r < cfg.text_rate + (1 - cfg.text_rate) * cfg.or_rate / 2:
+            # Top-level alternatives: "A or B" / "One of A, B or C"
+            opts = sorted(set(lower(k == 0) for k in range(rng.randint(2, cfg.or_fanout))))
+            if len(opts) == 1:
+                prereq = {"op": "AND", "args": [course(opts[0])]}
+                parts.append(opts[0])
+            else:
+                prereq = one_of(opts)
+                if len(opts) > 2 and rng.random() < 0.5:
+                    parts.append(f"One of {', '.join(opts[:-1])} or {opts[-1]}")
+                else:
+                    parts.append(" or ".join(opts))
+        else:
+            terms, texts, seen = [], [], set()
+            for k in range(rng.randint(1, cfg.max_terms)):
+                if rng.random() < cfg.or_rate:
+                    opts = sorted(set(lower(k == 0) for _ in range(rng.randint(2, cfg.or_fanout))) - seen)
+                    seen.update(opts)
+                    if len(opts) > 1:
+                        terms.append(one_of(opts))
+                        texts.append("(" + " or ".join(opts) + ")")
+                        continue
+                    code = opts[0] if opts else None
+                else:
+                    code = lower(k == 0)
+                if code and code not in {t.get("code") for t in terms}:
+                    seen.add(code)
+                    terms.append(course(code))
+                    texts.append(code)
+            # A lone "(A or B)" is just the alternatives
+            prereq = terms[0] if len(terms) == 1 and terms[0]["op"] == "N_OF" else {"op": "AND", "args": terms}
+            parts.append(rng.choice([" and ", " + "]).join(texts))
+
+    if L > 0 and rng.random() < cfg.coreq_rate:
+        # Co-requisite from earlier in the same layer (keeps the graph acyclic)
+        lo = plan.layer_start[L]
+        if i > lo:
+            co = codes[rng.randrange(lo, i)]
+            coreq = {"op": "AND", "args": [course(co)]}
+            parts.append(f"Co-requisite: {co}")
+
+    # No punctuation before "Co-requisite:": a clause ending in "." or ";"
+    # is read by the parser's keyword fallback, which reorders the codes
+    return prereq, coreq, " ".join(parts)
+
+
+def incompatible(cfg, rng, plan, i):
+    """NONE_OF over courses at the same level and prefix, or None."""
+    k = min(int(rng.expovariate(1 / cfg.incompat)), 6) if cfg.incompat > 0 else 0
+    pool = plan.by_prefix_layer.get((plan.prefix_of[i], plan.layer[i]), [])
+    codes = sorted({plan.codes[j] for j in (rng.choice(pool) for _ in range(k)) if j != i})
+    if not codes:
+        return None
+    raw = ", ".join(codes) + "."
+    return {"op": "NONE_OF", "args": [course(c) for c in codes], "raw": raw}
+
+
+def generate_courses(cfg, plan):
+    """Yield (code, record) in catalog order; record is the prereq_structured.json item + title."""
+    rng = random.Random(f"{cfg.seed}:courses")
+    # Injected cycles: course i requires a course j a layer or two above,
+    # which in turn requires i
+    pinned = {}
+    cyc_rng = random.Random(f"{cfg.seed}:cycles")
+    for _ in range(int(len(plan) * cfg.cycles / 2)):
+        i = cyc_rng.randrange(len(plan))
+        hi = plan.layer_start[min(plan.layer[i] + 2, len(plan.layer_start) - 1)]
+        if hi - i > 1:
+            j = cyc_rng.randrange(i + 1, hi)
+            pinned.setdefault(i, set()).add(j)
+            pinned.setdefault(j, set()).add(i)
+
+    for i, code in enumerate(plan.codes):
+        level = plan.level_of[i]
+        prereq, coreq, raw = requisite(cfg, rng, plan, i, sorted(pinned.get(i, ())))
+        topic = rng.choice(TOPICS)
+        lead = rng.choice(LEAD_BY_LEVEL.get(level, LEAD_POSTGRAD))
+        summary = " ".join(s.format(t=topic.lower()) for s in rng.sample(SUMMARY_SENTENCES, rng.randint(2, 3)))
+        yield code, {
+            "title": f"{lead} {topic}",
+            "prereq": prereq,
+            "coreq": coreq,
+            "raw": raw,
+            "incompat": incompatible(cfg, rng, plan, i),
+            "units": "2" if rng.random() < 0.9 else rng.choice(["1", "4", "8"]),
+            "summary": summary,
+        }
+
+
+# ============================== Schemas ==============================
+
+def to_sample_prereq(prereq):
+    """prereq AST → sample_data "Prerequisite" (same mapping as src/utils/jsonConvert.js)."""
+    if not prereq or not isinstance(prereq.get("args"), list):
+        return {"prerequisites": []}
+
+    def recurse(node):
+        if node.get("op") == "COURSE":
+            return {"type": "course", "value": node.get("code")}
+        items = [recurse(a) for a in node.get("args") or []]
+        return {"type": "AND" if node.get("op") == "AND" else "OR", "items": items}
+
+    return {"prerequisites": [recurse(prereq)]}
+
+
+def degrees_and_majors(plan, n_degrees, rng):
+    """Degrees over groups of subjects; one major per subject."""
+    codes_by_prefix = {}
+    for code, p in zip(plan.codes, plan.prefix_of):
+        codes_by_prefix.setdefault(p, []).append(code)
+    subjects = sorted(codes_by_prefix)
+    n_degrees = max(1, min(n_degrees, len(subjects)))
+    degrees, majors = [], []
+    for d in range(n_degrees):
+        group = subjects[d::n_degrees]
+        for p in group:
+            majors.append({
+                "id": p,
+                "name": f"{p} major",
+                "color": rng.choice(COLORS),
+                "course_array": sorted(codes_by_prefix[p]),
+            })
+        degrees.append({
+            "id": f"DEG{d + 1:03d}",
+            "name": f"Degree {d + 1} ({', '.join(group[:3])}{', ...' if len(group) > 3 else ''})",
+            "color": rng.choice(COLORS),
+            "major_array": list(group),
+            "course_array": sorted(c for p in group for c in codes_by_prefix[p]),
+        })
+    return degrees, majors
+
+
+class SampleWriter:
+    """Streams the sample_data.json layout: degrees/majors up front, then one course per line."""
+
+    def __init__(self, path, degrees, majors):
+        self.f = open(path, "w", encoding="utf-8")
+        self.first = True
+        self.f.write('{\n  "degrees": ' + json.dumps(degrees) + ',\n  "majors": ' + json.dumps(majors))
+        self.f.write(',\n  "courses": [\n')
+
+    def write(self, code, rec, color):
+        course_json = {
+            "id": code,
+            "name": rec["title"],
+            "description": rec["summary"],
+            "color": color,
+            "units": int(rec["units"]),
+            "Prerequisite": to_sample_prereq(rec["prereq"]),
+            "incompatible": [a["code"] for a in (rec["incompat"] or {}).get("args", [])],
+        }
+        self.f.write(("" if self.first else ",\n") + "    " + json.dumps(course_json))
+        self.first = False
+
+    def close(self):
+        self.f.write('\n  ],\n  "prerequisites": []\n}\n')
+        self.f.close()
+
+
+class StructuredWriter:
+    """Streams the prereq_structured.json layout: one "CODE": {...} entry per line."""
+
+    def __init__(self, path):
+        self.f = open(path, "w", encoding="utf-8")
+        self.f.write("{\n")
+        self.first = True
+
+    def write(self, code, rec):
+        item = {k: rec[k] for k in ("prereq", "coreq", "raw", "incompat", "units", "summary")}
+        self.f.write(("" if self.first else ",\n") + f"  {json.dumps(code)}: {json.dumps(item)}")
+        self.first = False
+
+    def close(self):
+        self.f.write("\n}\n")
+        self.f.close()
+
+
+def generate(cfg):
+    prefixes = [p.strip().upper() for p in cfg.prefixes.split(",") if p.strip()]
+    levels = [(int(lv), float(w)) for lv, w in (x.split(":") for x in cfg.levels.split(",") if x.strip())]
+    depth = max(1, min(cfg.depth, cfg.courses))
+    cfg.or_fanout = max(2, cfg.or_fanout)
+    cfg.max_terms = max(1, cfg.max_terms)
+    plan = CatalogPlan(cfg.courses, prefixes, levels, depth, random.Random(f"{cfg.seed}:plan"))
+
+    writers = []
+    sample = structured = None
+    color_rng = random.Random(f"{cfg.seed}:colors")
+    if cfg.format in ("sample", "both"):
+        degrees, majors = degrees_and_majors(plan, cfg.degrees, color_rng)
+        sample = SampleWriter(cfg.out, degrees, majors)
+        writers.append(sample)
+    if cfg.format in ("structured", "both"):
+        structured = StructuredWriter(cfg.structured_out)
+        writers.append(structured)
+    try:
+        for code, rec in generate_courses(cfg, plan):
+            if sample:
+                sample.write(code, rec, color_rng.choice(COLORS))
+            if structured:
+                structured.write(code, rec)
+    finally:
+        for w in writers:
+            w.close()
+    outs = [p for p, w in ((cfg.out, sample), (cfg.structured_out, structured)) if w]
+    print(f"{len(plan)} courses over {len(set(plan.prefix_of))} subjects → {', '.join(outs)}")
+
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Write sample_data.json, or a large synthetic course catalog.")
+    ap.add_argument("--courses", type=int, default=0, help="Synthetic catalog size (0 = the hand-written sample)")
+    ap.add_argument("--format", choices=["sample", "structured", "both"], default="sample")
+    ap.add_argument("--out", default="sample_data.json", help="sample_data.json-layout output")
+    ap.add_argument("--structured-out", default="prereq_structured.json", help="prereq_structured.json-layout output")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--prefixes", default=DEFAULT_PREFIXES, help="Subject prefixes (more are added if they fill up)")
+    ap.add_argument("--levels", default=DEFAULT_LEVELS, help="Level digit:weight pairs")
+    ap.add_argument("--depth", type=int, default=6, help="Prerequisite DAG layers")
+    ap.add_argument("--prereq-rate", type=float, default=0.8, help="Share of non-entry courses with prerequisites")
+    ap.add_argument("--max-terms", type=int, default=3, help="Most AND terms in one prerequisite")
+    ap.add_argument("--or-rate", type=float, default=0.3, help="Chance a term is an (A or B ...) group")
+    ap.add_argument("--or-fanout", type=int, default=3, help="Most alternatives in an OR / One of group")
+    ap.add_argument("--same-prefix", type=float, default=0.7, help="Chance a prerequisite shares the subject")
+    ap.add_argument("--coreq-rate", type=float, default=0.05)
+    ap.add_argument("--text-rate", type=float, default=0.05, help="Share of permission/units-from/enrolment rules")
+    ap.add_argument("--cycles", type=float, default=0.0, help="Share of courses on an injected 2-cycle")
+    ap.add_argument("--incompat", type=float, default=0.4, help="Mean incompatible courses per course")
+    ap.add_argument("--degrees", type=int, default=8, help="Degrees in the sample layout")
+    return ap.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.courses > 0:
+        generate(args)
+    else:
+        with open(args.out, "w") as f:
+            json.dump(sample_data, f, indent=2)